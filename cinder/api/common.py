@@ -39,6 +39,11 @@ api_common_opts = [
                help='Base URL that will be presented to users in links '
                     'to the OpenStack Volume API',
                deprecated_name='osapi_compute_link_prefix'),
+    cfg.BoolOpt('osapi_volume_cursor_pagination',
+                default=False,
+                help='Return pagination cursors encoding the sort key '
+                     'values of the last volume in the next links of the '
+                     'volume listings, instead of its id as a marker'),
 ]
 
 CONF = cfg.CONF
@@ -105,6 +110,27 @@ def _get_marker_param(request):
     return request.GET['marker']
 
 
+def get_sort_params(params, default_key='created_at', default_dir='desc'):
+    """Pop the sort keys and directions of a listing from params.
+
+    sort_key and sort_dir may be comma separated lists, in which case lists
+    are returned instead of single values.
+    """
+    sort_key = params.pop('sort_key', default_key)
+    sort_dir = params.pop('sort_dir', default_dir)
+    if ',' in sort_key:
+        sort_key = [key.strip() for key in sort_key.split(',')]
+    if ',' in sort_dir:
+        sort_dir = [direction.strip() for direction in sort_dir.split(',')]
+    return sort_key, sort_dir
+
+
+def is_cursor_paginated(request):
+    """Whether the next links of a listing use pagination cursors."""
+    return (CONF.osapi_volume_cursor_pagination or
+            'cursor' in request.params)
+
+
 def limited(items, request, max_limit=CONF.osapi_max_limit):
     """Return a slice of items according to requested offset and limit.
 
@@ -209,10 +235,13 @@ class ViewBuilder(object):
                 {"rel": "bookmark",
                  "href": self._get_bookmark_link(request, identifier), }]
 
-    def _get_next_link(self, request, identifier, collection_name):
+    def _get_next_link(self, request, identifier, collection_name,
+                       param="marker"):
         """Return href string with proper limit and marker params."""
         params = request.params.copy()
-        params["marker"] = identifier
+        params.pop("marker", None)
+        params.pop("cursor", None)
+        params[param] = identifier
         prefix = self._update_link_prefix(request.application_url,
                                           CONF.osapi_volume_base_URL)
         url = os.path.join(prefix,
@@ -240,7 +269,7 @@ class ViewBuilder(object):
                             str(identifier))
 
     def _get_collection_links(self, request, items, collection_name,
-                              id_key="uuid"):
+                              id_key="uuid", cursor_keys=None):
         """Retrieve 'next' link, if applicable.
 
         The next link is included if:
@@ -256,6 +285,9 @@ class ViewBuilder(object):
                                 next link for a pagination query
         :param id_key: Attribute key used to retrieve the unique ID, used
                        to generate the next link marker for a pagination query
+        :param cursor_keys: Sort keys of the collection, whose values are
+                            encoded in a pagination cursor instead of a
+                            marker when given
         :returns links
         """
         links = []
@@ -264,6 +296,16 @@ class ViewBuilder(object):
             CONF.osapi_max_limit)
         if max_items and max_items == len(items):
             last_item = items[-1]
+            if cursor_keys:
+                cursor = utils.encode_pagination_cursor(
+                    [last_item[key] for key in cursor_keys])
+                links.append({
+                    "rel": "next",
+                    "href": self._get_next_link(request, cursor,
+                                                collection_name,
+                                                param="cursor"),
+                })
+                return links
             if id_key in last_item:
                 last_item_id = last_item[id_key]
             else:
@@ -18,7 +18,6 @@
 from xml.parsers import expat
 
 from oslo.config import cfg
-from oslo.utils import timeutils
 import webob.exc
 
 from cinder.api import extensions
@@ -96,7 +95,6 @@ class HostDeserializer(wsgi.XMLDeserializer):
 
 def _list_hosts(req, service=None):
     """Returns a summary list of hosts."""
-    curr_time = timeutils.utcnow()
     context = req.environ['cinder.context']
     services = db.service_get_all(context, False)
     zone = ''
@@ -106,8 +104,7 @@ def _list_hosts(req, service=None):
         services = [s for s in services if s['availability_zone'] == zone]
     hosts = []
     for host in services:
-        delta = curr_time - (host['updated_at'] or host['created_at'])
-        alive = abs(delta.total_seconds()) <= CONF.service_down_time
+        alive = utils.service_is_up(host)
         status = (alive and "available") or "unavailable"
         active = 'enabled'
         if host['disabled']:
@@ -216,7 +213,8 @@ class HostController(wsgi.Controller):
 
         # Getting total available/used resource
         # TODO(jdg): Add summary info for Snapshots
-        volume_refs = db.volume_get_all_by_host(context, host_ref['host'])
+        volume_refs = db.volume_get_all_by_host(context, host_ref['host'],
+                                                fields=['project_id'])
         (count, sum) = db.volume_data_get_for_host(context,
                                                    host_ref['host'])
 
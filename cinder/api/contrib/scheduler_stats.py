@@ -14,12 +14,25 @@
 
 """The Scheduler Stats extension"""
 
+import hashlib
+
+from oslo.config import cfg
+import webob
+from webob import exc
+
+from cinder.api import common
 from cinder.api import extensions
 from cinder.api.openstack import wsgi
 from cinder.api.views import scheduler_stats as scheduler_stats_view
+from cinder import exception
+from cinder.i18n import _
 from cinder.openstack.common import log as logging
+from cinder.openstack.common import uuidutils
 from cinder.scheduler import rpcapi
+from cinder.volume import volume_types
+
 
+CONF = cfg.CONF
 
 LOG = logging.getLogger(__name__)
 
@@ -39,15 +52,89 @@ class SchedulerStatsController(wsgi.Controller):
         super(SchedulerStatsController, self).__init__()
 
     def get_pools(self, req):
-        """List all active pools in scheduler."""
+        """List all active pools in scheduler.
+
+        Supported query parameters: detail, backend_name, volume_type (name
+        or ID), capability (key or key:value, may be repeated), fields
+        (comma separated capability keys), marker and limit.  Responses
+        carry an ETag derived from the generation of the scheduler's pool
+        list, unchanged lists are answered with 304 Not Modified.
+        """
         context = req.environ['cinder.context']
         authorize(context, 'get_pools')
 
-        #TODO(zhiteng) Add filters support
         detail = req.params.get('detail', False)
-        pools = self.scheduler_api.get_pools(context, filters=None)
+        filters = self._get_pool_filters(context, req)
+        if filters.get('fields'):
+            detail = True
+
+        query_digest = hashlib.md5(
+            repr(sorted(req.GET.items()))).hexdigest()[:16]
+        generation = None
+        if_none_match = req.headers.get('If-None-Match', '').strip()
+        if if_none_match.startswith('W/'):
+            if_none_match = if_none_match[2:]
+        if_none_match = if_none_match.strip('"')
+        if if_none_match.endswith(':' + query_digest):
+            generation = if_none_match.rpartition(':')[0]
+
+        snapshot = self.scheduler_api.get_pools_snapshot(
+            context, filters=filters, generation=generation)
+        etag = '"%s:%s"' % (snapshot['generation'], query_digest)
+        if snapshot['pools'] is None:
+            resp = webob.Response(status_int=304)
+            resp.headers['ETag'] = etag
+            return resp
+
+        resp = wsgi.ResponseObject(
+            self._view_builder.pools(req, snapshot['pools'], detail))
+        resp['ETag'] = etag
+        return resp
+
+    def _get_pool_filters(self, context, req):
+        filters = common.get_pagination_params(req)
+        if 'limit' in filters:
+            # Same as common.limited, 0 means osapi_max_limit
+            filters['limit'] = min(CONF.osapi_max_limit,
+                                   filters['limit'] or CONF.osapi_max_limit)
+        if 'backend_name' in req.GET:
+            filters['backend_name'] = req.GET['backend_name']
+
+        capabilities = {}
+        for capability in req.GET.getall('capability'):
+            key, sep, value = capability.partition(':')
+            capabilities[key] = value if sep else None
+        if capabilities:
+            filters['capabilities'] = capabilities
+
+        if req.GET.get('fields'):
+            filters['fields'] = [field.strip() for field
+                                 in req.GET['fields'].split(',')
+                                 if field.strip()]
+
+        volume_type = req.GET.get('volume_type')
+        if volume_type:
+            try:
+                if uuidutils.is_uuid_like(volume_type):
+                    filters['volume_type'] = volume_types.get_volume_type(
+                        context, volume_type)
+                else:
+                    filters['volume_type'] = (
+                        volume_types.get_volume_type_by_name(context,
+                                                             volume_type))
+            except exception.VolumeTypeNotFound:
+                msg = _("Volume type not found.")
+                raise exc.HTTPNotFound(explanation=msg)
+        return filters
+
+    def get_timings(self, req):
+        """Summarize the timing spans of recent scheduling requests."""
+        context = req.environ['cinder.context']
+        authorize(context, 'get_timings')
+
+        timings = self.scheduler_api.get_timings(context)
 
-        return self._view_builder.pools(req, pools, detail)
+        return self._view_builder.timings(req, timings)
 
 
 class Scheduler_stats(extensions.ExtensionDescriptor):
@@ -63,7 +150,8 @@ class Scheduler_stats(extensions.ExtensionDescriptor):
         res = extensions.ResourceExtension(
             Scheduler_stats.alias,
             SchedulerStatsController(),
-            collection_actions={"get_pools": "GET"})
+            collection_actions={"get_pools": "GET",
+                                "get_timings": "GET"})
 
         resources.append(res)
 
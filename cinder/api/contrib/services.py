@@ -14,8 +14,6 @@
 #    under the License.
 
 
-from oslo.config import cfg
-from oslo.utils import timeutils
 import webob.exc
 
 from cinder.api import extensions
@@ -28,8 +26,6 @@ from cinder.openstack.common import log as logging
 from cinder import utils
 
 
-CONF = cfg.CONF
-
 LOG = logging.getLogger(__name__)
 authorize = extensions.extension_authorizer('volume', 'services')
 
@@ -80,7 +76,6 @@ class ServiceController(wsgi.Controller):
         context = req.environ['cinder.context']
         authorize(context)
         detailed = self.ext_mgr.is_loaded('os-extended-services')
-        now = timeutils.utcnow()
         services = db.service_get_all(context)
 
         host = ''
@@ -104,8 +99,7 @@ class ServiceController(wsgi.Controller):
 
         svcs = []
         for svc in services:
-            delta = now - (svc['updated_at'] or svc['created_at'])
-            alive = abs(delta.total_seconds()) <= CONF.service_down_time
+            alive = utils.service_is_up(svc)
             art = (alive and "up") or "down"
             active = 'enabled'
             if svc['disabled']:
@@ -22,6 +22,7 @@ import os
 
 from oslo.config import cfg
 from oslo.serialization import jsonutils
+from oslo.utils import strutils
 import webob.dec
 import webob.exc
 
@@ -60,6 +61,18 @@ def pipeline_factory(loader, global_conf, **local_conf):
     return app
 
 
+def _get_read_replica(req):
+    """Return the read_replica setting of the context of a request.
+
+    A client which needs current data, for instance right after changing a
+    volume, sends the X-Read-Replica header set to false.
+    """
+    value = req.headers.get('X-Read-Replica')
+    if value is None or strutils.bool_from_string(value, default=True):
+        return None
+    return False
+
+
 class InjectContext(base_wsgi.Middleware):
     """Add a 'cinder.context' to WSGI environ."""
 
@@ -121,7 +134,8 @@ class CinderKeystoneContext(base_wsgi.Middleware):
                                      auth_token=auth_token,
                                      remote_address=remote_address,
                                      service_catalog=service_catalog,
-                                     request_id=req_id)
+                                     request_id=req_id,
+                                     read_replica=_get_read_replica(req))
 
         req.environ['cinder.context'] = ctx
         return self.application
@@ -155,7 +169,8 @@ class NoAuthMiddleware(base_wsgi.Middleware):
         ctx = context.RequestContext(user_id,
                                      project_id,
                                      is_admin=True,
-                                     remote_address=remote_address)
+                                     remote_address=remote_address,
+                                     read_replica=_get_read_replica(req))
 
         req.environ['cinder.context'] = ctx
         return self.application
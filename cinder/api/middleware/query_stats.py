@@ -0,0 +1,50 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Database query accounting middleware.
+
+"""
+
+
+from oslo.config import cfg
+import webob.dec
+
+from cinder.db.sqlalchemy import query_stats
+from cinder import wsgi
+
+
+CONF = cfg.CONF
+
+
+class QueryStatsMiddleware(wsgi.Middleware):
+    """Report the database queries of each request when debug is on.
+
+    The number of queries, the rows loaded or written and the time spent in
+    the database are logged and returned in the X-DB-Query-Count,
+    X-DB-Query-Rows and X-DB-Query-Time response headers.
+    """
+
+    @webob.dec.wsgify(RequestClass=wsgi.Request)
+    def __call__(self, req):
+        if not CONF.debug:
+            return req.get_response(self.application)
+
+        with query_stats.collect('%s %s' % (req.method, req.path)) as stats:
+            resp = req.get_response(self.application)
+        query_stats.report(stats)
+        resp.headers['X-DB-Query-Count'] = str(stats.queries)
+        resp.headers['X-DB-Query-Rows'] = str(stats.rows)
+        resp.headers['X-DB-Query-Time'] = '%.3f' % stats.time
+        return resp
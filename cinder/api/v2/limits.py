@@ -19,26 +19,66 @@ Module dedicated functions/classes dealing with rate limiting requests.
 
 import collections
 import copy
+import errno
+import hashlib
 import httplib
 import math
+import os
 import re
+import threading
 import time
 
+from oslo.config import cfg
 from oslo.serialization import jsonutils
 from oslo.utils import importutils
+from oslo_concurrency import lockutils
+import six
 import webob.dec
 import webob.exc
 
 from cinder.api.openstack import wsgi
 from cinder.api.views import limits as limits_views
 from cinder.api import xmlutil
+from cinder import context as cinder_context
+from cinder import db
 from cinder.i18n import _
+from cinder.openstack.common import fileutils
 from cinder import quota
 from cinder import wsgi as base_wsgi
 
+
+limits_opts = [
+    cfg.StrOpt('rate_limit_backend',
+               default='cinder.api.v2.limits.LocalBackend',
+               help='The full class name of the backend keeping the state '
+                    'of the API rate limits. '
+                    'cinder.api.v2.limits.LocalBackend keeps it in each API '
+                    'worker, without any I/O, so every worker enforces the '
+                    'limits on its own. '
+                    'cinder.api.v2.limits.FileBackend shares it between the '
+                    'API workers of a node, at the cost of a locked file '
+                    'read and write per rate limited request. '
+                    'cinder.api.v2.limits.DbBackend shares it between all '
+                    'the API nodes, at the cost of a database transaction '
+                    'locking a row per rate limited request. Both shared '
+                    'backends also read the state of the user for the '
+                    'other requests.'),
+    cfg.StrOpt('rate_limit_state_path',
+               default='$state_path/rate_limits',
+               help='Directory where the file backend keeps the state of the '
+                    'API rate limits.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(limits_opts)
+
 QUOTAS = quota.QUOTAS
 LIMITS_PREFIX = "limits."
 
+# Number of limits combined in a single regular expression, the re module
+# only supports 100 named groups per expression.
+MATCHER_CHUNK_SIZE = 50
+
 
 # Convenience constants for the limits dictionary passed to Limiter().
 PER_SECOND = 1
@@ -125,21 +165,37 @@ class Limit(object):
         self.value = int(value)
         self.unit = unit
         self.unit_string = self.display_unit().lower()
-        self.remaining = int(value)
 
         if value <= 0:
             raise ValueError("Limit value must be > 0")
 
-        self.last_request = None
-        self.next_request = None
+        # The bucket state, see leak(), and the key of the buckets of this
+        # limit in the backend
+        self.state = None
+        self.key = '%s %s %d %d' % (verb, regex, self.value, unit)
 
-        self.water_level = 0
         self.capacity = self.unit
         self.request_value = float(self.capacity) / float(self.value)
         msg = _("Only %(value)s %(verb)s request(s) can be "
                 "made to %(uri)s every %(unit_string)s.")
         self.error_message = msg % self.__dict__
 
+    @property
+    def water_level(self):
+        return self.state[0] if self.state else 0
+
+    @property
+    def last_request(self):
+        return self.state[1] if self.state else None
+
+    @property
+    def next_request(self):
+        return self.state[2] if self.state else None
+
+    @property
+    def remaining(self):
+        return self._remaining(self.state)
+
     def __call__(self, verb, url):
         """Represent a call to this limit from a relevant request.
 
@@ -149,32 +205,41 @@ class Limit(object):
         if self.verb != verb or not re.match(self.regex, url):
             return
 
-        now = self._get_time()
+        delay, self.state = self.leak(self.state)
+        return delay
 
-        if self.last_request is None:
-            self.last_request = now
+    def leak(self, state):
+        """Record a request in a bucket of this limit.
+
+        @param state: Bucket state, a [water level, last request time, next
+                      request time] list, or None for an empty bucket
+        @return: Tuple of the delay before the request can be made (None if
+                 it can be made now) and the new bucket state
+        """
+        now = self._get_time()
+        water_level, last_request, next_request = state or (0, None, None)
 
-        leak_value = now - self.last_request
+        if last_request is None:
+            last_request = now
 
-        self.water_level -= leak_value
-        self.water_level = max(self.water_level, 0)
-        self.water_level += self.request_value
+        leak_value = now - last_request
 
-        difference = self.water_level - self.capacity
+        water_level -= leak_value
+        water_level = max(water_level, 0)
+        water_level += self.request_value
 
-        self.last_request = now
+        difference = water_level - self.capacity
 
         if difference > 0:
-            self.water_level -= self.request_value
-            self.next_request = now + difference
-            return difference
+            water_level -= self.request_value
+            return difference, [water_level, now, now + difference]
 
-        cap = self.capacity
-        water = self.water_level
-        val = self.value
+        return None, [water_level, now, now]
 
-        self.remaining = math.floor(((cap - water) / cap) * val)
-        self.next_request = now
+    def _remaining(self, state):
+        water_level = state[0] if state else 0
+        cap = float(self.capacity)
+        return math.floor(((cap - water_level) / cap) * self.value)
 
     def _get_time(self):
         """Retrieve the current time. Broken out for testability."""
@@ -184,16 +249,23 @@ class Limit(object):
         """Display the string name of the unit."""
         return self.UNITS.get(self.unit, "UNKNOWN")
 
-    def display(self):
-        """Return a useful representation of this class."""
+    def display(self, state=None):
+        """Return a useful representation of this class.
+
+        @param state: Bucket state to represent instead of the state of this
+                      limit
+        """
+        if state is None:
+            state = self.state
+        next_request = state[2] if state else None
         return {
             "verb": self.verb,
             "URI": self.uri,
             "regex": self.regex,
             "value": self.value,
-            "remaining": int(self.remaining),
+            "remaining": int(self._remaining(state)),
             "unit": self.display_unit(),
-            "resetTime": int(self.next_request or self._get_time()),
+            "resetTime": int(next_request or self._get_time()),
         }
 
 # "Limit" format is a dictionary with the HTTP verb, human-readable URI,
@@ -211,7 +283,8 @@ DEFAULT_LIMITS = [
 class RateLimitingMiddleware(base_wsgi.Middleware):
     """Rate-limits requests passing through this middleware.
 
-    All limit information is stored in memory for this implementation.
+    The state of the limits is kept by the backend set by
+    rate_limit_backend.
     """
 
     def __init__(self, application, limits=None, limiter=None, **kwargs):
@@ -256,28 +329,31 @@ class RateLimitingMiddleware(base_wsgi.Middleware):
         else:
             username = None
 
-        delay, error = self._limiter.check_for_delay(verb, url, username)
+        delay, error, limits = self._limiter.check_request(verb, url,
+                                                           username)
 
         if delay:
             msg = _("This request was rate-limited.")
             retry = time.time() + delay
             return wsgi.OverLimitFault(msg, error, retry)
 
-        req.environ["cinder.limits"] = self._limiter.get_limits(username)
+        req.environ["cinder.limits"] = limits
 
         return self.application
 
 
 class Limiter(object):
-    """Rate-limit checking class which handles limits in memory."""
+    """Rate-limit checking class which keeps the limit state in a backend."""
 
-    def __init__(self, limits, **kwargs):
+    def __init__(self, limits, backend=None, **kwargs):
         """Initialize the new `Limiter`.
 
         @param limits: List of `Limit` objects
+        @param backend: `Backend` keeping the state of the limits, defaults
+                        to the backend set by rate_limit_backend
         """
         self.limits = copy.deepcopy(limits)
-        self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self.levels = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
@@ -285,27 +361,75 @@ class Limiter(object):
                 username = key[len(LIMITS_PREFIX):]
                 self.levels[username] = self.parse_limits(value)
 
-    def get_limits(self, username=None):
-        """Return the limits for a given user."""
-        return [limit.display() for limit in self.levels[username]]
+        self.backend = backend or get_backend()
+        self._matcher = LimitMatcher(self.limits)
+        self._matchers = dict((username, LimitMatcher(limits))
+                              for username, limits in self.levels.items())
+
+    def _get_matcher(self, username):
+        return self._matchers.get(username, self._matcher)
+
+    def get_limits(self, username=None, states=None):
+        """Return the limits for a given user.
+
+        @param states: State of the user, read from the backend if None
+        """
+        limits = self._get_matcher(username).limits
+        if states is None:
+            states = self.backend.get(username) or {}
+        return [limit.display(states.get(limit.key)) for limit in limits]
 
     def check_for_delay(self, verb, url, username=None):
         """Check the given verb/user/user triplet for limit.
 
         @return: Tuple of delay (in seconds) and error message (or None, None)
         """
-        delays = []
+        delay, error, states = self._check(verb, url, username)
+        return delay, error
+
+    def check_request(self, verb, url, username=None):
+        """Check a request for limit and return the limits of the user.
+
+        The limits are reported from the state returned by the update of
+        the backend, so a request costs a single backend call.
+
+        @return: Tuple of delay (in seconds) and error message (or None,
+                 None), and the limits of the user
+        """
+        delay, error, states = self._check(verb, url, username)
+        return delay, error, self.get_limits(username, states)
+
+    def _check(self, verb, url, username):
+        """Update the buckets of all the limits matching the request.
 
-        for limit in self.levels[username]:
-            delay = limit(verb, url)
-            if delay:
-                delays.append((delay, limit.error_message))
+        The buckets are updated in a single call to the backend.
+
+        @return: Tuple of delay and error message (or None, None), and the
+                 state of the user, or None if no limit matched
+        """
+        matcher = self._get_matcher(username)
+        indexes = matcher.match(verb, url)
+        if not indexes:
+            return None, None, None
+
+        def leak(states):
+            states = states or {}
+            delays = []
+            for index in indexes:
+                limit = matcher.limits[index]
+                delay, states[limit.key] = limit.leak(states.get(limit.key))
+                if delay:
+                    delays.append((delay, limit.error_message))
+            # The bucket states are replaced, never modified in place
+            return (delays, dict(states)), states
+
+        delays, states = self.backend.update(username, leak)
 
         if delays:
             delays.sort()
-            return delays[0]
+            return delays[0] + (states,)
 
-        return None, None
+        return None, None, states
 
     # Note: This method gets called before the class is instantiated,
     # so this must be either a static method or a class method.  It is
@@ -368,10 +492,164 @@ class Limiter(object):
         return result
 
 
+class LimitMatcher(object):
+    """Finds the limits matching a request.
+
+    The regular expressions of the limits of each verb are combined into a
+    single one, made of an optional lookahead group per limit, so that
+    the limits matching a URL are found in a single match.
+    """
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._regexes = {}
+
+        patterns = collections.defaultdict(list)
+        for index, limit in enumerate(limits):
+            patterns[limit.verb].append(
+                (index, '(?:(?=(?P<limit%d>%s)))?' % (index, limit.regex)))
+
+        for verb, verb_patterns in patterns.items():
+            self._regexes[verb] = [
+                re.compile(''.join(pattern for index, pattern
+                                   in verb_patterns[i:i + MATCHER_CHUNK_SIZE]))
+                for i in range(0, len(verb_patterns), MATCHER_CHUNK_SIZE)]
+
+    def match(self, verb, url):
+        """Return the indexes of the limits matching a request."""
+        indexes = []
+        for regex in self._regexes.get(verb, []):
+            groups = regex.match(url).groupdict()
+            indexes.extend(int(name[len('limit'):])
+                           for name, value in groups.items()
+                           if name.startswith('limit') and value is not None)
+        return sorted(indexes)
+
+
+class Backend(object):
+    """Base class of the backends keeping the state of the rate limits.
+
+    The state of each user is a dictionary of the buckets of the limits
+    matched by its requests, by limit key, which must be serializable to
+    JSON.
+    """
+
+    def _get_name(self, username):
+        """Return a name identifying the state of a user in the backend."""
+        if isinstance(username, six.text_type):
+            username = username.encode('utf-8')
+        return hashlib.sha1(repr(username)).hexdigest()
+
+    def get(self, username):
+        """Return the state of a user, or None."""
+        raise NotImplementedError()
+
+    def update(self, username, func):
+        """Atomically update the state of a user.
+
+        @param func: Called with the current state of the user, or None, it
+                     returns a tuple of its result and the new state
+        @return: The result of func
+        """
+        raise NotImplementedError()
+
+
+class LocalBackend(Backend):
+    """Keeps the state of the rate limits in the memory of the process."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        return copy.deepcopy(self._states.get(username))
+
+    def update(self, username, func):
+        with self._lock:
+            result, self._states[username] = func(
+                self._states.get(username))
+        return result
+
+
+class FileBackend(Backend):
+    """Keeps the state of the rate limits in files.
+
+    The state of each user is kept in its own file under
+    rate_limit_state_path, updated under an external lock, so that it is
+    shared by the processes using the same directory.  Each rate limited
+    request reads and writes the file of its user under the lock, and
+    the other requests read it to report the limits.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or CONF.rate_limit_state_path
+        fileutils.ensure_tree(self.path)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as state_file:
+                return jsonutils.load(state_file)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def get(self, username):
+        return self._read(self._get_name(username))
+
+    def update(self, username, func):
+        name = self._get_name(username)
+        with lockutils.lock(name, lock_file_prefix='cinder-ratelimit-',
+                            external=True, lock_path=self.path,
+                            do_log=False):
+            result, state = func(self._read(name))
+            filename = os.path.join(self.path, name)
+            with open(filename + '.tmp', 'w') as state_file:
+                jsonutils.dump(state, state_file)
+            os.rename(filename + '.tmp', filename)
+        return result
+
+
+class DbBackend(Backend):
+    """Keeps the state of the rate limits in the database.
+
+    The state of each user is kept in its own row, updated in a transaction
+    holding a lock on the row, so that it is shared by all the API nodes.
+    Each rate limited request runs this transaction, and the other requests
+    read the row to report the limits.  As this costs a database round
+    trip per API request, this backend is only used when configured.
+    """
+
+    def get(self, username):
+        state = db.rate_limit_state_get(cinder_context.get_admin_context(),
+                                        self._get_name(username))
+        return jsonutils.loads(state) if state is not None else None
+
+    def update(self, username, func):
+        results = []
+
+        def update_state(state):
+            if state is not None:
+                state = jsonutils.loads(state)
+            result, state = func(state)
+            results.append(result)
+            return jsonutils.dumps(state)
+
+        db.rate_limit_state_update(cinder_context.get_admin_context(),
+                                   self._get_name(username), update_state)
+        # The last call is the one committed if the transaction was retried
+        return results[-1]
+
+
+def get_backend():
+    """Return a new instance of the configured rate limit backend."""
+    return importutils.import_object(CONF.rate_limit_backend)
+
+
 class WsgiLimiter(object):
     """Rate-limit checking from a WSGI application.
 
-    Uses an in-memory `Limiter`.
+    Uses a `Limiter` keeping its state in the configured backend.
 
     To use, POST ``/<username>`` with JSON data such as::
 
@@ -143,10 +143,16 @@ class SnapshotsController(wsgi.Controller):
         """Returns a list of snapshots, transformed through entity_maker."""
         context = req.environ['cinder.context']
 
-        #pop out limit and offset , they are not search_opts
+        #pop out pagination and sort params, they are not search_opts
         search_opts = req.GET.copy()
-        search_opts.pop('limit', None)
-        search_opts.pop('offset', None)
+        marker = search_opts.pop('marker', None)
+        limit = search_opts.pop('limit', None)
+        sort_key = search_opts.pop('sort_key', 'created_at')
+        sort_dir = search_opts.pop('sort_dir', 'desc')
+        # NOTE: offset is applied by common.limited on the returned list,
+        # so the limit can only be pushed down to the database without it
+        if search_opts.pop('offset', None) is not None:
+            limit = None
 
         #filter out invalid option
         allowed_search_options = ('status', 'volume_id', 'name')
@@ -159,7 +165,11 @@ class SnapshotsController(wsgi.Controller):
             del search_opts['name']
 
         snapshots = self.volume_api.get_all_snapshots(context,
-                                                      search_opts=search_opts)
+                                                      search_opts=search_opts,
+                                                      marker=marker,
+                                                      limit=limit,
+                                                      sort_key=sort_key,
+                                                      sort_dir=sort_dir)
         limited_list = common.limited(snapshots, req)
         req.cache_db_snapshots(limited_list)
         res = [entity_maker(context, snapshot) for snapshot in limited_list]
@@ -15,6 +15,7 @@
 
 from cinder.api import common
 from cinder.openstack.common import log as logging
+from cinder import utils
 
 
 LOG = logging.getLogger(__name__)
@@ -29,6 +30,9 @@ class ViewBuilder(common.ViewBuilder):
         """Initialize view builder."""
         super(ViewBuilder, self).__init__()
 
+    # The volume fields used by the summary view
+    summary_fields = ('id', 'display_name')
+
     def summary_list(self, request, volumes):
         """Show a list of volumes without many details."""
         return self._list_view(self.summary, request, volumes)
@@ -128,9 +132,14 @@ class ViewBuilder(common.ViewBuilder):
         :returns: Volume data in dictionary format
         """
         volumes_list = [func(request, volume)['volume'] for volume in volumes]
+        cursor_keys = None
+        if common.is_cursor_paginated(request):
+            cursor_keys = utils.get_pagination_sort_params(
+                *common.get_sort_params(request.params.copy()))[0]
         volumes_links = self._get_collection_links(request,
                                                    volumes,
-                                                   coll_name)
+                                                   coll_name,
+                                                   cursor_keys=cursor_keys)
         volumes_dict = dict(volumes=volumes_list)
 
         if volumes_links:
@@ -215,12 +215,17 @@ class VolumeController(wsgi.Controller):
 
         params = req.params.copy()
         marker = params.pop('marker', None)
+        cursor = params.pop('cursor', None) or None
         limit = params.pop('limit', None)
-        sort_key = params.pop('sort_key', 'created_at')
-        sort_dir = params.pop('sort_dir', 'desc')
+        sort_key, sort_dir = common.get_sort_params(params)
         params.pop('offset', None)
         filters = params
 
+        if marker is not None and cursor is not None:
+            msg = _("The marker and cursor parameters are mutually "
+                    "exclusive.")
+            raise exc.HTTPBadRequest(explanation=msg)
+
         utils.remove_invalid_filter_options(context,
                                             filters,
                                             self._get_volume_filter_options())
@@ -233,14 +238,31 @@ class VolumeController(wsgi.Controller):
         if 'metadata' in filters:
             filters['metadata'] = ast.literal_eval(filters['metadata'])
 
-        volumes = self.volume_api.get_all(context, marker, limit, sort_key,
-                                          sort_dir, filters,
-                                          viewable_admin_meta=True)
+        if is_detail:
+            volumes = self.volume_api.get_all(context, marker, limit,
+                                              sort_key, sort_dir, filters,
+                                              viewable_admin_meta=True,
+                                              cursor=cursor)
 
-        volumes = [dict(vol.iteritems()) for vol in volumes]
+            volumes = [dict(vol.iteritems()) for vol in volumes]
 
-        for volume in volumes:
-            utils.add_visible_admin_metadata(volume)
+            for volume in volumes:
+                utils.add_visible_admin_metadata(volume)
+        else:
+            # Only load the columns shown by the summary view, and the sort
+            # keys encoded in the pagination cursor of the next link
+            fields = self._view_builder.summary_fields
+            if common.is_cursor_paginated(req):
+                sort_keys = utils.get_pagination_sort_params(sort_key,
+                                                             sort_dir)[0]
+                fields += tuple(key for key in sort_keys
+                                if key not in fields)
+            volumes = self.volume_api.get_all(context, marker, limit,
+                                              sort_key, sort_dir, filters,
+                                              fields=fields, cursor=cursor)
+
+            volumes = [dict((field, vol[field]) for field in fields)
+                       for vol in volumes]
 
         limited_list = common.limited(volumes, req)
         req.cache_db_volumes(limited_list)
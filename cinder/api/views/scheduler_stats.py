@@ -50,4 +50,20 @@ class ViewBuilder(common.ViewBuilder):
             plist = [self.summary(request, pool)['pool'] for pool in pools]
         pools_dict = dict(pools=plist)
 
+        if 'limit' in request.params:
+            pools_links = self._get_collection_links(
+                request, pools, 'scheduler-stats/get_pools', id_key='name')
+            if pools_links:
+                pools_dict['pools_links'] = pools_links
+
         return pools_dict
+
+    def timings(self, request, timings):
+        """View of the timing spans summary reported by scheduler."""
+        return {
+            'timings': {
+                'requests': timings.get('requests', 0),
+                'spans': timings.get('spans', []),
+                'slow_requests': timings.get('slow_requests', []),
+            }
+        }
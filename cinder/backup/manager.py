@@ -193,7 +193,8 @@ class BackupManager(manager.SchedulerDependentManager):
             self._init_volume_driver(ctxt, mgr.driver)
 
         LOG.info(_LI("Cleaning up incomplete backup operations."))
-        volumes = self.db.volume_get_all_by_host(ctxt, self.host)
+        volumes = self.db.volume_get_all_by_host(
+            ctxt, self.host, fields=['id', 'host', 'status'])
         for volume in volumes:
             volume_host = volume_utils.extract_host(volume['host'], 'backend')
             backend = self._get_volume_backend(host=volume_host)
@@ -64,6 +64,7 @@ warnings.simplefilter('once', DeprecationWarning)
 from oslo.config import cfg
 from oslo.db.sqlalchemy import migration
 from oslo import messaging
+import six
 
 from cinder import i18n
 i18n.enable_lazy()
@@ -74,6 +75,7 @@ from cinder import context
 from cinder import db
 from cinder.db import migration as db_migration
 from cinder.db.sqlalchemy import api as db_api
+from cinder import exception
 from cinder.i18n import _
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import uuidutils
@@ -228,6 +230,34 @@ class DbCommands(object):
                                    db_migration.MIGRATE_REPO_PATH,
                                    db_migration.INIT_VERSION))
 
+    @args('--age-in-days', type=int, default=30,
+          help='Purge the rows deleted more than this number of days ago '
+               '(default: %(default)s)')
+    @args('--batch-size', type=int, default=1000,
+          help='Number of rows removed per transaction '
+               '(default: %(default)s)')
+    @args('--sleep', type=float, default=0.1,
+          help='Seconds to wait between two batches, to limit the load on '
+               'the database (default: %(default)s)')
+    def purge(self, age_in_days=30, batch_size=1000, sleep=0.1):
+        """Purge the rows soft-deleted more than age_in_days days ago."""
+        ctxt = context.get_admin_context()
+        try:
+            results = db.purge_deleted_rows(ctxt, age_in_days,
+                                            batch_size=batch_size,
+                                            throttle=sleep)
+        except exception.InvalidParameterValue as e:
+            print(six.text_type(e))
+            sys.exit(1)
+
+        print(_("%(table)-32s\t%(rows)s") % {'table': _('Table'),
+                                             'rows': _('Rows purged')})
+        for table in sorted(results):
+            if results[table]:
+                print("%-32s\t%d" % (table, results[table]))
+        print(_("%(table)-32s\t%(rows)d") % {'table': _('Total'),
+                                             'rows': sum(results.values())})
+
 
 class VersionCommands(object):
     """Class for exposing the codebase version."""
@@ -291,10 +321,10 @@ class VolumeCommands(object):
         """
         ctxt = context.get_admin_context()
         volumes = db.volume_get_all_by_host(ctxt,
-                                            currenthost)
-        for v in volumes:
-            db.volume_update(ctxt, v['id'],
-                             {'host': newhost})
+                                            currenthost,
+                                            fields=['id'])
+        db.volume_update_many(ctxt, [v['id'] for v in volumes],
+                              {'host': newhost})
 
 
 class ConfigCommands(object):
@@ -490,8 +520,9 @@ def get_arg_string(args):
         # is optional args. Notice that cfg module takes care of
         # actual ArgParser so prefix_chars is always '-'.
         if args[1] == '-':
-            # This is long optional arg
-            arg = args[2:]
+            # This is long optional arg, stored by argparse with its dashes
+            # replaced by underscores.
+            arg = args[2:].replace('-', '_')
         else:
             arg = args[3:]
     else:
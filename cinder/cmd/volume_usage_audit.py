@@ -35,6 +35,7 @@
 from __future__ import print_function
 
 from datetime import datetime
+import os
 import sys
 import traceback
 import warnings
@@ -42,12 +43,13 @@ import warnings
 warnings.simplefilter('once', DeprecationWarning)
 
 from oslo.config import cfg
+from oslo.serialization import jsonutils
 
 from cinder import i18n
 i18n.enable_lazy()
 from cinder import context
 from cinder import db
-from cinder.i18n import _, _LE
+from cinder.i18n import _, _LE, _LI, _LW
 from cinder.openstack.common import log as logging
 from cinder import rpc
 from cinder import utils
@@ -71,10 +73,260 @@ script_opts = [
                 default=False,
                 help="Send the volume and snapshot create and delete "
                      "notifications generated in the specified period."),
+    cfg.IntOpt('batch_size',
+               default=1000,
+               help="Number of volumes or snapshots read from the database "
+                    "and notified at a time."),
+    cfg.StrOpt('checkpoint_file',
+               default=None,
+               help="File in which the progress of the audit is saved after "
+                    "each batch. An interrupted audit of the same period and "
+                    "shard resumes from it."),
+    cfg.IntOpt('shard_index',
+               default=0,
+               help="Index of the shard of the volumes and snapshots audited "
+                    "by this run, from 0 to shard_count - 1."),
+    cfg.IntOpt('shard_count',
+               default=1,
+               help="Number of disjoint shards the volumes and snapshots "
+                    "are split in, to run as many audits in parallel."),
 ]
 CONF.register_cli_opts(script_opts)
 
 
+def _get_shard(index, count):
+    """Return the (lower, upper) id bounds of a shard.
+
+    The ids are uuids, the shards split the range of their first 32 bits
+    in count equal parts.  None means unbounded.
+    """
+    lower = upper = None
+    if index > 0:
+        lower = '%08x' % (index * 2 ** 32 // count)
+    if index < count - 1:
+        upper = '%08x' % ((index + 1) * 2 ** 32 // count)
+    return lower, upper
+
+
+def _load_checkpoint(path, begin, end, LOG):
+    checkpoint = {
+        'audit_period_beginning': str(begin),
+        'audit_period_ending': str(end),
+        'shard': '%d/%d' % (CONF.shard_index, CONF.shard_count),
+        'markers': {},
+        'completed': [],
+    }
+    if not path or not os.path.exists(path):
+        return checkpoint
+    with open(path) as f:
+        saved = jsonutils.load(f)
+    if all(saved.get(key) == checkpoint[key]
+           for key in ('audit_period_beginning', 'audit_period_ending',
+                       'shard')):
+        LOG.info(_LI("Resuming the usage audit from %s."), path)
+        return saved
+    LOG.warning(_LW("Ignoring the checkpoint %s of another audit period or "
+                    "shard."), path)
+    return checkpoint
+
+
+def _save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        jsonutils.dump(checkpoint, f)
+    os.rename(tmp_path, path)
+
+
+def _remove_checkpoint(path):
+    if path and os.path.exists(path):
+        os.unlink(path)
+
+
+def _audit(admin_context, resource, get_active_by_window, notify, begin, end,
+           extra_info, shard, checkpoint, LOG):
+    """Send the usages of the resources of the shard active in the period.
+
+    The resources are read by batches of CONF.batch_size, sorted by id, and
+    the checkpoint is saved once the notifications of a batch are sent.
+    Returns the number of resources audited by this run.
+    """
+    if resource in checkpoint['completed']:
+        return 0
+    lower, upper = shard
+    marker = checkpoint['markers'].get(resource, lower)
+    count = 0
+    while True:
+        batch = get_active_by_window(admin_context, begin, end,
+                                     marker=marker, limit=CONF.batch_size)
+        last_batch = len(batch) < CONF.batch_size
+        for ref in batch:
+            if upper is not None and ref.id >= upper:
+                last_batch = True
+                break
+            notify(admin_context, ref, begin, end, extra_info, LOG)
+            marker = ref.id
+            count += 1
+        if last_batch:
+            break
+        checkpoint['markers'][resource] = marker
+        _save_checkpoint(CONF.checkpoint_file, checkpoint)
+        LOG.debug("Sent the usages of %(count)d %(resource)s up to "
+                  "%(marker)s." %
+                  {'count': count, 'resource': resource, 'marker': marker})
+    checkpoint['markers'].pop(resource, None)
+    checkpoint['completed'].append(resource)
+    _save_checkpoint(CONF.checkpoint_file, checkpoint)
+    return count
+
+
+def _notify_volume(admin_context, volume_ref, begin, end, extra_info, LOG):
+    try:
+        LOG.debug("Send exists notification for <volume_id: "
+                  "%(volume_id)s> <project_id %(project_id)s> "
+                  "<%(extra_info)s>" %
+                  {'volume_id': volume_ref.id,
+                   'project_id': volume_ref.project_id,
+                   'extra_info': extra_info})
+        cinder.volume.utils.notify_about_volume_usage(
+            admin_context,
+            volume_ref,
+            'exists', extra_usage_info=extra_info)
+    except Exception as e:
+        LOG.error(_LE("Failed to send exists notification"
+                      " for volume %s.") %
+                  volume_ref.id)
+        print(traceback.format_exc(e))
+
+    if (CONF.send_actions and
+            volume_ref.created_at > begin and
+            volume_ref.created_at < end):
+        try:
+            local_extra_info = {
+                'audit_period_beginning': str(volume_ref.created_at),
+                'audit_period_ending': str(volume_ref.created_at),
+            }
+            LOG.debug("Send create notification for "
+                      "<volume_id: %(volume_id)s> "
+                      "<project_id %(project_id)s> <%(extra_info)s>" %
+                      {'volume_id': volume_ref.id,
+                       'project_id': volume_ref.project_id,
+                       'extra_info': local_extra_info})
+            cinder.volume.utils.notify_about_volume_usage(
+                admin_context,
+                volume_ref,
+                'create.start', extra_usage_info=local_extra_info)
+            cinder.volume.utils.notify_about_volume_usage(
+                admin_context,
+                volume_ref,
+                'create.end', extra_usage_info=local_extra_info)
+        except Exception as e:
+            LOG.error(_LE("Failed to send create notification for "
+                          "volume %s.") % volume_ref.id)
+            print(traceback.format_exc(e))
+
+    if (CONF.send_actions and volume_ref.deleted_at and
+            volume_ref.deleted_at > begin and
+            volume_ref.deleted_at < end):
+        try:
+            local_extra_info = {
+                'audit_period_beginning': str(volume_ref.deleted_at),
+                'audit_period_ending': str(volume_ref.deleted_at),
+            }
+            LOG.debug("Send delete notification for "
+                      "<volume_id: %(volume_id)s> "
+                      "<project_id %(project_id)s> <%(extra_info)s>" %
+                      {'volume_id': volume_ref.id,
+                       'project_id': volume_ref.project_id,
+                       'extra_info': local_extra_info})
+            cinder.volume.utils.notify_about_volume_usage(
+                admin_context,
+                volume_ref,
+                'delete.start', extra_usage_info=local_extra_info)
+            cinder.volume.utils.notify_about_volume_usage(
+                admin_context,
+                volume_ref,
+                'delete.end', extra_usage_info=local_extra_info)
+        except Exception as e:
+            LOG.error(_LE("Failed to send delete notification for volume "
+                          "%s.") % volume_ref.id)
+            print(traceback.format_exc(e))
+
+
+def _notify_snapshot(admin_context, snapshot_ref, begin, end, extra_info,
+                     LOG):
+    try:
+        LOG.debug("Send notification for <snapshot_id: %(snapshot_id)s> "
+                  "<project_id %(project_id)s> <%(extra_info)s>" %
+                  {'snapshot_id': snapshot_ref.id,
+                   'project_id': snapshot_ref.project_id,
+                   'extra_info': extra_info})
+        cinder.volume.utils.notify_about_snapshot_usage(admin_context,
+                                                        snapshot_ref,
+                                                        'exists',
+                                                        extra_info)
+    except Exception as e:
+        LOG.error(_LE("Failed to send exists notification "
+                      "for snapshot %s.")
+                  % snapshot_ref.id)
+        print(traceback.format_exc(e))
+
+    if (CONF.send_actions and
+            snapshot_ref.created_at > begin and
+            snapshot_ref.created_at < end):
+        try:
+            local_extra_info = {
+                'audit_period_beginning': str(snapshot_ref.created_at),
+                'audit_period_ending': str(snapshot_ref.created_at),
+            }
+            LOG.debug("Send create notification for "
+                      "<snapshot_id: %(snapshot_id)s> "
+                      "<project_id %(project_id)s> <%(extra_info)s>" %
+                      {'snapshot_id': snapshot_ref.id,
+                       'project_id': snapshot_ref.project_id,
+                       'extra_info': local_extra_info})
+            cinder.volume.utils.notify_about_snapshot_usage(
+                admin_context,
+                snapshot_ref,
+                'create.start', extra_usage_info=local_extra_info)
+            cinder.volume.utils.notify_about_snapshot_usage(
+                admin_context,
+                snapshot_ref,
+                'create.end', extra_usage_info=local_extra_info)
+        except Exception as e:
+            LOG.error(_LE("Failed to send create notification for snapshot"
+                          "%s.") % snapshot_ref.id)
+            print(traceback.format_exc(e))
+
+    if (CONF.send_actions and snapshot_ref.deleted_at and
+            snapshot_ref.deleted_at > begin and
+            snapshot_ref.deleted_at < end):
+        try:
+            local_extra_info = {
+                'audit_period_beginning': str(snapshot_ref.deleted_at),
+                'audit_period_ending': str(snapshot_ref.deleted_at),
+            }
+            LOG.debug("Send delete notification for "
+                      "<snapshot_id: %(snapshot_id)s> "
+                      "<project_id %(project_id)s> <%(extra_info)s>" %
+                      {'snapshot_id': snapshot_ref.id,
+                       'project_id': snapshot_ref.project_id,
+                       'extra_info': local_extra_info})
+            cinder.volume.utils.notify_about_snapshot_usage(
+                admin_context,
+                snapshot_ref,
+                'delete.start', extra_usage_info=local_extra_info)
+            cinder.volume.utils.notify_about_snapshot_usage(
+                admin_context,
+                snapshot_ref,
+                'delete.end', extra_usage_info=local_extra_info)
+        except Exception as e:
+            LOG.error(_LE("Failed to send delete notification for snapshot"
+                          "%s.") % snapshot_ref.id)
+            print(traceback.format_exc(e))
+
+
 def main():
     admin_context = context.get_admin_context()
     CONF(sys.argv[1:], project='cinder',
@@ -94,6 +346,18 @@ def main():
         print(msg)
         LOG.error(msg)
         sys.exit(-1)
+    if CONF.batch_size < 1:
+        msg = _("The batch size (%d) must be positive.") % CONF.batch_size
+        print(msg)
+        LOG.error(msg)
+        sys.exit(-1)
+    if not 0 <= CONF.shard_index < CONF.shard_count:
+        msg = _("The shard index (%(index)d) must be between 0 and the "
+                "shard count (%(count)d) minus one.") % {
+            'index': CONF.shard_index, 'count': CONF.shard_count}
+        print(msg)
+        LOG.error(msg)
+        sys.exit(-1)
     print(_("Starting volume usage audit"))
     msg = _("Creating usages for %(begin_period)s until %(end_period)s")
     print(msg % {"begin_period": str(begin), "end_period": str(end)})
@@ -103,155 +367,19 @@ def main():
         'audit_period_ending': str(end),
     }
 
-    volumes = db.volume_get_active_by_window(admin_context,
-                                             begin,
-                                             end)
-    print(_("Found %d volumes") % len(volumes))
-    for volume_ref in volumes:
-        try:
-            LOG.debug("Send exists notification for <volume_id: "
-                      "%(volume_id)s> <project_id %(project_id)s> "
-                      "<%(extra_info)s>" %
-                      {'volume_id': volume_ref.id,
-                       'project_id': volume_ref.project_id,
-                       'extra_info': extra_info})
-            cinder.volume.utils.notify_about_volume_usage(
-                admin_context,
-                volume_ref,
-                'exists', extra_usage_info=extra_info)
-        except Exception as e:
-            LOG.error(_LE("Failed to send exists notification"
-                          " for volume %s.") %
-                      volume_ref.id)
-            print(traceback.format_exc(e))
+    shard = _get_shard(CONF.shard_index, CONF.shard_count)
+    checkpoint = _load_checkpoint(CONF.checkpoint_file, begin, end, LOG)
 
-        if (CONF.send_actions and
-                volume_ref.created_at > begin and
-                volume_ref.created_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(volume_ref.created_at),
-                    'audit_period_ending': str(volume_ref.created_at),
-                }
-                LOG.debug("Send create notification for "
-                          "<volume_id: %(volume_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>" %
-                          {'volume_id': volume_ref.id,
-                           'project_id': volume_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'create.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'create.end', extra_usage_info=local_extra_info)
-            except Exception as e:
-                LOG.error(_LE("Failed to send create notification for "
-                              "volume %s.") % volume_ref.id)
-                print(traceback.format_exc(e))
-
-        if (CONF.send_actions and volume_ref.deleted_at and
-                volume_ref.deleted_at > begin and
-                volume_ref.deleted_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(volume_ref.deleted_at),
-                    'audit_period_ending': str(volume_ref.deleted_at),
-                }
-                LOG.debug("Send delete notification for "
-                          "<volume_id: %(volume_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>" %
-                          {'volume_id': volume_ref.id,
-                           'project_id': volume_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'delete.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_volume_usage(
-                    admin_context,
-                    volume_ref,
-                    'delete.end', extra_usage_info=local_extra_info)
-            except Exception as e:
-                LOG.error(_LE("Failed to send delete notification for volume "
-                              "%s.") % volume_ref.id)
-                print(traceback.format_exc(e))
-
-    snapshots = db.snapshot_get_active_by_window(admin_context,
-                                                 begin,
-                                                 end)
-    print(_("Found %d snapshots") % len(snapshots))
-    for snapshot_ref in snapshots:
-        try:
-            LOG.debug("Send notification for <snapshot_id: %(snapshot_id)s> "
-                      "<project_id %(project_id)s> <%(extra_info)s>" %
-                      {'snapshot_id': snapshot_ref.id,
-                       'project_id': snapshot_ref.project_id,
-                       'extra_info': extra_info})
-            cinder.volume.utils.notify_about_snapshot_usage(admin_context,
-                                                            snapshot_ref,
-                                                            'exists',
-                                                            extra_info)
-        except Exception as e:
-            LOG.error(_LE("Failed to send exists notification "
-                          "for snapshot %s.")
-                      % snapshot_ref.id)
-            print(traceback.format_exc(e))
+    count = _audit(admin_context, 'volumes', db.volume_get_active_by_window,
+                   _notify_volume, begin, end, extra_info, shard, checkpoint,
+                   LOG)
+    print(_("Found %d volumes") % count)
+
+    count = _audit(admin_context, 'snapshots',
+                   db.snapshot_get_active_by_window, _notify_snapshot, begin,
+                   end, extra_info, shard, checkpoint, LOG)
+    print(_("Found %d snapshots") % count)
 
-        if (CONF.send_actions and
-                snapshot_ref.created_at > begin and
-                snapshot_ref.created_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(snapshot_ref.created_at),
-                    'audit_period_ending': str(snapshot_ref.created_at),
-                }
-                LOG.debug("Send create notification for "
-                          "<snapshot_id: %(snapshot_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>" %
-                          {'snapshot_id': snapshot_ref.id,
-                           'project_id': snapshot_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'create.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'create.end', extra_usage_info=local_extra_info)
-            except Exception as e:
-                LOG.error(_LE("Failed to send create notification for snapshot"
-                              "%s.") % snapshot_ref.id)
-                print(traceback.format_exc(e))
-
-        if (CONF.send_actions and snapshot_ref.deleted_at and
-                snapshot_ref.deleted_at > begin and
-                snapshot_ref.deleted_at < end):
-            try:
-                local_extra_info = {
-                    'audit_period_beginning': str(snapshot_ref.deleted_at),
-                    'audit_period_ending': str(snapshot_ref.deleted_at),
-                }
-                LOG.debug("Send delete notification for "
-                          "<snapshot_id: %(snapshot_id)s> "
-                          "<project_id %(project_id)s> <%(extra_info)s>" %
-                          {'snapshot_id': snapshot_ref.id,
-                           'project_id': snapshot_ref.project_id,
-                           'extra_info': local_extra_info})
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'delete.start', extra_usage_info=local_extra_info)
-                cinder.volume.utils.notify_about_snapshot_usage(
-                    admin_context,
-                    snapshot_ref,
-                    'delete.end', extra_usage_info=local_extra_info)
-            except Exception as e:
-                LOG.error(_LE("Failed to send delete notification for snapshot"
-                              "%s.") % snapshot_ref.id)
-                print(traceback.format_exc(e))
+    _remove_checkpoint(CONF.checkpoint_file)
 
     print(_("Volume usage audit completed"))
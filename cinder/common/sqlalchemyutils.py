@@ -125,3 +125,102 @@ def paginate_query(query, model, limit, sort_keys, marker=None,
         query = query.limit(limit)
 
     return query
+
+
+def paginate_query_by_cursor(query, model, limit, sort_keys, sort_dirs,
+                             cursor_values=None):
+    """Returns a query with sorting / keyset pagination criteria added.
+
+    Unlike paginate_query, the rows are located by the sort key values of
+    the last row of the previous page, as encoded in a pagination cursor,
+    so there is no marker row to fetch.  The criteria are nested so that
+    each of them starts with a range condition on the first sort key:
+    (k1 >= X1) and ((k1 > X1) or ((k2 >= X2) and ((k2 > X2) or (k3 > X3))))
+    which the database can satisfy with an index range scan, and deep
+    pages then cost the same as the first one.
+
+    NULL values of nullable sort keys are ordered explicitly, first in
+    ascending order and last in descending order whatever the database, and
+    the criteria account for them.
+
+    :param query: the query object to which we should add paging/sorting
+    :param model: the ORM model class
+    :param limit: maximum number of items to return
+    :param sort_keys: array of attributes by which results should be sorted
+    :param sort_dirs: per-column array of sort_dirs, corresponding to sort_keys
+    :param cursor_values: the sort key values of the last item of the
+                          previous page
+    :rtype: sqlalchemy.orm.query.Query
+    :return: The query with sorting/pagination added.
+    """
+    if len(sort_dirs) != len(sort_keys):
+        raise ValueError(_("There must be one sort direction per sort key"))
+
+    attrs = []
+    for sort_key, sort_dir in zip(sort_keys, sort_dirs):
+        try:
+            sort_key_attr = getattr(model, sort_key)
+        except AttributeError:
+            raise exception.InvalidInput(reason='Invalid sort key')
+        if sort_dir not in ('asc', 'desc'):
+            raise ValueError(_("Unknown sort direction, "
+                               "must be 'desc' or 'asc'"))
+        nullable = _is_nullable(sort_key_attr)
+        attrs.append((sort_key_attr, nullable))
+        sort_dir_func = {
+            'asc': sqlalchemy.asc,
+            'desc': sqlalchemy.desc,
+        }[sort_dir]
+        if nullable:
+            query = query.order_by(sort_dir_func(sort_key_attr.isnot(None)))
+        query = query.order_by(sort_dir_func(sort_key_attr))
+
+    if cursor_values is not None:
+        if len(cursor_values) != len(sort_keys):
+            raise exception.InvalidInput(
+                reason=_('The pagination cursor does not match the sort '
+                         'keys.'))
+        criteria = None
+        for (attr, nullable), sort_dir, value in reversed(
+                zip(attrs, sort_dirs, cursor_values)):
+            after, from_ = _get_cursor_criteria(attr, nullable, sort_dir,
+                                                value)
+            if criteria is None:
+                criteria = after
+            elif from_ is None:
+                criteria = sqlalchemy.sql.or_(after, criteria)
+            else:
+                criteria = sqlalchemy.sql.and_(
+                    from_, sqlalchemy.sql.or_(after, criteria))
+        query = query.filter(criteria)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query
+
+
+def _is_nullable(attr):
+    try:
+        return any(column.nullable for column in attr.property.columns)
+    except AttributeError:
+        return True
+
+
+def _get_cursor_criteria(attr, nullable, sort_dir, value):
+    """Return the criteria of the rows after and from a cursor value.
+
+    NULL sorts before any value, see paginate_query_by_cursor.  A None
+    criterion from the cursor value matches all the rows.
+    """
+    if sort_dir == 'asc':
+        if value is None:
+            return attr.isnot(None), None
+        return attr > value, attr >= value
+
+    if value is None:
+        return sqlalchemy.sql.false(), attr.is_(None)
+    if nullable:
+        return (sqlalchemy.sql.or_(attr < value, attr.is_(None)),
+                sqlalchemy.sql.or_(attr <= value, attr.is_(None)))
+    return attr < value, attr <= value
@@ -42,7 +42,7 @@ class RequestContext(context.RequestContext):
                  timestamp=None, request_id=None, auth_token=None,
                  overwrite=True, quota_class=None, service_catalog=None,
                  domain=None, user_domain=None, project_domain=None,
-                 **kwargs):
+                 read_replica=None, **kwargs):
         """Initialize RequestContext.
 
         :param read_deleted: 'no' indicates deleted records are hidden, 'yes'
@@ -52,6 +52,10 @@ class RequestContext(context.RequestContext):
         :param overwrite: Set to False to ensure that the greenthread local
             copy of the index is not overwritten.
 
+        :param read_replica: False makes the replica safe database calls
+            read current data from the primary database even when
+            db_replica_reads is enabled.
+
         :param kwargs: Extra arguments that might be present, but we ignore
             because they possibly came in from older rpc messages.
         """
@@ -71,6 +75,7 @@ class RequestContext(context.RequestContext):
         elif self.is_admin and 'admin' not in self.roles:
             self.roles.append('admin')
         self.read_deleted = read_deleted
+        self.read_replica = read_replica
         self.remote_address = remote_address
         if not timestamp:
             timestamp = timeutils.utcnow()
@@ -115,6 +120,7 @@ class RequestContext(context.RequestContext):
                  'project_name': self.project_name,
                  'domain': self.domain,
                  'read_deleted': self.read_deleted,
+                 'read_replica': self.read_replica,
                  'roles': self.roles,
                  'remote_address': self.remote_address,
                  'timestamp': timeutils.strtime(self.timestamp),
@@ -66,7 +66,16 @@ db_opts = [
                help='Template string to be used to generate snapshot names'),
     cfg.StrOpt('backup_name_template',
                default='backup-%s',
-               help='Template string to be used to generate backup names'), ]
+               help='Template string to be used to generate backup names'),
+    cfg.BoolOpt('db_replica_reads',
+                default=False,
+                help='Run the read only database calls marked as replica '
+                     'safe, like the volume, snapshot and backup listings, '
+                     'on the database replica set by the '
+                     'slave_connection option of the database group. Their '
+                     'results may lag behind the primary database. An API '
+                     'request can still ask for current data by sending the '
+                     'X-Read-Replica header set to false.'), ]
 
 
 CONF = cfg.CONF
@@ -141,6 +150,15 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_heartbeat(context, service_id, values=None):
+    """Record a heartbeat of a service with a single update.
+
+    The report count is incremented and the given properties are set.
+    Returns False if the service does not exist.
+    """
+    return IMPL.service_heartbeat(context, service_id, values)
+
+
 ###################
 
 
@@ -211,15 +229,20 @@ def volume_get(context, volume_id):
 
 
 def volume_get_all(context, marker, limit, sort_key, sort_dir,
-                   filters=None):
-    """Get all volumes."""
+                   filters=None, fields=None, cursor=None):
+    """Get all volumes.
+
+    When fields is given only those columns and relationships are loaded.
+    sort_key and sort_dir may be lists, and the page may start after a
+    pagination cursor instead of a marker volume id.
+    """
     return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir,
-                               filters=filters)
+                               filters=filters, fields=fields, cursor=cursor)
 
 
-def volume_get_all_by_host(context, host):
+def volume_get_all_by_host(context, host, fields=None):
     """Get all volumes belonging to a host."""
-    return IMPL.volume_get_all_by_host(context, host)
+    return IMPL.volume_get_all_by_host(context, host, fields=fields)
 
 
 def volume_get_all_by_group(context, group_id):
@@ -228,10 +251,12 @@ def volume_get_all_by_group(context, group_id):
 
 
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir, filters=None):
+                              sort_dir, filters=None, fields=None,
+                              cursor=None):
     """Get all volumes belonging to a project."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
-                                          sort_key, sort_dir, filters=filters)
+                                          sort_key, sort_dir, filters=filters,
+                                          fields=fields, cursor=cursor)
 
 
 def volume_get_iscsi_target_num(context, volume_id):
@@ -248,6 +273,29 @@ def volume_update(context, volume_id, values):
     return IMPL.volume_update(context, volume_id, values)
 
 
+def volume_update_many(context, volume_ids, values):
+    """Set the given properties on many volumes in a single transaction.
+
+    The values may not include metadata or admin_metadata.  Returns the
+    number of volumes updated.
+
+    """
+    return IMPL.volume_update_many(context, volume_ids, values)
+
+
+def volume_status_transition_many(context, volume_ids, expected_status,
+                                  values):
+    """Update the volumes whose status is still the expected one.
+
+    expected_status may be a status or a list of statuses, the volumes in
+    another status are left unchanged.  Returns the number of volumes
+    updated.
+
+    """
+    return IMPL.volume_status_transition_many(context, volume_ids,
+                                              expected_status, values)
+
+
 ####################
 
 
@@ -256,6 +304,15 @@ def snapshot_create(context, values):
     return IMPL.snapshot_create(context, values)
 
 
+def snapshot_create_many(context, values_list):
+    """Create snapshots from a list of values dictionaries.
+
+    The snapshots are created in a single transaction and returned in the
+    order of values_list.
+    """
+    return IMPL.snapshot_create_many(context, values_list)
+
+
 def snapshot_destroy(context, snapshot_id):
     """Destroy the snapshot or raise if it does not exist."""
     return IMPL.snapshot_destroy(context, snapshot_id)
@@ -266,14 +323,22 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context):
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key=None, sort_dir=None):
     """Get all snapshots."""
-    return IMPL.snapshot_get_all(context)
+    return IMPL.snapshot_get_all(context, filters=filters, marker=marker,
+                                 limit=limit, sort_key=sort_key,
+                                 sort_dir=sort_dir)
 
 
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_key=None,
+                                sort_dir=None):
     """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id)
+    return IMPL.snapshot_get_all_by_project(context, project_id,
+                                            filters=filters, marker=marker,
+                                            limit=limit, sort_key=sort_key,
+                                            sort_dir=sort_dir)
 
 
 def snapshot_get_all_for_cgsnapshot(context, project_id):
@@ -302,12 +367,16 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
                                               volume_type_id)
 
 
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None):
     """Get all the snapshots inside the window.
 
-    Specifying a project_id will filter for a certain project.
+    Specifying a project_id will filter for a certain project.  When marker
+    or limit is given the snapshots are sorted by id and only the limit
+    snapshots following the marker id are returned.
     """
-    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id)
+    return IMPL.snapshot_get_active_by_window(context, begin, end, project_id,
+                                              marker=marker, limit=limit)
 
 
 ####################
@@ -453,12 +522,16 @@ def volume_type_destroy(context, id):
     return IMPL.volume_type_destroy(context, id)
 
 
-def volume_get_active_by_window(context, begin, end=None, project_id=None):
+def volume_get_active_by_window(context, begin, end=None, project_id=None,
+                                marker=None, limit=None):
     """Get all the volumes inside the window.
 
-    Specifying a project_id will filter for a certain project.
+    Specifying a project_id will filter for a certain project.  When marker
+    or limit is given the volumes are sorted by id and only the limit
+    volumes following the marker id are returned.
     """
-    return IMPL.volume_get_active_by_window(context, begin, end, project_id)
+    return IMPL.volume_get_active_by_window(context, begin, end, project_id,
+                                            marker=marker, limit=limit)
 
 
 def volume_type_access_get_all(context, type_id):
@@ -603,11 +676,22 @@ def volume_glance_metadata_create(context, volume_id, key, value):
                                               value)
 
 
+def volume_glance_metadata_bulk_create(context, volume_id, metadata):
+    """Add Glance metadata for specified volume (multiple pairs)."""
+    return IMPL.volume_glance_metadata_bulk_create(context, volume_id,
+                                                   metadata)
+
+
 def volume_glance_metadata_get_all(context):
     """Return the glance metadata for all volumes."""
     return IMPL.volume_glance_metadata_get_all(context)
 
 
+def volume_glance_metadata_list_get(context, volume_id_list):
+    """Return the glance metadata for a volume list."""
+    return IMPL.volume_glance_metadata_list_get(context, volume_id_list)
+
+
 def volume_glance_metadata_get(context, volume_id):
     """Return the glance metadata for a volume."""
     return IMPL.volume_glance_metadata_get(context, volume_id)
@@ -753,6 +837,17 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                               until_refresh, max_age, project_id=project_id)
 
 
+def quota_reserve_get_stats(context):
+    """Get the lock contention counters of quota_reserve in this process.
+
+    Returns a dict with the number of reservations, the total and maximum
+    seconds spent locking the usages, the number of usage refreshes done
+    without the lock, of those redone under the lock because the usage
+    changed meanwhile, and of deadlocks.
+    """
+    return IMPL.quota_reserve_get_stats(context)
+
+
 def reservation_commit(context, reservations, project_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -770,9 +865,13 @@ def quota_destroy_all_by_project(context, project_id):
     return IMPL.quota_destroy_all_by_project(context, project_id)
 
 
-def reservation_expire(context):
-    """Roll back any expired reservations."""
-    return IMPL.reservation_expire(context)
+def reservation_expire(context, batch_size=1000):
+    """Roll back any expired reservations.
+
+    The reservations are rolled back in transactions of at most batch_size
+    reservations.
+    """
+    return IMPL.reservation_expire(context, batch_size=batch_size)
 
 
 ###################
@@ -935,3 +1034,54 @@ def cgsnapshot_update(context, cgsnapshot_id, values):
 def cgsnapshot_destroy(context, cgsnapshot_id):
     """Destroy the cgsnapshot or raise if it does not exist."""
     return IMPL.cgsnapshot_destroy(context, cgsnapshot_id)
+
+
+###################
+
+
+def capacity_reservation_create(context, host, size, expire,
+                                resource_id=None):
+    """Record size GB of pending capacity on a pool."""
+    return IMPL.capacity_reservation_create(context, host, size, expire,
+                                            resource_id=resource_id)
+
+
+def capacity_reservation_get_all(context):
+    """Get all unexpired capacity reservations."""
+    return IMPL.capacity_reservation_get_all(context)
+
+
+def capacity_reservation_release(context, backend, before):
+    """Remove the reservations on a backend created before a given time."""
+    return IMPL.capacity_reservation_release(context, backend, before)
+
+
+###################
+
+
+def rate_limit_state_get(context, state_id):
+    """Get the API rate limit state of a user, or None."""
+    return IMPL.rate_limit_state_get(context, state_id)
+
+
+def rate_limit_state_update(context, state_id, update_func):
+    """Atomically update the API rate limit state of a user.
+
+    update_func is called with the current state, or None, while the row
+    is locked and returns the new state.
+    """
+    return IMPL.rate_limit_state_update(context, state_id, update_func)
+
+
+###################
+
+
+def purge_deleted_rows(context, age_in_days, batch_size=1000, throttle=0):
+    """Purge the rows soft-deleted more than age_in_days days ago.
+
+    The rows are removed in batches of batch_size rows, sleeping throttle
+    seconds between the batches.  Returns a dict mapping the table names to
+    the number of rows removed.
+    """
+    return IMPL.purge_deleted_rows(context, age_in_days,
+                                   batch_size=batch_size, throttle=throttle)
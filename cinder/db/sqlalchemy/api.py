@@ -19,6 +19,7 @@
 """Implementation of SQLAlchemy backend."""
 
 
+import datetime
 import functools
 import sys
 import threading
@@ -34,8 +35,10 @@ from oslo.utils import timeutils
 import osprofiler.sqlalchemy
 import six
 import sqlalchemy
+from sqlalchemy import and_
 from sqlalchemy import or_
 from sqlalchemy.orm import joinedload, joinedload_all
+from sqlalchemy.orm import load_only, noload
 from sqlalchemy.orm import RelationshipProperty
 from sqlalchemy.sql.expression import literal_column
 from sqlalchemy.sql.expression import true
@@ -43,10 +46,12 @@ from sqlalchemy.sql import func
 
 from cinder.common import sqlalchemyutils
 from cinder.db.sqlalchemy import models
+from cinder.db.sqlalchemy import query_stats
 from cinder import exception
-from cinder.i18n import _, _LW
+from cinder.i18n import _, _LI, _LW
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import uuidutils
+from cinder import utils
 
 
 CONF = cfg.CONF
@@ -57,6 +62,7 @@ options.set_defaults(CONF, connection='sqlite:///$state_path/cinder.sqlite')
 
 _LOCK = threading.Lock()
 _FACADE = None
+_REPLICA = threading.local()
 
 
 def _create_facade_lazily():
@@ -75,20 +81,30 @@ def _create_facade_lazily():
                                                       _FACADE.get_engine(),
                                                       "db")
 
+            query_stats.register(_FACADE.get_engine())
+            query_stats.register(_FACADE.get_engine(use_slave=True))
+
         return _FACADE
 
 
-def get_engine():
+def get_engine(use_slave=False):
     facade = _create_facade_lazily()
-    return facade.get_engine()
+    return facade.get_engine(use_slave=use_slave)
 
 
-def get_session(**kwargs):
+def get_session(use_slave=None, **kwargs):
+    """Return a session, on the replica within replica safe calls."""
+    if use_slave is None:
+        use_slave = getattr(_REPLICA, 'active', False)
     facade = _create_facade_lazily()
-    return facade.get_session(**kwargs)
+    return facade.get_session(use_slave=use_slave, **kwargs)
 
 _DEFAULT_QUOTA_NAME = 'default'
 
+# Number of ids in the IN clause of a statement updating many rows, below
+# the limit on the number of bound parameters of some databases.
+_IN_CHUNK_SIZE = 500
+
 
 def get_backend():
     """The backend is this module itself."""
@@ -175,6 +191,30 @@ def require_context(f):
     return wrapper
 
 
+def replica_safe(f):
+    """Decorator marking a read only DB API function as replica safe.
+
+    When db_replica_reads is enabled and a database replica is configured,
+    the sessions created by the function, and by the functions it calls,
+    use the replica unless the context sets read_replica to False to get
+    current data.
+    """
+
+    @functools.wraps(f)
+    def wrapper(context, *args, **kwargs):
+        if (not CONF.db_replica_reads or
+                not CONF.database.slave_connection or
+                getattr(context, 'read_replica', None) is False or
+                getattr(_REPLICA, 'active', False)):
+            return f(context, *args, **kwargs)
+        _REPLICA.active = True
+        try:
+            return f(context, *args, **kwargs)
+        finally:
+            _REPLICA.active = False
+    return wrapper
+
+
 def require_volume_exists(f):
     """Decorator to require the specified volume to exist.
 
@@ -460,6 +500,17 @@ def service_update(context, service_id, values):
         return service_ref
 
 
+@require_admin_context
+def service_heartbeat(context, service_id, values=None):
+    values = dict(values or {})
+    values['report_count'] = models.Service.report_count + 1
+    values['updated_at'] = timeutils.utcnow()
+    result = model_query(context, models.Service, read_deleted="no").\
+        filter_by(id=service_id).\
+        update(values, synchronize_session=False)
+    return result > 0
+
+
 ###################
 
 
@@ -730,17 +781,22 @@ def _quota_usage_create(context, project_id, resource, in_use, reserved,
 ###################
 
 
-def _reservation_create(context, uuid, usage, project_id, resource, delta,
-                        expire, session=None):
-    reservation_ref = models.Reservation()
-    reservation_ref.uuid = uuid
-    reservation_ref.usage_id = usage['id']
-    reservation_ref.project_id = project_id
-    reservation_ref.resource = resource
-    reservation_ref.delta = delta
-    reservation_ref.expire = expire
-    reservation_ref.save(session=session)
-    return reservation_ref
+def _reservations_create(context, usages, project_id, deltas, expire,
+                         session):
+    """Create the reservations of deltas with a single INSERT."""
+    now = timeutils.utcnow()
+    rows = [dict(created_at=now,
+                 deleted=False,
+                 uuid=str(uuid.uuid4()),
+                 usage_id=usages[resource]['id'],
+                 project_id=project_id,
+                 resource=resource,
+                 delta=delta,
+                 expire=expire)
+            for resource, delta in deltas.items()]
+    if rows:
+        session.execute(models.Reservation.__table__.insert(), rows)
+    return [row['uuid'] for row in rows]
 
 
 ###################
@@ -751,15 +807,103 @@ def _reservation_create(context, uuid, usage, project_id, resource, delta,
 # code always acquires the lock on quota_usages before acquiring the lock
 # on reservations.
 
-def _get_quota_usages(context, session, project_id):
+def _get_quota_usages(context, session, project_id, resources=None,
+                      lock=True):
     # Broken out for testability
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-        filter_by(project_id=project_id).\
-        with_lockmode('update').\
-        all()
-    return dict((row.resource, row) for row in rows)
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id)
+    if resources is not None:
+        # Only lock the rows of the resources being changed, so that
+        # requests on other resources of the project do not wait.
+        if not resources:
+            return {}
+        query = query.filter(models.QuotaUsage.resource.in_(resources))
+    if lock:
+        query = query.with_lockmode('update')
+    return dict((row.resource, row) for row in query.all())
+
+
+_quota_stats_lock = threading.Lock()
+_quota_stats = {'reservations': 0,
+                'lock_wait': 0.0,
+                'lock_wait_max': 0.0,
+                'refreshes': 0,
+                'refresh_conflicts': 0,
+                'deadlocks': 0}
+
+
+def _quota_stats_update(lock_wait=None, **counters):
+    with _quota_stats_lock:
+        if lock_wait is not None:
+            _quota_stats['lock_wait'] += lock_wait
+            _quota_stats['lock_wait_max'] = max(_quota_stats['lock_wait_max'],
+                                                lock_wait)
+        for name, value in counters.items():
+            _quota_stats[name] += value
+
+
+def quota_reserve_get_stats(context):
+    with _quota_stats_lock:
+        return dict(_quota_stats)
+
+
+def _quota_usage_needs_refresh(usage, max_age):
+    # NOTE: until_refresh is counted down by the caller.
+    if usage is None:
+        return True
+    if usage.in_use < 0:
+        # Negative in_use count indicates a desync, so try to
+        # heal from that...
+        return True
+    if usage.until_refresh is not None:
+        return usage.until_refresh <= 0
+    return bool(max_age and usage.updated_at is not None and (
+        (usage.updated_at - timeutils.utcnow()).seconds >= max_age))
+
+
+def _quota_sync(context, resources, resource, project_id, session=None):
+    sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
+    volume_type_id = getattr(resources[resource], 'volume_type_id', None)
+    volume_type_name = getattr(resources[resource], 'volume_type_name', None)
+    return sync(context, project_id,
+                volume_type_id=volume_type_id,
+                volume_type_name=volume_type_name,
+                session=session)
+
+
+def _quota_usages_presync(context, resources, deltas, max_age, project_id):
+    """Run the usage refreshes likely to be needed, without any lock.
+
+    Returns a dict mapping the refreshed resources to the in_use value they
+    had before the refresh and the result of their sync routine.  The
+    caller uses a result only if in_use did not change in the meantime.
+    """
+    usages = _get_quota_usages(context, None, project_id,
+                               resources=deltas.keys(), lock=False)
+    synced = {}
+    for resource in deltas:
+        if resource in synced:
+            continue
+        usage = usages.get(resource)
+        if (usage is not None and usage.in_use >= 0 and
+                usage.until_refresh is not None):
+            # The countdown is decremented under the lock.
+            needs_refresh = usage.until_refresh - 1 <= 0
+        else:
+            needs_refresh = _quota_usage_needs_refresh(usage, max_age)
+        if not needs_refresh:
+            continue
+
+        in_use = usage.in_use if usage is not None else None
+        updates = _quota_sync(context, resources, resource, project_id)
+        for res in updates:
+            seen = usages.get(res)
+            synced[res] = (seen.in_use if seen is not None else None,
+                           updates)
+        synced.setdefault(resource, (in_use, updates))
+    return synced
 
 
 @require_context
@@ -767,128 +911,140 @@ def _get_quota_usages(context, session, project_id):
 def quota_reserve(context, resources, quotas, deltas, expire,
                   until_refresh, max_age, project_id=None):
     elevated = context.elevated()
+    if project_id is None:
+        project_id = context.project_id
+
+    # The sync routines count the resources of the project, which can be
+    # slow, so the refreshes are done before locking the usages.
+    synced = _quota_usages_presync(elevated, resources, deltas, max_age,
+                                   project_id)
+    refresh_conflicts = 0
+
     session = get_session()
-    with session.begin():
-        if project_id is None:
-            project_id = context.project_id
-
-        # Get the current usages
-        usages = _get_quota_usages(context, session, project_id)
-
-        # Handle usage refresh
-        work = set(deltas.keys())
-        while work:
-            resource = work.pop()
-
-            # Do we need to refresh the usage?
-            refresh = False
-            if resource not in usages:
-                usages[resource] = _quota_usage_create(elevated,
-                                                       project_id,
-                                                       resource,
-                                                       0, 0,
-                                                       until_refresh or None,
-                                                       session=session)
-                refresh = True
-            elif usages[resource].in_use < 0:
-                # Negative in_use count indicates a desync, so try to
-                # heal from that...
-                refresh = True
-            elif usages[resource].until_refresh is not None:
-                usages[resource].until_refresh -= 1
-                if usages[resource].until_refresh <= 0:
+    try:
+        with session.begin():
+            # Get the current usages
+            start = time.time()
+            usages = _get_quota_usages(context, session, project_id,
+                                       resources=deltas.keys())
+            lock_wait = time.time() - start
+            created = set()
+
+            # Handle usage refresh
+            work = set(deltas.keys())
+            while work:
+                resource = work.pop()
+
+                # Do we need to refresh the usage?
+                if resource not in usages:
+                    usages[resource] = _quota_usage_create(
+                        elevated, project_id, resource, 0, 0,
+                        until_refresh or None, session=session)
+                    created.add(resource)
                     refresh = True
-            elif max_age and usages[resource].updated_at is not None and (
-                (usages[resource].updated_at -
-                    timeutils.utcnow()).seconds >= max_age):
-                refresh = True
-
-            # OK, refresh the usage
-            if refresh:
-                # Grab the sync routine
-                sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
-                volume_type_id = getattr(resources[resource],
-                                         'volume_type_id', None)
-                volume_type_name = getattr(resources[resource],
-                                           'volume_type_name', None)
-                updates = sync(elevated, project_id,
-                               volume_type_id=volume_type_id,
-                               volume_type_name=volume_type_name,
-                               session=session)
-                for res, in_use in updates.items():
-                    # Make sure we have a destination for the usage!
-                    if res not in usages:
-                        usages[res] = _quota_usage_create(
-                            elevated,
-                            project_id,
-                            res,
-                            0, 0,
-                            until_refresh or None,
-                            session=session
-                        )
-
-                    # Update the usage
-                    usages[res].in_use = in_use
-                    usages[res].until_refresh = until_refresh or None
-
-                    # Because more than one resource may be refreshed
-                    # by the call to the sync routine, and we don't
-                    # want to double-sync, we make sure all refreshed
-                    # resources are dropped from the work set.
-                    work.discard(res)
-
-                    # NOTE(Vek): We make the assumption that the sync
-                    #            routine actually refreshes the
-                    #            resources that it is the sync routine
-                    #            for.  We don't check, because this is
-                    #            a best-effort mechanism.
-
-        # Check for deltas that would go negative
-        unders = [r for r, delta in deltas.items()
-                  if delta < 0 and delta + usages[r].in_use < 0]
-
-        # Now, let's check the quotas
-        # NOTE(Vek): We're only concerned about positive increments.
-        #            If a project has gone over quota, we want them to
-        #            be able to reduce their usage without any
-        #            problems.
-        overs = [r for r, delta in deltas.items()
-                 if quotas[r] >= 0 and delta >= 0 and
-                 quotas[r] < delta + usages[r].total]
-
-        # NOTE(Vek): The quota check needs to be in the transaction,
-        #            but the transaction doesn't fail just because
-        #            we're over quota, so the OverQuota raise is
-        #            outside the transaction.  If we did the raise
-        #            here, our usage updates would be discarded, but
-        #            they're not invalidated by being over-quota.
-
-        # Create the reservations
-        if not overs:
-            reservations = []
-            for resource, delta in deltas.items():
-                reservation = _reservation_create(elevated,
-                                                  str(uuid.uuid4()),
-                                                  usages[resource],
-                                                  project_id,
-                                                  resource, delta, expire,
-                                                  session=session)
-                reservations.append(reservation.uuid)
-
-                # Also update the reserved quantity
-                # NOTE(Vek): Again, we are only concerned here about
-                #            positive increments.  Here, though, we're
-                #            worried about the following scenario:
-                #
-                #            1) User initiates resize down.
-                #            2) User allocates a new instance.
-                #            3) Resize down fails or is reverted.
-                #            4) User is now over quota.
-                #
-                #            To prevent this, we only update the
-                #            reserved value if the delta is positive.
-                if delta > 0:
-                    usages[resource].reserved += delta
+                else:
+                    usage = usages[resource]
+                    if usage.in_use >= 0 and usage.until_refresh is not None:
+                        usage.until_refresh -= 1
+                    refresh = _quota_usage_needs_refresh(usage, max_age)
+
+                # OK, refresh the usage
+                if refresh:
+                    # Use the refresh done without the lock if the usage
+                    # did not change since.
+                    seen, updates = synced.get(resource, (None, None))
+                    current = (None if resource in created
+                               else usages[resource].in_use)
+                    if updates is not None and seen != current:
+                        refresh_conflicts += 1
+                        updates = None
+                    if updates is None:
+                        updates = _quota_sync(elevated, resources, resource,
+                                              project_id, session=session)
+
+                    for res, in_use in updates.items():
+                        # Make sure we have a destination for the usage!
+                        if res not in usages:
+                            usages.update(_get_quota_usages(
+                                context, session, project_id,
+                                resources=[res]))
+                        if res not in usages:
+                            usages[res] = _quota_usage_create(
+                                elevated,
+                                project_id,
+                                res,
+                                0, 0,
+                                until_refresh or None,
+                                session=session
+                            )
+
+                        # Update the usage
+                        usages[res].in_use = in_use
+                        usages[res].until_refresh = until_refresh or None
+
+                        # Because more than one resource may be refreshed
+                        # by the call to the sync routine, and we don't
+                        # want to double-sync, we make sure all refreshed
+                        # resources are dropped from the work set.
+                        work.discard(res)
+
+                        # NOTE(Vek): We make the assumption that the sync
+                        #            routine actually refreshes the
+                        #            resources that it is the sync routine
+                        #            for.  We don't check, because this is
+                        #            a best-effort mechanism.
+
+            # Check for deltas that would go negative
+            unders = [r for r, delta in deltas.items()
+                      if delta < 0 and delta + usages[r].in_use < 0]
+
+            # Now, let's check the quotas
+            # NOTE(Vek): We're only concerned about positive increments.
+            #            If a project has gone over quota, we want them to
+            #            be able to reduce their usage without any
+            #            problems.
+            overs = [r for r, delta in deltas.items()
+                     if quotas[r] >= 0 and delta >= 0 and
+                     quotas[r] < delta + usages[r].total]
+
+            # NOTE(Vek): The quota check needs to be in the transaction,
+            #            but the transaction doesn't fail just because
+            #            we're over quota, so the OverQuota raise is
+            #            outside the transaction.  If we did the raise
+            #            here, our usage updates would be discarded, but
+            #            they're not invalidated by being over-quota.
+
+            # Create the reservations
+            if not overs:
+                reservations = _reservations_create(elevated, usages,
+                                                    project_id, deltas,
+                                                    expire, session)
+                for resource, delta in deltas.items():
+                    # Also update the reserved quantity
+                    # NOTE(Vek): Again, we are only concerned here about
+                    #            positive increments.  Here, though, we're
+                    #            worried about the following scenario:
+                    #
+                    #            1) User initiates resize down.
+                    #            2) User allocates a new instance.
+                    #            3) Resize down fails or is reverted.
+                    #            4) User is now over quota.
+                    #
+                    #            To prevent this, we only update the
+                    #            reserved value if the delta is positive.
+                    if delta > 0:
+                        usages[resource].reserved += delta
+    except db_exc.DBDeadlock:
+        _quota_stats_update(deadlocks=1)
+        raise
+
+    _quota_stats_update(lock_wait=lock_wait, reservations=1,
+                        refreshes=len(synced),
+                        refresh_conflicts=refresh_conflicts)
+    LOG.debug("Quota usages of project %(project)s locked in %(wait).3fs "
+              "for %(resources)s, %(conflicts)d refresh conflict(s)",
+              {'project': project_id, 'wait': lock_wait,
+               'resources': sorted(deltas), 'conflicts': refresh_conflicts})
 
     if unders:
         LOG.warning(_LW("Change will make usage less than 0 for the following "
@@ -902,6 +1058,17 @@ def quota_reserve(context, resources, quotas, deltas, expire,
     return reservations
 
 
+def _quota_reservation_resources(session, context, reservations):
+    """Return the resources of the reservations, without locking them."""
+    rows = model_query(context, models.Reservation.resource,
+                       read_deleted="no",
+                       session=session).\
+        filter(models.Reservation.uuid.in_(reservations)).\
+        distinct().\
+        all()
+    return [row.resource for row in rows]
+
+
 def _quota_reservations(session, context, reservations):
     """Return the relevant reservations."""
 
@@ -919,7 +1086,10 @@ def _quota_reservations(session, context, reservations):
 def reservation_commit(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
+        usages = _get_quota_usages(
+            context, session, project_id,
+            resources=_quota_reservation_resources(session, context,
+                                                   reservations))
 
         for reservation in _quota_reservations(session, context, reservations):
             usage = usages[reservation.resource]
@@ -935,7 +1105,10 @@ def reservation_commit(context, reservations, project_id=None):
 def reservation_rollback(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
+        usages = _get_quota_usages(
+            context, session, project_id,
+            resources=_quota_reservation_resources(session, context,
+                                                   reservations))
 
         for reservation in _quota_reservations(session, context, reservations):
             usage = usages[reservation.resource]
@@ -977,22 +1150,60 @@ def quota_destroy_all_by_project(context, project_id):
 
 @require_admin_context
 @_retry_on_deadlock
-def reservation_expire(context):
-    session = get_session()
-    with session.begin():
-        current_time = timeutils.utcnow()
-        results = model_query(context, models.Reservation, session=session,
-                              read_deleted="no").\
-            filter(models.Reservation.expire < current_time).\
-            all()
-
-        if results:
-            for reservation in results:
-                if reservation.delta >= 0:
-                    reservation.usage.reserved -= reservation.delta
-                    reservation.usage.save(session=session)
-
-                reservation.delete(session=session)
+def reservation_expire(context, batch_size=1000):
+    current_time = timeutils.utcnow()
+    while True:
+        session = get_session()
+        with session.begin():
+            candidates = model_query(context, models.Reservation.id,
+                                     models.Reservation.usage_id,
+                                     session=session, read_deleted="no").\
+                filter(models.Reservation.expire < current_time).\
+                limit(batch_size).\
+                all()
+            if not candidates:
+                break
+
+            # Lock the usages before the reservations, see the note above
+            # _get_quota_usages, then read the reservations again as they
+            # may have been committed or rolled back in the meantime.
+            model_query(context, models.QuotaUsage.id, session=session,
+                        read_deleted="no").\
+                filter(models.QuotaUsage.id.in_(
+                    set(usage_id for _id, usage_id in candidates))).\
+                order_by(models.QuotaUsage.id).\
+                with_lockmode('update').\
+                all()
+            rows = model_query(context, models.Reservation.id,
+                               models.Reservation.usage_id,
+                               models.Reservation.delta, session=session,
+                               read_deleted="no").\
+                filter(models.Reservation.id.in_(
+                    [reservation_id for reservation_id, _id in candidates])).\
+                with_lockmode('update').\
+                all()
+
+            reserved = {}
+            for reservation_id, usage_id, delta in rows:
+                if delta >= 0:
+                    reserved[usage_id] = reserved.get(usage_id, 0) + delta
+            for usage_id, delta in reserved.items():
+                model_query(context, models.QuotaUsage, session=session,
+                            read_deleted="no").\
+                    filter_by(id=usage_id).\
+                    update({'reserved': models.QuotaUsage.reserved - delta},
+                           synchronize_session=False)
+
+            if rows:
+                model_query(context, models.Reservation, session=session,
+                            read_deleted="no").\
+                    filter(models.Reservation.id.in_(
+                        [row[0] for row in rows])).\
+                    update({'deleted': True,
+                            'deleted_at': current_time},
+                           synchronize_session=False)
+        if len(candidates) < batch_size:
+            break
 
 
 ###################
@@ -1195,18 +1406,47 @@ def volume_detached(context, volume_id):
         volume_ref['attach_time'] = None
 
 
+def _load_fields(query, model, fields):
+    """Restrict a query to the given columns and relationships of model.
+
+    The primary key is always loaded, the other columns are deferred and the
+    other relationships are not loaded at all, so the returned objects are
+    only meant to be read for the requested fields.
+    """
+    relationships = sqlalchemy.inspect(model).relationships
+    columns = [field for field in fields if field not in relationships]
+    query = query.options(load_only(*columns)) if columns else query
+    for field in fields:
+        if field in relationships:
+            query = query.options(joinedload(field))
+    return query.options(noload('*'))
+
+
 @require_context
-def _volume_get_query(context, session=None, project_only=False):
+def _volume_get_query(context, session=None, project_only=False,
+                      fields=None):
+    """Get the query to retrieve the volume.
+
+    :param context: the context used to run the method _volume_get_query
+    :param session: the session to use
+    :param project_only: the boolean used to decide whether to query the
+                         volume in the current project or all projects
+    :param fields: names of the columns and relationships to load, all the
+                   columns and relationships are loaded when None
+    :returns: the query
+    """
+    query = model_query(context, models.Volume, session=session,
+                        project_only=project_only)
+    if fields is not None:
+        return _load_fields(query, models.Volume, fields)
     if is_admin_context(context):
-        return model_query(context, models.Volume, session=session,
-                           project_only=project_only).\
+        return query.\
             options(joinedload('volume_metadata')).\
             options(joinedload('volume_admin_metadata')).\
             options(joinedload('volume_type')).\
             options(joinedload('consistencygroup'))
     else:
-        return model_query(context, models.Volume, session=session,
-                           project_only=project_only).\
+        return query.\
             options(joinedload('volume_metadata')).\
             options(joinedload('volume_type')).\
             options(joinedload('consistencygroup'))
@@ -1230,27 +1470,35 @@ def volume_get(context, volume_id):
 
 
 @require_admin_context
+@replica_safe
 def volume_get_all(context, marker, limit, sort_key, sort_dir,
-                   filters=None):
+                   filters=None, fields=None, cursor=None):
     """Retrieves all volumes.
 
     :param context: context to query under
     :param marker: the last item of the previous page, used to determine the
                    next page of results to return
     :param limit: maximum number of items to return
-    :param sort_key: single attributes by which results should be sorted
-    :param sort_dir: direction in which results should be sorted (asc, desc)
+    :param sort_key: attribute or list of attributes by which results
+                     should be sorted
+    :param sort_dir: direction or list of directions in which results
+                     should be sorted (asc, desc)
     :param filters: Filters for the query. A filter key/value of
                     'no_migration_targets'=True causes volumes with either
                     a NULL 'migration_status' or a 'migration_status' that
                     does not start with 'target:' to be retrieved.
+    :param fields: names of the columns and relationships to load, all of
+                   them when None
+    :param cursor: pagination cursor of the last item of the previous page,
+                   used instead of marker to seek the next results
     :returns: list of matching volumes
     """
     session = get_session()
     with session.begin():
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_key, sort_dir, filters)
+                                         sort_key, sort_dir, filters,
+                                         fields=fields, cursor=cursor)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1258,8 +1506,12 @@ def volume_get_all(context, marker, limit, sort_key, sort_dir,
 
 
 @require_admin_context
-def volume_get_all_by_host(context, host):
-    """Retrieves all volumes hosted on a host."""
+def volume_get_all_by_host(context, host, fields=None):
+    """Retrieves all volumes hosted on a host.
+
+    :param fields: names of the columns and relationships to load, all of
+                   them when None
+    """
     # As a side effect of the introduction of pool-aware scheduler,
     # newly created volumes will have pool information appended to
     # 'host' field of a volume record. So a volume record in DB can
@@ -1272,7 +1524,8 @@ def volume_get_all_by_host(context, host):
             host_attr = getattr(models.Volume, 'host')
             conditions = [host_attr == host,
                           host_attr.op('LIKE')(host + '#%')]
-            result = _volume_get_query(context).filter(or_(*conditions)).all()
+            result = _volume_get_query(context, fields=fields).\
+                filter(or_(*conditions)).all()
             return result
     elif not host:
         return []
@@ -1285,8 +1538,10 @@ def volume_get_all_by_group(context, group_id):
 
 
 @require_context
+@replica_safe
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir, filters=None):
+                              sort_dir, filters=None, fields=None,
+                              cursor=None):
     """"Retrieves all volumes in a project.
 
     :param context: context to query under
@@ -1294,12 +1549,18 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
     :param marker: the last item of the previous page, used to determine the
                    next page of results to return
     :param limit: maximum number of items to return
-    :param sort_key: single attributes by which results should be sorted
-    :param sort_dir: direction in which results should be sorted (asc, desc)
+    :param sort_key: attribute or list of attributes by which results
+                     should be sorted
+    :param sort_dir: direction or list of directions in which results
+                     should be sorted (asc, desc)
     :param filters: Filters for the query. A filter key/value of
                     'no_migration_targets'=True causes volumes with either
                     a NULL 'migration_status' or a 'migration_status' that
                     does not start with 'target:' to be retrieved.
+    :param fields: names of the columns and relationships to load, all of
+                   them when None
+    :param cursor: pagination cursor of the last item of the previous page,
+                   used instead of marker to seek the next results
     :returns: list of matching volumes
     """
     session = get_session()
@@ -1310,7 +1571,8 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
         filters['project_id'] = project_id
         # Generate the query
         query = _generate_paginate_query(context, session, marker, limit,
-                                         sort_key, sort_dir, filters)
+                                         sort_key, sort_dir, filters,
+                                         fields=fields, cursor=cursor)
         # No volumes would match, return empty list
         if query is None:
             return []
@@ -1318,7 +1580,8 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
 
 
 def _generate_paginate_query(context, session, marker, limit, sort_key,
-                             sort_dir, filters):
+                             sort_dir, filters, paginate_type=models.Volume,
+                             fields=None, cursor=None):
     """Generate the query to include the filters and the paginate options.
 
     Returns a query with sorting / pagination criteria added or None
@@ -1329,93 +1592,148 @@ def _generate_paginate_query(context, session, marker, limit, sort_key,
     :param marker: the last item of the previous page; we returns the next
                     results after this value.
     :param limit: maximum number of items to return
-    :param sort_key: single attributes by which results should be sorted
-    :param sort_dir: direction in which results should be sorted (asc, desc)
+    :param sort_key: attribute or list of attributes by which results
+                     should be sorted
+    :param sort_dir: direction or list of directions in which results
+                     should be sorted (asc, desc)
     :param filters: dictionary of filters; values that are lists,
                     tuples, sets, or frozensets cause an 'IN' test to
                     be performed, while exact matching ('==' operator)
                     is used for other values
+    :param paginate_type: type of pagination to generate, one of the models
+                          in PAGINATION_HELPERS
+    :param fields: names of the columns and relationships to load, all of
+                   them when None
+    :param cursor: pagination cursor of the last item of the previous page,
+                   used instead of marker to seek the next results
     :returns: updated query or None
     """
-    query = _volume_get_query(context, session=session)
+    get_query, process_filters, get = PAGINATION_HELPERS[paginate_type]
+
+    query = get_query(context, session=session, fields=fields)
 
     if filters:
-        filters = filters.copy()
+        query = process_filters(query, filters)
+        if query is None:
+            return None
 
-        # 'no_migration_targets' is unique, must be either NULL or
-        # not start with 'target:'
-        if ('no_migration_targets' in filters and
-                filters['no_migration_targets'] is True):
-            filters.pop('no_migration_targets')
-            try:
-                column_attr = getattr(models.Volume, 'migration_status')
-                conditions = [column_attr == None,  # noqa
-                              column_attr.op('NOT LIKE')('target:%')]
-                query = query.filter(or_(*conditions))
-            except AttributeError:
-                log_msg = _("'migration_status' column could not be found.")
-                LOG.debug(log_msg)
-                return None
-
-        # Apply exact match filters for everything else, ensure that the
-        # filter value exists on the model
-        for key in filters.keys():
-            # metadata is unique, must be a dict
-            if key == 'metadata':
-                if not isinstance(filters[key], dict):
-                    log_msg = _("'metadata' filter value is not valid.")
-                    LOG.debug(log_msg)
-                    return None
-                continue
-            try:
-                column_attr = getattr(models.Volume, key)
-                # Do not allow relationship properties since those require
-                # schema specific knowledge
-                prop = getattr(column_attr, 'property')
-                if isinstance(prop, RelationshipProperty):
-                    log_msg = (_("'%s' filter key is not valid, "
-                                 "it maps to a relationship.")) % key
-                    LOG.debug(log_msg)
-                    return None
-            except AttributeError:
-                log_msg = _("'%s' filter key is not valid.") % key
+    sort_keys, sort_dirs = utils.get_pagination_sort_params(sort_key,
+                                                            sort_dir)
+    if cursor is not None:
+        return sqlalchemyutils.paginate_query_by_cursor(
+            query, paginate_type, limit, sort_keys, sort_dirs,
+            cursor_values=utils.decode_pagination_cursor(cursor))
+
+    marker_object = None
+    if marker is not None:
+        marker_object = get(context, marker, session)
+
+    return sqlalchemyutils.paginate_query(query, paginate_type, limit,
+                                          sort_keys,
+                                          marker=marker_object,
+                                          sort_dirs=sort_dirs)
+
+
+def _validate_filter_keys(model, filters, special_keys=()):
+    """Check that the filter keys map to columns of model.
+
+    :param model: the model the filters apply to
+    :param filters: dictionary of filters
+    :param special_keys: keys handled by the caller, which are not checked
+    :returns: True if every filter key is valid
+    """
+    for key in filters.keys():
+        if key in special_keys:
+            continue
+        try:
+            column_attr = getattr(model, key)
+            # Do not allow relationship properties since those require
+            # schema specific knowledge
+            prop = getattr(column_attr, 'property')
+            if isinstance(prop, RelationshipProperty):
+                log_msg = (_("'%s' filter key is not valid, "
+                             "it maps to a relationship.")) % key
                 LOG.debug(log_msg)
-                return None
-
-        # Holds the simple exact matches
-        filter_dict = {}
-
-        # Iterate over all filters, special case the filter is necessary
-        for key, value in filters.iteritems():
-            if key == 'metadata':
-                # model.VolumeMetadata defines the backref to Volumes as
-                # 'volume_metadata' or 'volume_admin_metadata', use those as
-                # column attribute keys
-                col_attr = getattr(models.Volume, 'volume_metadata')
-                col_ad_attr = getattr(models.Volume, 'volume_admin_metadata')
-                for k, v in value.iteritems():
-                    query = query.filter(or_(col_attr.any(key=k, value=v),
-                                             col_ad_attr.any(key=k, value=v)))
-            elif isinstance(value, (list, tuple, set, frozenset)):
-                # Looking for values in a list; apply to query directly
-                column_attr = getattr(models.Volume, key)
-                query = query.filter(column_attr.in_(value))
-            else:
-                # OK, simple exact match; save for later
-                filter_dict[key] = value
+                return False
+        except AttributeError:
+            log_msg = _("'%s' filter key is not valid.") % key
+            LOG.debug(log_msg)
+            return False
+    return True
 
-        # Apply simple exact matches
-        if filter_dict:
-            query = query.filter_by(**filter_dict)
 
-    marker_volume = None
-    if marker is not None:
-        marker_volume = _volume_get(context, marker, session)
+def _process_volume_filters(query, filters):
+    """Common filter processing for Volume queries.
+
+    Filter values that are in lists, tuples, or frozensets cause an 'IN' test
+    to be performed, while exact matching ('==' operator) is used for other
+    values.
+
+    A filter key/value of 'no_migration_targets'=True causes volumes with
+    either a NULL 'migration_status' or a 'migration_status' that does not
+    start with 'target:' to be retrieved.
+
+    A 'metadata' filter key must correspond to a dictionary value of metadata
+    key-value pairs.
+
+    :param query: Model query to use
+    :param filters: dictionary of filters
+    :returns: updated query or None
+    """
+    filters = filters.copy()
+
+    # 'no_migration_targets' is unique, must be either NULL or
+    # not start with 'target:'
+    if ('no_migration_targets' in filters and
+            filters['no_migration_targets'] is True):
+        filters.pop('no_migration_targets')
+        try:
+            column_attr = getattr(models.Volume, 'migration_status')
+            conditions = [column_attr == None,  # noqa
+                          column_attr.op('NOT LIKE')('target:%')]
+            query = query.filter(or_(*conditions))
+        except AttributeError:
+            log_msg = _("'migration_status' column could not be found.")
+            LOG.debug(log_msg)
+            return None
+
+    # metadata is unique, must be a dict
+    if 'metadata' in filters and not isinstance(filters['metadata'], dict):
+        log_msg = _("'metadata' filter value is not valid.")
+        LOG.debug(log_msg)
+        return None
+
+    # Apply exact match filters for everything else, ensure that the
+    # filter value exists on the model
+    if not _validate_filter_keys(models.Volume, filters, ('metadata',)):
+        return None
 
-    return sqlalchemyutils.paginate_query(query, models.Volume, limit,
-                                          [sort_key, 'created_at', 'id'],
-                                          marker=marker_volume,
-                                          sort_dir=sort_dir)
+    # Holds the simple exact matches
+    filter_dict = {}
+
+    # Iterate over all filters, special case the filter is necessary
+    for key, value in filters.iteritems():
+        if key == 'metadata':
+            # model.VolumeMetadata defines the backref to Volumes as
+            # 'volume_metadata' or 'volume_admin_metadata', use those as
+            # column attribute keys
+            col_attr = getattr(models.Volume, 'volume_metadata')
+            col_ad_attr = getattr(models.Volume, 'volume_admin_metadata')
+            for k, v in value.iteritems():
+                query = query.filter(or_(col_attr.any(key=k, value=v),
+                                         col_ad_attr.any(key=k, value=v)))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            # Looking for values in a list; apply to query directly
+            column_attr = getattr(models.Volume, key)
+            query = query.filter(column_attr.in_(value))
+        else:
+            # OK, simple exact match; save for later
+            filter_dict[key] = value
+
+    # Apply simple exact matches
+    if filter_dict:
+        query = query.filter_by(**filter_dict)
+    return query
 
 
 @require_admin_context
@@ -1456,6 +1774,41 @@ def volume_update(context, volume_id, values):
         return volume_ref
 
 
+def _volume_update_many(context, volume_ids, values, *criterion):
+    if 'metadata' in values or 'admin_metadata' in values:
+        raise exception.InvalidInput(
+            reason=_('Metadata cannot be updated for many volumes.'))
+
+    volume_ids = list(volume_ids)
+    result = 0
+    session = get_session()
+    with session.begin():
+        for i in range(0, len(volume_ids), _IN_CHUNK_SIZE):
+            chunk = volume_ids[i:i + _IN_CHUNK_SIZE]
+            result += model_query(context, models.Volume, session=session,
+                                  project_only=True).\
+                filter(models.Volume.id.in_(chunk)).\
+                filter(*criterion).\
+                update(values, synchronize_session=False)
+    return result
+
+
+@require_context
+@_retry_on_deadlock
+def volume_update_many(context, volume_ids, values):
+    return _volume_update_many(context, volume_ids, values)
+
+
+@require_context
+@_retry_on_deadlock
+def volume_status_transition_many(context, volume_ids, expected_status,
+                                  values):
+    if isinstance(expected_status, six.string_types):
+        expected_status = [expected_status]
+    return _volume_update_many(context, volume_ids, values,
+                               models.Volume.status.in_(expected_status))
+
+
 ####################
 
 def _volume_x_metadata_get_query(context, volume_id, model, session=None):
@@ -1485,47 +1838,65 @@ def _volume_x_metadata_get_item(context, volume_id, key, model, notfound_exec,
     return result
 
 
-def _volume_x_metadata_update(context, volume_id, metadata, delete,
-                              model, notfound_exec, session=None):
-    if not session:
-        session = get_session()
+def _metadata_rows_update(query, model, metadata, delete, session,
+                          **parent):
+    """Update the key/value metadata rows selected by query in bulk.
+
+    The existing keys are read once, then the removed keys are soft deleted,
+    the changed values updated and the new keys inserted, each with a single
+    statement.
 
+    :param query: query selecting the current metadata rows
+    :param model: the metadata model
+    :param metadata: dictionary of the metadata to set
+    :param delete: whether to delete the keys missing from metadata
+    :param session: the session to use
+    :param parent: the foreign key value of the new rows, like volume_id
+    :returns: the resulting metadata dictionary
+    """
     with session.begin(subtransactions=True):
-        # Set existing metadata to deleted if delete argument is True
+        original = dict(query.with_entities(model.key, model.value).all())
+        now = timeutils.utcnow()
+
         if delete:
-            original_metadata = _volume_x_metadata_get(context, volume_id,
-                                                       model, session=session)
-            for meta_key, meta_value in original_metadata.iteritems():
-                if meta_key not in metadata:
-                    meta_ref = _volume_x_metadata_get_item(context, volume_id,
-                                                           meta_key, model,
-                                                           notfound_exec,
-                                                           session=session)
-                    meta_ref.update({'deleted': True})
-                    meta_ref.save(session=session)
-
-        meta_ref = None
-
-        # Now update all existing items with new values, or create new meta
-        # objects
-        for meta_key, meta_value in metadata.items():
-
-            # update the value whether it exists or not
-            item = {"value": meta_value}
+            removed = [key for key in original if key not in metadata]
+            if removed:
+                query.filter(model.key.in_(removed)).\
+                    update({'deleted': True,
+                            'deleted_at': now,
+                            'updated_at': literal_column('updated_at')},
+                           synchronize_session=False)
+
+        changed = dict((key, value) for key, value in metadata.iteritems()
+                       if key in original and original[key] != value)
+        if changed:
+            query.filter(model.key.in_(changed.keys())).\
+                update({'value': sqlalchemy.case(changed, value=model.key),
+                        'updated_at': now},
+                       synchronize_session=False)
+
+        added = [dict(parent, key=key, value=value, created_at=now)
+                 for key, value in metadata.iteritems()
+                 if key not in original]
+        if added:
+            session.execute(model.__table__.insert(), added)
+
+    if delete:
+        return dict(metadata)
+    result = original.copy()
+    result.update(metadata)
+    return result
 
-            try:
-                meta_ref = _volume_x_metadata_get_item(context, volume_id,
-                                                       meta_key, model,
-                                                       notfound_exec,
-                                                       session=session)
-            except notfound_exec:
-                meta_ref = model()
-                item.update({"key": meta_key, "volume_id": volume_id})
 
-            meta_ref.update(item)
-            meta_ref.save(session=session)
+def _volume_x_metadata_update(context, volume_id, metadata, delete,
+                              model, notfound_exec, session=None):
+    if not session:
+        session = get_session()
 
-    return _volume_x_metadata_get(context, volume_id, model)
+    query = _volume_x_metadata_get_query(context, volume_id, model,
+                                         session=session)
+    return _metadata_rows_update(query, model, metadata, delete, session,
+                                 volume_id=volume_id)
 
 
 def _volume_user_metadata_get_query(context, volume_id, session=None):
@@ -1657,6 +2028,37 @@ def snapshot_create(context, values):
         return _snapshot_get(context, values['id'], session=session)
 
 
+@require_context
+@_retry_on_deadlock
+def snapshot_create_many(context, values_list):
+    snapshot_ids = []
+    session = get_session()
+    with session.begin():
+        for values in values_list:
+            values = dict(values)
+            values['snapshot_metadata'] = _metadata_refs(
+                values.get('metadata'), models.SnapshotMetadata)
+            if not values.get('id'):
+                values['id'] = str(uuid.uuid4())
+            snapshot_ref = models.Snapshot()
+            snapshot_ref.update(values)
+            session.add(snapshot_ref)
+            snapshot_ids.append(str(values['id']))
+
+        if not snapshot_ids:
+            return []
+        session.flush()
+        snapshots = model_query(context, models.Snapshot, session=session,
+                                project_only=True).\
+            options(joinedload('volume')).\
+            options(joinedload('snapshot_metadata')).\
+            filter(models.Snapshot.id.in_(snapshot_ids)).\
+            all()
+
+    snapshots = dict((snapshot['id'], snapshot) for snapshot in snapshots)
+    return [snapshots[snapshot_id] for snapshot_id in snapshot_ids]
+
+
 @require_admin_context
 @_retry_on_deadlock
 def snapshot_destroy(context, snapshot_id):
@@ -1695,11 +2097,98 @@ def snapshot_get(context, snapshot_id):
     return _snapshot_get(context, snapshot_id)
 
 
+def _snaps_get_query(context, session=None, project_only=False,
+                     fields=None):
+    query = model_query(context, models.Snapshot, session=session,
+                        project_only=project_only)
+    if fields is not None:
+        return _load_fields(query, models.Snapshot, fields)
+    return query.options(joinedload('snapshot_metadata'))
+
+
+def _process_snaps_filters(query, filters):
+    """Common filter processing for Snapshot queries.
+
+    Filter values that are in lists, tuples, or frozensets cause an 'IN' test
+    to be performed, while exact matching ('==' operator) is used for other
+    values. A 'metadata' filter key must correspond to a dictionary value of
+    metadata key-value pairs.
+
+    :param query: Model query to use
+    :param filters: dictionary of filters
+    :returns: updated query or None
+    """
+    # metadata is unique, must be a dict
+    if 'metadata' in filters and not isinstance(filters['metadata'], dict):
+        log_msg = _("'metadata' filter value is not valid.")
+        LOG.debug(log_msg)
+        return None
+
+    if not _validate_filter_keys(models.Snapshot, filters, ('metadata',)):
+        return None
+
+    filter_dict = {}
+    for key, value in filters.iteritems():
+        if key == 'metadata':
+            col_attr = getattr(models.Snapshot, 'snapshot_metadata')
+            for k, v in value.iteritems():
+                query = query.filter(col_attr.any(key=k, value=v))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            column_attr = getattr(models.Snapshot, key)
+            query = query.filter(column_attr.in_(value))
+        else:
+            filter_dict[key] = value
+
+    if filter_dict:
+        query = query.filter_by(**filter_dict)
+    return query
+
+
+def _snapshot_get_all(context, marker, limit, sort_key, sort_dir, filters):
+    if marker is None and limit is None and sort_key is None:
+        # Plain listing, no need for a stable order
+        query = _snaps_get_query(context)
+        if filters:
+            query = _process_snaps_filters(query, filters)
+        return query.all() if query is not None else []
+
+    session = get_session()
+    with session.begin():
+        query = _generate_paginate_query(context, session, marker, limit,
+                                         sort_key or 'created_at', sort_dir,
+                                         filters,
+                                         paginate_type=models.Snapshot)
+        # No snapshots would match, return empty list
+        if query is None:
+            return []
+        return query.all()
+
+
 @require_admin_context
-def snapshot_get_all(context):
-    return model_query(context, models.Snapshot).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+@replica_safe
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key=None, sort_dir=None):
+    """Retrieves all snapshots.
+
+    If no sort parameters are specified then the returned snapshots are not
+    sorted.
+
+    :param context: context to query under
+    :param filters: dictionary of filters; values that are lists, tuples,
+                    sets, or frozensets cause an 'IN' test to be performed,
+                    while exact matching ('==' operator) is used for other
+                    values, 'metadata' must be a dict of metadata key-value
+                    pairs
+    :param marker: the last item of the previous page, used to determine the
+                   next page of results to return
+    :param limit: maximum number of items to return
+    :param sort_key: single attributes by which results should be sorted,
+                     defaults to 'created_at' when paginating
+    :param sort_dir: direction in which results should be sorted (asc, desc)
+    :returns: list of matching snapshots
+    """
+    return _snapshot_get_all(context, marker, limit, sort_key, sort_dir,
+                             filters)
 
 
 @require_context
@@ -1722,12 +2211,32 @@ def snapshot_get_all_for_cgsnapshot(context, cgsnapshot_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id):
+@replica_safe
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None, sort_key=None,
+                                sort_dir=None):
+    """"Retrieves all snapshots in a project.
+
+    If no sort parameters are specified then the returned snapshots are not
+    sorted.
+
+    :param context: context to query under
+    :param project_id: project for all snapshots being retrieved
+    :param filters: dictionary of filters, see snapshot_get_all
+    :param marker: the last item of the previous page, used to determine the
+                   next page of results to return
+    :param limit: maximum number of items to return
+    :param sort_key: single attributes by which results should be sorted,
+                     defaults to 'created_at' when paginating
+    :param sort_dir: direction in which results should be sorted (asc, desc)
+    :returns: list of matching snapshots
+    """
     authorize_project_context(context, project_id)
-    return model_query(context, models.Snapshot).\
-        filter_by(project_id=project_id).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+    # Add in the project filter without modifying the given filters
+    filters = filters.copy() if filters else {}
+    filters['project_id'] = project_id
+    return _snapshot_get_all(context, marker, limit, sort_key, sort_dir,
+                             filters)
 
 
 @require_context
@@ -1755,8 +2264,24 @@ def snapshot_data_get_for_project(context, project_id, volume_type_id=None):
     return _snapshot_data_get_for_project(context, project_id, volume_type_id)
 
 
+def _active_by_window_page(query, model, marker, limit):
+    """Return the page of an active by window query following marker.
+
+    The rows are sorted by id and marker is the id of the last row of the
+    previous page, so that the pages can be walked without an offset scan.
+    """
+    if marker is not None:
+        query = query.filter(model.id > marker)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
 @require_context
-def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
+@replica_safe
+def snapshot_get_active_by_window(context, begin, end=None, project_id=None,
+                                  marker=None, limit=None):
     """Return snapshots that were active during window."""
 
     query = model_query(context, models.Snapshot, read_deleted="yes")
@@ -1768,7 +2293,7 @@ def snapshot_get_active_by_window(context, begin, end=None, project_id=None):
     if project_id:
         query = query.filter_by(project_id=project_id)
 
-    return query.all()
+    return _active_by_window_page(query, models.Snapshot, marker, limit)
 
 
 @require_context
@@ -1816,58 +2341,14 @@ def snapshot_metadata_delete(context, snapshot_id, key):
                 'updated_at': literal_column('updated_at')})
 
 
-@require_context
-def _snapshot_metadata_get_item(context, snapshot_id, key, session=None):
-    result = _snapshot_metadata_get_query(context,
-                                          snapshot_id,
-                                          session=session).\
-        filter_by(key=key).\
-        first()
-
-    if not result:
-        raise exception.SnapshotMetadataNotFound(metadata_key=key,
-                                                 snapshot_id=snapshot_id)
-    return result
-
-
 @require_context
 @require_snapshot_exists
 @_retry_on_deadlock
 def snapshot_metadata_update(context, snapshot_id, metadata, delete):
     session = get_session()
-    with session.begin():
-        # Set existing metadata to deleted if delete argument is True
-        if delete:
-            original_metadata = _snapshot_metadata_get(context, snapshot_id,
-                                                       session)
-            for meta_key, meta_value in original_metadata.iteritems():
-                if meta_key not in metadata:
-                    meta_ref = _snapshot_metadata_get_item(context,
-                                                           snapshot_id,
-                                                           meta_key, session)
-                    meta_ref.update({'deleted': True})
-                    meta_ref.save(session=session)
-
-        meta_ref = None
-
-        # Now update all existing items with new values, or create new meta
-        # objects
-        for meta_key, meta_value in metadata.items():
-
-            # update the value whether it exists or not
-            item = {"value": meta_value}
-
-            try:
-                meta_ref = _snapshot_metadata_get_item(context, snapshot_id,
-                                                       meta_key, session)
-            except exception.SnapshotMetadataNotFound:
-                meta_ref = models.SnapshotMetadata()
-                item.update({"key": meta_key, "snapshot_id": snapshot_id})
-
-            meta_ref.update(item)
-            meta_ref.save(session=session)
-
-    return snapshot_metadata_get(context, snapshot_id)
+    query = _snapshot_metadata_get_query(context, snapshot_id, session)
+    return _metadata_rows_update(query, models.SnapshotMetadata, metadata,
+                                 delete, session, snapshot_id=snapshot_id)
 
 ###################
 
@@ -2191,10 +2672,13 @@ def volume_type_destroy(context, id):
 
 
 @require_context
+@replica_safe
 def volume_get_active_by_window(context,
                                 begin,
                                 end=None,
-                                project_id=None):
+                                project_id=None,
+                                marker=None,
+                                limit=None):
     """Return volumes that were active during window."""
     query = model_query(context, models.Volume, read_deleted="yes")
     query = query.filter(or_(models.Volume.deleted_at == None,  # noqa
@@ -2204,7 +2688,7 @@ def volume_get_active_by_window(context,
     if project_id:
         query = query.filter_by(project_id=project_id)
 
-    return query.all()
+    return _active_by_window_page(query, models.Volume, marker, limit)
 
 
 def _volume_type_access_query(context, session=None):
@@ -2707,6 +3191,24 @@ def volume_glance_metadata_get_all(context):
     return _volume_glance_metadata_get_all(context)
 
 
+@require_context
+@replica_safe
+def volume_glance_metadata_list_get(context, volume_id_list):
+    """Return the glance metadata for a volume list."""
+    if not volume_id_list:
+        return []
+    query = model_query(context,
+                        models.VolumeGlanceMetadata,
+                        read_deleted='no')
+    query = query.filter(
+        models.VolumeGlanceMetadata.volume_id.in_(volume_id_list))
+    if is_user_context(context):
+        query = query.filter(
+            models.Volume.id == models.VolumeGlanceMetadata.volume_id,
+            models.Volume.project_id == context.project_id)
+    return query.all()
+
+
 @require_context
 @require_volume_exists
 def _volume_glance_metadata_get(context, volume_id, session=None):
@@ -2781,6 +3283,31 @@ def volume_glance_metadata_create(context, volume_id, key, value):
     return
 
 
+@require_context
+@require_volume_exists
+def volume_glance_metadata_bulk_create(context, volume_id, metadata):
+    """Update the Glance metadata for a volume by adding new key:value pairs.
+
+    The keys which already exist are skipped, this API does not support
+    changing the value of a key once it has been created.
+    """
+
+    session = get_session()
+    with session.begin():
+        existing = session.query(models.VolumeGlanceMetadata.key).\
+            filter_by(volume_id=volume_id).\
+            filter_by(deleted=False).all()
+        existing = set(row.key for row in existing)
+
+        added = [{'volume_id': volume_id, 'key': key, 'value': str(value),
+                  'created_at': timeutils.utcnow()}
+                 for key, value in metadata.iteritems()
+                 if key not in existing]
+        if added:
+            session.execute(models.VolumeGlanceMetadata.__table__.insert(),
+                            added)
+
+
 @require_context
 @require_snapshot_exists
 def volume_glance_metadata_copy_to_snapshot(context, snapshot_id, volume_id):
@@ -2897,6 +3424,7 @@ def _backup_get_all(context, filters=None):
 
 
 @require_admin_context
+@replica_safe
 def backup_get_all(context, filters=None):
     return _backup_get_all(context, filters)
 
@@ -2907,6 +3435,7 @@ def backup_get_all_by_host(context, host):
 
 
 @require_context
+@replica_safe
 def backup_get_all_by_project(context, project_id, filters=None):
 
     authorize_project_context(context, project_id)
@@ -3286,3 +3815,151 @@ def cgsnapshot_destroy(context, cgsnapshot_id):
                     'deleted': True,
                     'deleted_at': timeutils.utcnow(),
                     'updated_at': literal_column('updated_at')})
+
+
+###############################
+
+
+@require_admin_context
+def capacity_reservation_create(context, host, size, expire,
+                                resource_id=None):
+    reservation = models.CapacityReservation()
+    # host is a pool, i.e. host@backend#pool
+    reservation.update({'host': host,
+                        'backend': host.partition('#')[0],
+                        'size': size,
+                        'resource_id': resource_id,
+                        'expire': expire})
+    session = get_session()
+    with session.begin():
+        reservation.save(session=session)
+    return reservation
+
+
+@require_admin_context
+def capacity_reservation_get_all(context):
+    return model_query(context, models.CapacityReservation,
+                       read_deleted="no").\
+        filter(models.CapacityReservation.expire > timeutils.utcnow()).\
+        all()
+
+
+@require_admin_context
+def capacity_reservation_release(context, backend, before):
+    # Reservations only live until the next capability report, so they
+    # are removed for good instead of being soft-deleted.
+    released = and_(models.CapacityReservation.backend == backend,
+                    models.CapacityReservation.created_at < before)
+    expired = models.CapacityReservation.expire <= timeutils.utcnow()
+    session = get_session()
+    with session.begin():
+        return model_query(context, models.CapacityReservation,
+                           session=session, read_deleted="yes").\
+            filter(or_(released, expired)).\
+            delete(synchronize_session=False)
+
+
+###############################
+
+
+@require_admin_context
+def rate_limit_state_get(context, state_id):
+    result = model_query(context, models.RateLimitState.state,
+                         read_deleted="no").\
+        filter_by(id=state_id).\
+        first()
+    return result[0] if result else None
+
+
+@require_admin_context
+@_retry_on_deadlock
+def rate_limit_state_update(context, state_id, update_func):
+    try:
+        return _rate_limit_state_update(context, state_id, update_func)
+    except db_exc.DBDuplicateEntry:
+        # Another process created the row first, it is locked this time.
+        return _rate_limit_state_update(context, state_id, update_func)
+
+
+def _rate_limit_state_update(context, state_id, update_func):
+    session = get_session()
+    with session.begin():
+        state_ref = model_query(context, models.RateLimitState,
+                                session=session, read_deleted="no").\
+            filter_by(id=state_id).\
+            with_lockmode('update').\
+            first()
+        if state_ref is None:
+            state_ref = models.RateLimitState()
+            state_ref.id = state_id
+        state_ref.state = update_func(state_ref.state)
+        state_ref.save(session=session)
+    return state_ref.state
+
+
+###############################
+
+
+@require_admin_context
+def purge_deleted_rows(context, age_in_days, batch_size=1000, throttle=0):
+    try:
+        age_in_days = int(age_in_days)
+        batch_size = int(batch_size)
+    except ValueError:
+        msg = _('Invalid value for age or batch size, they must be '
+                'integers.')
+        raise exception.InvalidParameterValue(err=msg)
+    if age_in_days < 0 or batch_size <= 0:
+        msg = _('Invalid value for age or batch size, the age must not be '
+                'negative and the batch size must be positive.')
+        raise exception.InvalidParameterValue(err=msg)
+
+    engine = get_engine()
+    metadata = sqlalchemy.MetaData()
+    metadata.reflect(engine)
+    deleted_before = timeutils.utcnow() - datetime.timedelta(days=age_in_days)
+
+    results = {}
+    # Children are purged before their parents, and a row still referenced
+    # by a remaining child row is kept to preserve the foreign keys.
+    for table in reversed(metadata.sorted_tables):
+        if ('deleted' not in table.c or 'deleted_at' not in table.c or
+                len(table.primary_key.columns) != 1):
+            continue
+        primary_key = list(table.primary_key.columns)[0]
+        conditions = [table.c.deleted == true(),
+                      table.c.deleted_at < deleted_before]
+        for child in metadata.sorted_tables:
+            for foreign_key in child.foreign_keys:
+                if foreign_key.column.table is table:
+                    conditions.append(~sqlalchemy.exists().where(
+                        foreign_key.parent == foreign_key.column))
+
+        select = sqlalchemy.select([primary_key]).where(and_(*conditions)).\
+            limit(batch_size)
+        removed = 0
+        while True:
+            with engine.begin() as conn:
+                ids = [row[0] for row in conn.execute(select)]
+                if ids:
+                    removed += conn.execute(
+                        table.delete().where(primary_key.in_(ids))).rowcount
+            if len(ids) < batch_size:
+                break
+            if throttle:
+                time.sleep(throttle)
+
+        if removed:
+            LOG.info(_LI('Purged %(rows)d deleted rows from table %(table)s'),
+                     {'rows': removed, 'table': table.name})
+        results[table.name] = removed
+    return results
+
+
+###############################
+
+
+PAGINATION_HELPERS = {
+    models.Volume: (_volume_get_query, _process_volume_filters, _volume_get),
+    models.Snapshot: (_snaps_get_query, _process_snaps_filters, _snapshot_get)
+}
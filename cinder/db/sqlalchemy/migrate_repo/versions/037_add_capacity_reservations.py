@@ -0,0 +1,60 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer
+from sqlalchemy import MetaData, String, Table
+
+from cinder.i18n import _
+from cinder.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    capacity_reservations = Table(
+        'capacity_reservations', meta,
+        Column('created_at', DateTime(timezone=False)),
+        Column('updated_at', DateTime(timezone=False)),
+        Column('deleted_at', DateTime(timezone=False)),
+        Column('deleted', Boolean),
+        Column('id', Integer, primary_key=True, nullable=False),
+        Column('host', String(length=255), nullable=False),
+        Column('backend', String(length=255), nullable=False),
+        Column('size', Integer, nullable=False),
+        Column('resource_id', String(length=36)),
+        Column('expire', DateTime(timezone=False), nullable=False),
+        Index('capacity_reservations_backend_idx', 'backend'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8'
+    )
+
+    try:
+        capacity_reservations.create()
+    except Exception:
+        LOG.error(_("Table |%s| not created!"), repr(capacity_reservations))
+        raise
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    capacity_reservations = Table('capacity_reservations', meta,
+                                  autoload=True)
+    try:
+        capacity_reservations.drop()
+    except Exception:
+        LOG.error(_("capacity_reservations table not dropped"))
+        raise
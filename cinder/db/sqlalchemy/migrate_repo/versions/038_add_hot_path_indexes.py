@@ -0,0 +1,73 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+from cinder.i18n import _
+from cinder.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# Based on the queries from cinder/db/sqlalchemy/api.py:
+#  - volume_get_all_by_host, volume_data_get_for_host
+#  - volume_get_all_by_project, _volume_data_get_for_project
+#  - snapshot_get_all_for_volume
+#  - snapshot_get_all_by_project, _snapshot_data_get_for_project
+#  - backup_get_all_by_host
+#  - backup_get_all_by_project, _backup_data_get_for_project
+#  - service_get_all_by_topic
+INDEXES = [
+    ('volumes', 'volumes_host_deleted_idx', ('host', 'deleted')),
+    ('volumes', 'volumes_project_id_deleted_idx', ('project_id', 'deleted')),
+    ('snapshots', 'snapshots_volume_id_deleted_idx',
+     ('volume_id', 'deleted')),
+    ('snapshots', 'snapshots_project_id_deleted_idx',
+     ('project_id', 'deleted')),
+    ('backups', 'backups_host_deleted_idx', ('host', 'deleted')),
+    ('backups', 'backups_project_id_deleted_idx', ('project_id', 'deleted')),
+    ('services', 'services_topic_deleted_idx', ('topic', 'deleted')),
+]
+
+
+def _get_index(table, columns):
+    for idx in table.indexes:
+        if tuple(idx.columns.keys()) == columns:
+            return idx
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name, columns in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        if _get_index(table, columns):
+            LOG.info(_('Skipped adding %s because an equivalent index '
+                       'already exists.'), index_name)
+            continue
+
+        index = Index(index_name, *[table.c[column] for column in columns])
+        index.create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for table_name, index_name, columns in INDEXES:
+        table = Table(table_name, meta, autoload=True)
+        index = _get_index(table, columns)
+        if index:
+            index.drop(migrate_engine)
+        else:
+            LOG.info(_('Skipped removing %s because index does not '
+                       'exist.'), index_name)
@@ -403,6 +403,34 @@ class Reservation(BASE, CinderBase):
                     'QuotaUsage.deleted == 0)')
 
 
+class CapacityReservation(BASE, CinderBase):
+    """Represents pool capacity claimed by a scheduler decision.
+
+    A reservation is pending until the next capability report of its
+    backend, or until it expires.
+    """
+
+    __tablename__ = 'capacity_reservations'
+    id = Column(Integer, primary_key=True)
+
+    host = Column(String(255), nullable=False)
+    backend = Column(String(255), nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    resource_id = Column(String(36))
+    expire = Column(DateTime, nullable=False)
+
+
+class RateLimitState(BASE, CinderBase):
+    """Represents the API rate limit buckets of a user."""
+
+    __tablename__ = 'rate_limit_states'
+    # Hash of the user name
+    id = Column(String(40), primary_key=True)
+
+    # JSON encoded buckets
+    state = Column(Text, nullable=False)
+
+
 class Snapshot(BASE, CinderBase):
     """Represents a snapshot of volume."""
     __tablename__ = 'snapshots'
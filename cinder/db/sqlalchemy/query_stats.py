@@ -0,0 +1,180 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Accounting of the database queries run by an API request or RPC method.
+
+The engines of the sessions returned by get_session report every statement
+they execute to the QueryStats collected by the current thread, if any.
+The number of queries, the rows loaded or written and the time spent in
+the database are logged at the end of the request, along with the
+statements executed many times, which usually reveal a lazy load or a
+query run in a loop (an N+1 query pattern).
+
+The connection liveness pings and the BEGIN statements emitted by oslo.db
+are not counted.
+"""
+
+import collections
+import contextlib
+import functools
+import threading
+import time
+
+from oslo.config import cfg
+from sqlalchemy import event
+
+from cinder.db.sqlalchemy import models
+from cinder.i18n import _LW
+from cinder.openstack.common import log as logging
+
+
+query_stats_opts = [
+    cfg.IntOpt('db_query_repeat_threshold',
+               default=10,
+               help='Number of executions of the same statement during an '
+                    'API request or RPC method from which a possible N+1 '
+                    'query pattern is logged, when debug is on.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(query_stats_opts)
+
+LOG = logging.getLogger(__name__)
+
+_LOCAL = threading.local()
+_IGNORED = frozenset(['SELECT 1', 'BEGIN'])
+
+
+class QueryStats(object):
+    """Queries run while collecting, see collect()."""
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.rows = 0
+        self.time = 0.0
+        self.statements = collections.Counter()
+
+    def repeated(self, threshold):
+        """Return the (statement, count) run at least threshold times."""
+        return [(statement, count)
+                for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+    def __str__(self):
+        return ('%(queries)d queries, %(rows)d rows, %(time).3fs' %
+                {'queries': self.queries, 'rows': self.rows,
+                 'time': self.time})
+
+
+def _active():
+    return getattr(_LOCAL, 'stats', None)
+
+
+@contextlib.contextmanager
+def collect(name):
+    """Collect the queries run by the current thread within the block.
+
+    Collections may be nested, the queries are then counted in all of
+    them.
+    """
+    stats = QueryStats(name)
+    previous = _active()
+    _LOCAL.stats = (previous or ()) + (stats,)
+    try:
+        yield stats
+    finally:
+        _LOCAL.stats = previous
+
+
+def report(stats):
+    """Log the queries of a request, warning of the repeated statements."""
+    LOG.debug('Database queries of %(name)s: %(stats)s',
+              {'name': stats.name, 'stats': stats})
+    for statement, count in stats.repeated(CONF.db_query_repeat_threshold):
+        LOG.warning(_LW('Possible N+1 query pattern in %(name)s, the '
+                        'following statement ran %(count)d times: '
+                        '%(statement)s'),
+                    {'name': stats.name, 'count': count,
+                     'statement': statement})
+
+
+def instrument(name, func):
+    """Wrap func to collect and report the queries of each of its calls."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with collect(name) as stats:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                report(stats)
+    return wrapper
+
+
+class Endpoint(object):
+    """RPC endpoint proxy reporting the queries of each method call."""
+
+    def __init__(self, endpoint):
+        self._endpoint = endpoint
+
+    def __getattr__(self, name):
+        attr = getattr(self._endpoint, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        return instrument('%s.%s' % (type(self._endpoint).__name__, name),
+                          attr)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if _active():
+        conn.info.setdefault('query_stats_start', []).append(time.time())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    active = _active()
+    if not active:
+        return
+    starts = conn.info.get('query_stats_start')
+    elapsed = time.time() - starts.pop() if starts else 0.0
+    if statement in _IGNORED:
+        return
+    rows = 0
+    if (cursor.rowcount > 0 and
+            not statement.lstrip().upper().startswith('SELECT')):
+        rows = cursor.rowcount
+    for stats in active:
+        stats.queries += 1
+        stats.rows += rows
+        stats.time += elapsed
+        stats.statements[statement] += 1
+
+
+def _on_load(target, context):
+    for stats in _active() or ():
+        stats.rows += 1
+
+
+def register(engine):
+    """Report the statements executed by engine to the active collections."""
+    if event.contains(engine, 'before_cursor_execute',
+                      _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    if not event.contains(models.BASE, 'load', _on_load):
+        event.listen(models.BASE, 'load', _on_load, propagate=True)
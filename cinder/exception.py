@@ -327,6 +327,10 @@ class SchedulerHostWeigherNotFound(NotFound):
     message = _("Scheduler Host Weigher %(weigher_name)s could not be found.")
 
 
+class InvalidSchedulerExpression(Invalid):
+    message = _("Invalid scheduler expression '%(expression)s': %(reason)s")
+
+
 class HostBinaryNotFound(NotFound):
     message = _("Could not find binary %(binary)s on host %(host)s.")
 
@@ -0,0 +1,98 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Backends recording the heartbeats of the services.
+
+The services report their state every report_interval seconds, and a
+service is considered up when its last heartbeat is more recent than
+service_down_time seconds.  The database backend keeps the heartbeats in
+the services table, other backends may keep them elsewhere to take that
+load off the database.
+"""
+
+from oslo.config import cfg
+from oslo.utils import importutils
+from oslo.utils import timeutils
+
+from cinder import db
+
+
+heartbeat_opts = [
+    cfg.StrOpt('heartbeat_driver',
+               default='cinder.heartbeat.DbDriver',
+               help='The full class name of the backend recording the '
+                    'heartbeats of the services'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(heartbeat_opts)
+
+
+class Driver(object):
+    """Base class of the heartbeat backends."""
+
+    def report(self, context, service_id, values):
+        """Record a heartbeat of a service.
+
+        :param service_id: id of the service in the services table
+        :param values: service properties to update along with the
+                       heartbeat, if the backend stores them
+        :returns: False if the service is unknown and must be recreated
+        """
+        raise NotImplementedError()
+
+    def last_heartbeat(self, service):
+        """Return the time of the last heartbeat of a service, or None."""
+        raise NotImplementedError()
+
+
+class DbDriver(Driver):
+    """Records the heartbeats in the services table."""
+
+    def report(self, context, service_id, values):
+        return db.service_heartbeat(context, service_id, values)
+
+    def last_heartbeat(self, service):
+        return service['updated_at'] or service['created_at']
+
+
+class LocalDriver(Driver):
+    """Records the heartbeats in memory.
+
+    The heartbeats are only visible to the process that reported them, so
+    this backend is meant for the tests and single process deployments.
+    """
+
+    _heartbeats = {}
+
+    def report(self, context, service_id, values):
+        self._heartbeats[service_id] = timeutils.utcnow()
+        return True
+
+    def last_heartbeat(self, service):
+        return self._heartbeats.get(service['id'])
+
+
+_driver = None
+
+
+def get_driver():
+    """Return the configured heartbeat backend."""
+    global _driver
+    driver_class = importutils.import_class(CONF.heartbeat_driver)
+    if type(_driver) is not driver_class:
+        _driver = driver_class()
+    return _driver
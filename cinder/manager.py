@@ -51,6 +51,7 @@ This module provides Manager, a base class for managers.
 
 """
 
+import copy
 
 from oslo.config import cfg
 from oslo import messaging
@@ -58,11 +59,13 @@ from oslo import messaging
 from cinder.db import base
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import periodic_task
+from cinder.scheduler import capabilities as capability_reports
 from cinder.scheduler import rpcapi as scheduler_rpcapi
 from cinder import version
 
 
 CONF = cfg.CONF
+CONF.import_opt('capability_report_deltas', 'cinder.scheduler.capabilities')
 LOG = logging.getLogger(__name__)
 
 
@@ -109,10 +112,18 @@ class SchedulerDependentManager(Manager):
     manager.Manager directly. Updates are only sent after
     update_service_capabilities is called with non-None values.
 
+    With capability_report_deltas enabled, only the difference with the
+    previously published capabilities is sent, with a full report every
+    capability_full_report_interval reports (see
+    cinder.scheduler.capabilities).
+
     """
 
     def __init__(self, host=None, db_driver=None, service_name='undefined'):
         self.last_capabilities = None
+        self.published_capabilities = None
+        self.report_seq = 0
+        self.reports_since_full = 0
         self.service_name = service_name
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
         super(SchedulerDependentManager, self).__init__(host, db_driver)
@@ -122,12 +133,37 @@ class SchedulerDependentManager(Manager):
         self.last_capabilities = capabilities
 
     @periodic_task.periodic_task
-    def _publish_service_capabilities(self, context):
+    def _publish_service_capabilities(self, context, full_report=False):
         """Pass data back to the scheduler at a periodic interval."""
-        if self.last_capabilities:
-            LOG.debug('Notifying Schedulers of capabilities ...')
+        if not self.last_capabilities:
+            return
+
+        LOG.debug('Notifying Schedulers of capabilities ...')
+        if not CONF.capability_report_deltas:
             self.scheduler_rpcapi.update_service_capabilities(
                 context,
                 self.service_name,
                 self.host,
                 self.last_capabilities)
+            return
+
+        self.report_seq += 1
+        full_report = (full_report or
+                       self.published_capabilities is None or
+                       self.reports_since_full + 1 >=
+                       CONF.capability_full_report_interval)
+        if full_report:
+            capabilities = self.last_capabilities
+            self.reports_since_full = 0
+        else:
+            capabilities = capability_reports.diff(
+                self.published_capabilities, self.last_capabilities)
+            self.reports_since_full += 1
+        self.scheduler_rpcapi.update_service_capabilities(
+            context,
+            self.service_name,
+            self.host,
+            capabilities,
+            report={'seq': self.report_seq, 'full': full_report})
+        # Drivers may update their stats in place, keep our own copy.
+        self.published_capabilities = copy.deepcopy(self.last_capabilities)
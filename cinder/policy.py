@@ -13,23 +13,301 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-"""Policy Engine For Cinder"""
+"""Policy Engine For Cinder
 
+The rules are compiled into predicates when first enforced, the nested
+rule: checks being inlined, and the decisions are cached by action and by
+the values of the target and credential attributes the rule depends on.
+Both are discarded when the rules are reloaded.
+"""
+
+import ast
+import collections
+import re
 
 from oslo.config import cfg
+import six
 
 from cinder import exception
+from cinder.i18n import _LW
+from cinder.openstack.common import log as logging
 from cinder.openstack.common import policy
 
+
+policy_opts = [
+    cfg.IntOpt('policy_decision_cache_size',
+               default=1024,
+               help='Number of policy decisions cached. 0 disables the '
+                    'cache.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(policy_opts)
+
+LOG = logging.getLogger(__name__)
 
 _ENFORCER = None
 
+# The attributes of the target referenced by the match of a check
+_TARGET_KEY = re.compile(r'%\(([^)]*)\)')
+
+# The credentials of RequestContext.to_dict() that are context attributes
+_CONTEXT_ATTRIBUTES = frozenset([
+    'auth_token', 'domain', 'instance_uuid', 'is_admin', 'project_domain',
+    'project_id', 'project_name', 'quota_class', 'read_deleted',
+    'read_only', 'read_replica', 'remote_address', 'request_id', 'roles',
+    'service_catalog', 'show_deleted', 'tenant', 'user', 'user_domain',
+    'user_id',
+])
+
+_MISSING = object()
+
+
+class _Credentials(object):
+    """The credentials of a context, see RequestContext.to_dict().
+
+    The attributes of the context are read directly, to_dict() is only
+    called for the other credentials.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self._dict = None
+
+    def __getitem__(self, key):
+        if key in _CONTEXT_ATTRIBUTES:
+            return getattr(self.context, key)
+        return self.to_dict()[key]
+
+    def to_dict(self):
+        if self._dict is None:
+            self._dict = self.context.to_dict()
+        return self._dict
+
+
+def _to_dict(creds):
+    return creds if isinstance(creds, dict) else creds.to_dict()
+
+
+class CompiledRule(object):
+    """A rule compiled into a predicate of the target and credentials.
+
+    :param predicate: function of the target and credentials returning the
+                      decision
+    :param target_keys: attributes of the target the decision depends on
+    :param cred_keys: credentials the decision depends on
+    :param cacheable: whether the decision only depends on these
+    """
+
+    def __init__(self, predicate, target_keys=(), cred_keys=(),
+                 cacheable=True):
+        self.predicate = predicate
+        self.target_keys = tuple(sorted(set(target_keys)))
+        self.cred_keys = tuple(sorted(set(cred_keys)))
+        self.cacheable = cacheable
+
+    @classmethod
+    def combine(cls, predicate, rules):
+        """Return the rule of a predicate of rules."""
+        return cls(predicate,
+                   [key for rule in rules for key in rule.target_keys],
+                   [key for rule in rules for key in rule.cred_keys],
+                   all(rule.cacheable for rule in rules))
+
+    def get_cache_key(self, action, target, creds):
+        """Return the key of a decision, None if it cannot be cached."""
+        if not self.cacheable:
+            return None
+        try:
+            key = (action,
+                   tuple(target.get(name, _MISSING)
+                         for name in self.target_keys),
+                   tuple(self._get_cred(creds, name)
+                         for name in self.cred_keys))
+            hash(key)
+        except (AttributeError, TypeError):
+            return None
+        return key
+
+    @staticmethod
+    def _get_cred(creds, name):
+        try:
+            value = creds[name]
+        except KeyError:
+            return _MISSING
+        if isinstance(value, list):
+            value = tuple(value)
+        return value
+
+
+_TRUE = CompiledRule(lambda target, creds: True)
+_FALSE = CompiledRule(lambda target, creds: False)
+
+
+def _compile_generic(check):
+    match = check.match
+    try:
+        leftval = ast.literal_eval(check.kind)
+        kind_parts = None
+    except ValueError:
+        kind_parts = check.kind.split('.')
+
+    def predicate(target, creds):
+        try:
+            value = match % target
+        except KeyError:
+            return False
+
+        if kind_parts is None:
+            left = leftval
+        else:
+            try:
+                left = creds[kind_parts[0]]
+                for kind_part in kind_parts[1:]:
+                    left = left[kind_part]
+            except KeyError:
+                return False
+        return value == six.text_type(left)
+
+    return CompiledRule(predicate, _TARGET_KEY.findall(match),
+                        kind_parts[:1] if kind_parts else ())
+
+
+def compile_check(check, enforcer, rules=()):
+    """Compile a check of the policy into a CompiledRule.
+
+    :param check: the BaseCheck to compile
+    :param enforcer: the Enforcer whose rules are referenced by the check
+    :param rules: names of the rules being compiled, to stop on cycles
+    """
+    check_type = type(check)
+    if check_type is policy.TrueCheck:
+        return _TRUE
+    if check_type is policy.FalseCheck:
+        return _FALSE
+
+    if check_type is policy.NotCheck:
+        negated = compile_check(check.rule, enforcer, rules)
+        negated_predicate = negated.predicate
+        return CompiledRule.combine(
+            lambda target, creds: not negated_predicate(target, creds),
+            [negated])
+
+    if check_type in (policy.AndCheck, policy.OrCheck):
+        compiled = [compile_check(subcheck, enforcer, rules)
+                    for subcheck in check.rules]
+        predicates = [rule.predicate for rule in compiled]
+        if check_type is policy.AndCheck:
+            def predicate(target, creds):
+                for rule_predicate in predicates:
+                    if not rule_predicate(target, creds):
+                        return False
+                return True
+        else:
+            def predicate(target, creds):
+                for rule_predicate in predicates:
+                    if rule_predicate(target, creds):
+                        return True
+                return False
+        return CompiledRule.combine(predicate, compiled)
+
+    if check_type is policy.RuleCheck:
+        if check.match in rules:
+            LOG.warning(_LW("Rule [%s] references itself"), check.match)
+            return _FALSE
+        try:
+            rule = enforcer.rules[check.match]
+        except KeyError:
+            # We don't have any matching rule; fail closed
+            return _FALSE
+        return compile_check(rule, enforcer, rules + (check.match,))
+
+    if check_type is policy.RoleCheck:
+        role = check.match.lower()
+        return CompiledRule(
+            lambda target, creds: role in [x.lower()
+                                           for x in creds['roles']],
+            cred_keys=['roles'])
+
+    if check_type is policy.GenericCheck:
+        return _compile_generic(check)
+
+    # Other checks, such as http: ones, are evaluated as they are and their
+    # decisions are never cached.
+    return CompiledRule(
+        lambda target, creds: check(target, _to_dict(creds), enforcer),
+        cacheable=False)
+
+
+class Enforcer(policy.Enforcer):
+    """Enforcer evaluating compiled rules, with a cache of decisions."""
+
+    def __init__(self, *args, **kwargs):
+        super(Enforcer, self).__init__(*args, **kwargs)
+        self._compiled = {}
+        self._compiled_rules = self.rules
+        self._decisions = collections.OrderedDict()
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        super(Enforcer, self).set_rules(rules, overwrite, use_conf)
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard the compiled rules and the cached decisions."""
+        self._compiled = {}
+        self._compiled_rules = self.rules
+        self._decisions = collections.OrderedDict()
+
+    def compile(self, action):
+        """Return the CompiledRule of an action."""
+        if self._compiled_rules is not self.rules:
+            self.invalidate()
+        try:
+            return self._compiled[action]
+        except KeyError:
+            pass
+
+        if not self.rules:
+            # No rules to reference means we're going to fail closed
+            compiled = _FALSE
+        else:
+            try:
+                compiled = compile_check(self.rules[action], self,
+                                         (action,))
+            except KeyError:
+                LOG.debug("Rule [%s] doesn't exist" % action)
+                # If the rule doesn't exist, fail closed
+                compiled = _FALSE
+        self._compiled[action] = compiled
+        return compiled
+
+    def authorize(self, action, target, creds):
+        """Return whether an action is allowed on the target.
+
+        :param creds: dictionary of the credentials, or _Credentials
+        """
+        self.load_rules()
+        compiled = self.compile(action)
+
+        key = compiled.get_cache_key(action, target, creds)
+        if key is None:
+            return compiled.predicate(target, creds)
+
+        result = self._decisions.pop(key, _MISSING)
+        if result is _MISSING:
+            result = compiled.predicate(target, creds)
+            while (self._decisions and
+                   len(self._decisions) >= CONF.policy_decision_cache_size):
+                self._decisions.popitem(last=False)
+        if CONF.policy_decision_cache_size > 0:
+            self._decisions[key] = result
+        return result
+
 
 def init():
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = policy.Enforcer()
+        _ENFORCER = Enforcer()
 
 
 def enforce_action(context, action):
@@ -62,10 +340,10 @@ def enforce(context, action, target):
     """
     init()
 
-    return _ENFORCER.enforce(action, target, context.to_dict(),
-                             do_raise=True,
-                             exc=exception.PolicyNotAuthorized,
-                             action=action)
+    result = _ENFORCER.authorize(action, target, _Credentials(context))
+    if not result:
+        raise exception.PolicyNotAuthorized(action=action)
+    return result
 
 
 def check_is_admin(roles):
@@ -81,4 +359,4 @@ def check_is_admin(roles):
     target = {'project_id': ''}
     credentials = {'roles': roles}
 
-    return _ENFORCER.enforce('context_is_admin', target, credentials)
+    return _ENFORCER.authorize('context_is_admin', target, credentials)
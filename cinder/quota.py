@@ -68,7 +68,15 @@ quota_opts = [
     cfg.BoolOpt('use_default_quota_class',
                 default=True,
                 help='Enables or disables use of default quota class '
-                     'with default quota.'), ]
+                     'with default quota.'),
+    cfg.IntOpt('quota_resources_cache_ttl',
+               default=60,
+               help='Number of seconds the quota resources of the volume '
+                    'types are cached. The cache is per process; it is '
+                    'also refreshed when this process creates, updates '
+                    'or deletes a volume type, when the quotas are '
+                    'listed, and once per expiry when a quota check '
+                    'names an unknown resource. 0 disables the cache.'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -633,7 +641,7 @@ class QuotaEngine(object):
         :param context: The request context, for access checks.
         """
 
-        return self._driver.get_defaults(context, self.resources)
+        return self._driver.get_defaults(context, self._get_resources())
 
     def get_class_quotas(self, context, quota_class, defaults=True):
         """Retrieve the quotas for the given quota class.
@@ -646,7 +654,7 @@ class QuotaEngine(object):
                          resource.
         """
 
-        return self._driver.get_class_quotas(context, self.resources,
+        return self._driver.get_class_quotas(context, self._get_resources(),
                                              quota_class, defaults=defaults)
 
     def get_project_quotas(self, context, project_id, quota_class=None,
@@ -666,7 +674,8 @@ class QuotaEngine(object):
                        will also be returned.
         """
 
-        return self._driver.get_project_quotas(context, self.resources,
+        return self._driver.get_project_quotas(context,
+                                               self._get_resources(),
                                                project_id,
                                                quota_class=quota_class,
                                                defaults=defaults,
@@ -685,7 +694,7 @@ class QuotaEngine(object):
         """
 
         # Get the resource
-        res = self.resources.get(resource)
+        res = self._get_resources([resource]).get(resource)
         if not res or not hasattr(res, 'count'):
             raise exception.QuotaResourceUnknown(unknown=[resource])
 
@@ -716,8 +725,8 @@ class QuotaEngine(object):
                            common user's tenant.
         """
 
-        return self._driver.limit_check(context, self.resources, values,
-                                        project_id=project_id)
+        return self._driver.limit_check(context, self._get_resources(values),
+                                        values, project_id=project_id)
 
     def reserve(self, context, expire=None, project_id=None, **deltas):
         """Check quotas and reserve resources.
@@ -754,8 +763,9 @@ class QuotaEngine(object):
                            common user's tenant.
         """
 
-        reservations = self._driver.reserve(context, self.resources, deltas,
-                                            expire=expire,
+        reservations = self._driver.reserve(context,
+                                            self._get_resources(deltas),
+                                            deltas, expire=expire,
                                             project_id=project_id)
 
         LOG.debug("Created reservations %s" % reservations)
@@ -858,14 +868,41 @@ class QuotaEngine(object):
     def resources(self):
         return self._resources
 
+    def _get_resources(self, names=None):
+        """Return the resources used to check the given resource names.
+
+        names is None when all the resources are listed.
+        """
+        return self.resources
+
 
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
+    def __init__(self, quota_driver_class=None):
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
+        self._resources = None
+        self._resources_loaded_at = None
+        # Names still unknown after a reload of the cached resources
+        self._unknown_names = set()
+
     @property
     def resources(self):
         """Fetches all possible quota resources."""
 
+        resources = self._resources
+        if (resources is None or
+                timeutils.is_older_than(self._resources_loaded_at,
+                                        CONF.quota_resources_cache_ttl)):
+            loaded_at = timeutils.utcnow()
+            resources = self._load_resources()
+            if CONF.quota_resources_cache_ttl > 0:
+                self._resources = resources
+                self._resources_loaded_at = loaded_at
+                self._unknown_names = set()
+        return resources
+
+    def _load_resources(self):
         result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
@@ -887,6 +924,41 @@ class VolumeTypeQuotaEngine(QuotaEngine):
                 result[resource.name] = resource
         return result
 
+    def _get_resources(self, names=None):
+        """Return the resources, reloading them for unknown volume types.
+
+        The cache is local to this process, so a volume type created
+        through another API worker or node is not known until the cache
+        expires.  Listings of all the resources reload them, and a check
+        naming an unknown resource reloads them once before giving up.
+        The names still unknown after that reload, like the ones of a
+        deleted volume type, do not cause another reload until the cache
+        expires.
+        """
+        if self._resources is None:
+            return self.resources
+        if names is None:
+            self.invalidate_resources()
+            return self.resources
+
+        resources = self.resources
+        unknown = set(names) - set(resources)
+        if unknown - self._unknown_names:
+            self.invalidate_resources()
+            resources = self.resources
+            self._unknown_names = set(names) - set(resources)
+        return resources
+
+    def invalidate_resources(self):
+        """Reload the resources on their next access.
+
+        Called when a volume type is created, updated or deleted.  This
+        only affects the cache of the calling process; the other
+        processes pick the change up once quota_resources_cache_ttl
+        expires or when they are asked about an unknown resource.
+        """
+        self._resources = None
+
     def register_resource(self, resource):
         raise NotImplementedError(_("Cannot register resource"))
 
@@ -0,0 +1,129 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Capability report deltas.
+
+Volume services publish their capabilities to the schedulers periodically.
+Instead of the full stats, a service can send the difference with its
+previous report, computed by diff() and applied on the scheduler side by
+apply().  Pools are matched by pool_name and only the changed fields of
+the changed pools are sent.  A delta looks like:
+
+    {'set': {'free_capacity_gb': 10},
+     'unset': ['some_key'],
+     'pools': {'pool1': {'set': {...}, 'unset': [...]}},
+     'removed_pools': ['pool2']}
+
+where every section is optional.  Reports are numbered so that the
+scheduler can detect a lost delta and wait for the next full report.
+"""
+
+from oslo.config import cfg
+
+
+capability_report_opts = [
+    cfg.BoolOpt('capability_report_deltas',
+                default=False,
+                help='Only send the capabilities that changed since the '
+                     'previous report to the schedulers. All the schedulers '
+                     'must support capability report deltas.'),
+    cfg.IntOpt('capability_full_report_interval',
+               default=10,
+               help='When sending capability report deltas, send the full '
+                    'capabilities every this many reports.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(capability_report_opts)
+
+
+def _diff_fields(old, new, ignore=()):
+    delta = {}
+    changed = dict((key, value) for key, value in new.iteritems()
+                   if key not in ignore and
+                   (key not in old or old[key] != value))
+    removed = [key for key in old
+               if key not in ignore and key not in new]
+    if changed:
+        delta['set'] = changed
+    if removed:
+        delta['unset'] = sorted(removed)
+    return delta
+
+
+def _apply_fields(old, delta):
+    new = dict(old)
+    for key in delta.get('unset', []):
+        new.pop(key, None)
+    new.update(delta.get('set', {}))
+    return new
+
+
+def _pools_by_name(stats):
+    """Return the pools of stats keyed by pool name, None if it has none."""
+    pools = stats.get('pools')
+    if (not isinstance(pools, list) or
+            not all(isinstance(pool, dict) and 'pool_name' in pool
+                    for pool in pools)):
+        return None
+    return dict((pool['pool_name'], pool) for pool in pools)
+
+
+def diff(old, new):
+    """Return the delta turning the old capabilities into the new ones."""
+    old_pools = _pools_by_name(old)
+    new_pools = _pools_by_name(new)
+    if old_pools is None or new_pools is None:
+        return _diff_fields(old, new)
+
+    delta = _diff_fields(old, new, ignore=('pools',))
+    pools = {}
+    for name, pool in new_pools.iteritems():
+        pool_delta = _diff_fields(old_pools.get(name, {}), pool)
+        if pool_delta or name not in old_pools:
+            pools[name] = pool_delta
+    removed = [name for name in old_pools if name not in new_pools]
+    if pools:
+        delta['pools'] = pools
+    if removed:
+        delta['removed_pools'] = sorted(removed)
+    return delta
+
+
+def apply(old, delta):
+    """Return a copy of the old capabilities updated with a delta.
+
+    The dicts of the unchanged pools are shared with the old capabilities,
+    which are not modified.
+    """
+    new = _apply_fields(old, delta)
+    if 'pools' not in delta and 'removed_pools' not in delta:
+        return new
+
+    changed = dict(delta.get('pools', {}))
+    removed = set(delta.get('removed_pools', []))
+    pools = []
+    for pool in old.get('pools') or []:
+        name = pool['pool_name']
+        if name in removed:
+            continue
+        if name in changed:
+            pool = _apply_fields(pool, changed.pop(name))
+        pools.append(pool)
+    for name in sorted(changed):
+        pools.append(_apply_fields({}, changed[name]))
+    new['pools'] = pools
+    return new
@@ -69,11 +69,13 @@ class Scheduler(object):
             CONF.scheduler_host_manager)
         self.volume_rpcapi = volume_rpcapi.VolumeAPI()
 
-    def update_service_capabilities(self, service_name, host, capabilities):
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    report=None):
         """Process a capability update from a service node."""
         self.host_manager.update_service_capabilities(service_name,
                                                       host,
-                                                      capabilities)
+                                                      capabilities,
+                                                      report=report)
 
     def host_passes_filters(self, context, volume_id, host, filter_properties):
         """Check if the specified host passes the filters."""
@@ -103,3 +105,13 @@ class Scheduler(object):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_(
             "Must implement schedule_get_pools"))
+
+    def get_pools_snapshot(self, context, filters, generation=None):
+        """Must override to report generation-stamped pool lists."""
+        raise NotImplementedError(_(
+            "Must implement get_pools_snapshot"))
+
+    def get_timings(self, context):
+        """Must override to report scheduling timing spans."""
+        raise NotImplementedError(_(
+            "Must implement get_timings"))
@@ -0,0 +1,345 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Operator defined scheduler expressions.
+
+Expressions are used by the ExpressionFilter and the GoodnessWeigher.
+They are parsed once into a tree of Python closures, no eval() involved,
+and evaluated against every pool.  The grammar supports:
+
+* numbers, 'quoted strings', true and false
+* arithmetic: + - * / % ^ (power) and unary -
+* comparisons: < <= > >= == !=
+* logic: and or not (or && || !)
+* the ternary operator: condition ? value : other_value
+* the functions abs(), min() and max()
+* variables, named <namespace>.<key>:
+
+  - stats: the pool's free_capacity_gb, total_capacity_gb,
+    allocated_capacity_gb, reserved_percentage, QoS_support, host, ...
+  - capabilities: the capabilities reported for the pool
+  - volume: the properties of the volume being scheduled (size, ...)
+  - extra: the extra specs of its volume type
+
+For example, preferring the pools under 70% utilization with a low
+reported latency:
+
+  stats.free_capacity_gb / stats.total_capacity_gb > 0.3 ?
+      100 - capabilities.latency : 0
+"""
+
+import operator
+import re
+
+from cinder import exception
+from cinder.i18n import _, _LE
+from cinder.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+NAMESPACES = ('stats', 'capabilities', 'volume', 'extra')
+
+STATS = ('host', 'pool_name', 'volume_backend_name', 'vendor_name',
+         'driver_version', 'storage_protocol', 'QoS_support',
+         'total_capacity_gb', 'free_capacity_gb', 'allocated_capacity_gb',
+         'reserved_percentage')
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+\.\d*|\.\d+|\d+) |
+        (?P<string>'[^']*'|"[^"]*") |
+        (?P<name>[A-Za-z_][A-Za-z0-9_]*) |
+        (?P<op><=|>=|==|!=|&&|\|\||[-+*/%^<>!?:(),.])
+    )""", re.VERBOSE)
+
+_KEYWORDS = {'and': '&&', 'or': '||', 'not': '!'}
+
+_COMPARISONS = {'<': operator.lt, '<=': operator.le,
+                '>': operator.gt, '>=': operator.ge,
+                '==': operator.eq, '!=': operator.ne}
+
+_ARITHMETIC = {'+': operator.add, '-': operator.sub,
+               '*': operator.mul, '/': operator.truediv,
+               '%': operator.mod}
+
+_FUNCTIONS = {'abs': (abs, 1), 'min': (min, None), 'max': (max, None)}
+
+_CONSTANTS = {'true': True, 'false': False}
+
+# The parsed expressions, or the errors of the malformed ones, by text
+_expressions = {}
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise ValueError(_("unexpected character at %d") % pos)
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        elif kind == 'string':
+            value = value[1:-1]
+        elif kind == 'name' and value in _KEYWORDS:
+            kind, value = 'op', _KEYWORDS[value]
+        tokens.append((kind, value))
+    return tokens
+
+
+def _constant(value):
+    return lambda ns: value
+
+
+def _binary(op, left, right):
+    return lambda ns: op(left(ns), right(ns))
+
+
+def _and(left, right):
+    return lambda ns: bool(left(ns) and right(ns))
+
+
+def _or(left, right):
+    return lambda ns: bool(left(ns) or right(ns))
+
+
+def _not(operand):
+    return lambda ns: not operand(ns)
+
+
+def _negative(operand):
+    return lambda ns: -operand(ns)
+
+
+def _ternary(condition, if_true, if_false):
+    return lambda ns: if_true(ns) if condition(ns) else if_false(ns)
+
+
+def _variable(namespace, key):
+    return lambda ns: ns[namespace][key]
+
+
+def _call(function, args):
+    return lambda ns: function(*[arg(ns) for arg in args])
+
+
+class _Parser(object):
+    """Recursive descent parser building the closures of an expression."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = []
+        self.pos = 0
+        self.variables = set()
+
+    def parse(self):
+        self.tokens = _tokenize(self.text)
+        result = self._ternary()
+        if self.pos != len(self.tokens):
+            raise ValueError(_("unexpected %s") % (self._peek()[1],))
+        return result
+
+    def _peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def _accept(self, *ops):
+        kind, value = self._peek()
+        if kind == 'op' and value in ops:
+            self.pos += 1
+            return value
+        return None
+
+    def _expect(self, op):
+        if not self._accept(op):
+            raise ValueError(_("expected %(expected)s, found %(found)s") %
+                             {'expected': op,
+                              'found': self._peek()[1] or _('end')})
+
+    def _ternary(self):
+        condition = self._or()
+        if not self._accept('?'):
+            return condition
+        if_true = self._ternary()
+        self._expect(':')
+        return _ternary(condition, if_true, self._ternary())
+
+    def _or(self):
+        result = self._and()
+        while self._accept('||'):
+            result = _or(result, self._and())
+        return result
+
+    def _and(self):
+        result = self._not()
+        while self._accept('&&'):
+            result = _and(result, self._not())
+        return result
+
+    def _not(self):
+        if self._accept('!'):
+            return _not(self._not())
+        return self._comparison()
+
+    def _comparison(self):
+        result = self._sum()
+        op = self._accept(*_COMPARISONS)
+        if op:
+            result = _binary(_COMPARISONS[op], result, self._sum())
+        return result
+
+    def _sum(self):
+        result = self._term()
+        op = self._accept('+', '-')
+        while op:
+            result = _binary(_ARITHMETIC[op], result, self._term())
+            op = self._accept('+', '-')
+        return result
+
+    def _term(self):
+        result = self._unary()
+        op = self._accept('*', '/', '%')
+        while op:
+            result = _binary(_ARITHMETIC[op], result, self._unary())
+            op = self._accept('*', '/', '%')
+        return result
+
+    def _unary(self):
+        if self._accept('-'):
+            return _negative(self._unary())
+        if self._accept('+'):
+            return self._unary()
+        return self._power()
+
+    def _power(self):
+        result = self._atom()
+        if self._accept('^'):
+            # Right associative, binds tighter than unary minus on its left.
+            result = _binary(operator.pow, result, self._unary())
+        return result
+
+    def _atom(self):
+        kind, value = self._peek()
+        if kind is None:
+            raise ValueError(_("unexpected end of expression"))
+        self.pos += 1
+        if kind in ('number', 'string'):
+            return _constant(value)
+        if kind == 'op':
+            if value != '(':
+                raise ValueError(_("unexpected %s") % value)
+            result = self._ternary()
+            self._expect(')')
+            return result
+
+        if value in _CONSTANTS:
+            return _constant(_CONSTANTS[value])
+        if value in _FUNCTIONS:
+            return self._function(value)
+        if value not in NAMESPACES:
+            raise ValueError(_("unknown name %s") % value)
+        self._expect('.')
+        kind, key = self._peek()
+        if kind != 'name':
+            raise ValueError(_("expected a name after %s.") % value)
+        self.pos += 1
+        if value == 'stats' and key not in STATS:
+            raise ValueError(_("unknown name stats.%s") % key)
+        self.variables.add('%s.%s' % (value, key))
+        return _variable(value, key)
+
+    def _function(self, name):
+        function, arg_count = _FUNCTIONS[name]
+        self._expect('(')
+        args = [self._ternary()]
+        while self._accept(','):
+            args.append(self._ternary())
+        self._expect(')')
+        if arg_count is not None and len(args) != arg_count:
+            raise ValueError(_("%(name)s() takes %(count)d argument(s)") %
+                             {'name': name, 'count': arg_count})
+        if arg_count is None and len(args) < 2:
+            raise ValueError(_("%s() takes at least 2 arguments") % name)
+        return _call(function, args)
+
+
+class Expression(object):
+    """A parsed scheduler expression."""
+
+    def __init__(self, text):
+        self.text = text
+        parser = _Parser(text)
+        try:
+            self._evaluate = parser.parse()
+        except ValueError as e:
+            raise exception.InvalidSchedulerExpression(expression=text,
+                                                       reason=e)
+        self.variables = frozenset(parser.variables)
+
+    def evaluate(self, namespaces):
+        """Evaluate the expression.
+
+        :param namespaces: dict mapping the names in NAMESPACES to dicts
+        :raises InvalidSchedulerExpression: if a variable is missing or an
+                                            operation fails
+        """
+        try:
+            return self._evaluate(namespaces)
+        except KeyError as e:
+            raise exception.InvalidSchedulerExpression(
+                expression=self.text,
+                reason=_("unknown variable %s") % e.args[0])
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise exception.InvalidSchedulerExpression(expression=self.text,
+                                                       reason=e)
+
+
+def get_expression(text):
+    """Return the parsed expression, parsing each expression only once.
+
+    A malformed expression is logged when it is first parsed, the later
+    calls raise the same InvalidSchedulerExpression without parsing it
+    again.
+    """
+    expression = _expressions.get(text)
+    if expression is None:
+        try:
+            expression = Expression(text)
+        except exception.InvalidSchedulerExpression as e:
+            LOG.error(_LE("Cannot parse scheduler expression: %s"), e)
+            expression = e
+        _expressions[text] = expression
+    if isinstance(expression, exception.InvalidSchedulerExpression):
+        raise expression
+    return expression
+
+
+def get_namespaces(host_state, filter_properties):
+    """Return the variables available to expressions for a pool."""
+    request_spec = filter_properties.get('request_spec') or {}
+    volume_type = filter_properties.get('volume_type') or {}
+    stats = dict((name, getattr(host_state, name, None)) for name in STATS)
+    return {'stats': stats,
+            'capabilities': host_state.capabilities or {},
+            'volume': request_spec.get('volume_properties') or {},
+            'extra': volume_type.get('extra_specs') or {}}
@@ -20,6 +20,8 @@ You can customize this scheduler by specifying your own volume Filters and
 Weighing Functions.
 """
 
+import time
+
 from oslo.config import cfg
 
 from cinder import exception
@@ -27,6 +29,7 @@ from cinder.i18n import _, _LW
 from cinder.openstack.common import log as logging
 from cinder.scheduler import driver
 from cinder.scheduler import scheduler_options
+from cinder.scheduler import timing
 from cinder.volume import utils
 
 CONF = cfg.CONF
@@ -40,6 +43,7 @@ class FilterScheduler(driver.Scheduler):
         self.cost_function_cache = None
         self.options = scheduler_options.SchedulerOptions()
         self.max_attempts = self._max_attempts()
+        self.stats = timing.SchedulerStats()
 
     def schedule(self, context, topic, method, *args, **kwargs):
         """The schedule() contract requires we return the one
@@ -65,25 +69,44 @@ class FilterScheduler(driver.Scheduler):
     def schedule_create_consistencygroup(self, context, group_id,
                                          request_spec_list,
                                          filter_properties_list):
-
+        with self.stats.request('create_consistencygroup',
+                                group_id) as timer:
+            self._schedule_create_consistencygroup(context, group_id,
+                                                   request_spec_list,
+                                                   filter_properties_list,
+                                                   timer)
+
+    def _schedule_create_consistencygroup(self, context, group_id,
+                                          request_spec_list,
+                                          filter_properties_list, timer):
         weighed_host = self._schedule_group(
             context,
             request_spec_list,
-            filter_properties_list)
+            filter_properties_list,
+            timer=timer)
 
         if not weighed_host:
             raise exception.NoValidHost(reason="No weighed hosts available")
 
         host = weighed_host.obj.host
 
-        updated_group = driver.group_update_db(context, group_id, host)
+        with timer.span('update_db'):
+            updated_group = driver.group_update_db(context, group_id, host)
 
-        self.volume_rpcapi.create_consistencygroup(context,
-                                                   updated_group, host)
+        with timer.span('rpc_cast'):
+            self.volume_rpcapi.create_consistencygroup(context,
+                                                       updated_group, host)
 
     def schedule_create_volume(self, context, request_spec, filter_properties):
+        with self.stats.request('create_volume',
+                                request_spec.get('volume_id')) as timer:
+            self._schedule_create_volume(context, request_spec,
+                                         filter_properties, timer)
+
+    def _schedule_create_volume(self, context, request_spec,
+                                filter_properties, timer):
         weighed_host = self._schedule(context, request_spec,
-                                      filter_properties)
+                                      filter_properties, timer=timer)
 
         if not weighed_host:
             raise exception.NoValidHost(reason="No weighed hosts available")
@@ -93,24 +116,31 @@ class FilterScheduler(driver.Scheduler):
         snapshot_id = request_spec['snapshot_id']
         image_id = request_spec['image_id']
 
-        updated_volume = driver.volume_update_db(context, volume_id, host)
+        with timer.span('update_db'):
+            updated_volume = driver.volume_update_db(context, volume_id,
+                                                     host)
         self._post_select_populate_filter_properties(filter_properties,
                                                      weighed_host.obj)
 
         # context is not serializable
         filter_properties.pop('context', None)
 
-        self.volume_rpcapi.create_volume(context, updated_volume, host,
-                                         request_spec, filter_properties,
-                                         allow_reschedule=True,
-                                         snapshot_id=snapshot_id,
-                                         image_id=image_id)
+        with timer.span('rpc_cast'):
+            self.volume_rpcapi.create_volume(context, updated_volume, host,
+                                             request_spec, filter_properties,
+                                             allow_reschedule=True,
+                                             snapshot_id=snapshot_id,
+                                             image_id=image_id)
 
     def host_passes_filters(self, context, host, request_spec,
                             filter_properties):
         """Check if the specified host passes the filters."""
-        weighed_hosts = self._get_weighted_candidates(context, request_spec,
-                                                      filter_properties)
+        with self.stats.request('host_passes_filters',
+                                request_spec.get('volume_id')) as timer:
+            weighed_hosts = self._get_weighted_candidates(context,
+                                                          request_spec,
+                                                          filter_properties,
+                                                          timer=timer)
         for weighed_host in weighed_hosts:
             host_state = weighed_host.obj
             if host_state.host == host:
@@ -130,8 +160,12 @@ class FilterScheduler(driver.Scheduler):
         # it can accept the volume again in the CapacityFilter.
         filter_properties['vol_exists_on'] = current_host
 
-        weighed_hosts = self._get_weighted_candidates(context, request_spec,
-                                                      filter_properties)
+        with self.stats.request('find_retype_host',
+                                request_spec.get('volume_id')) as timer:
+            weighed_hosts = self._get_weighted_candidates(context,
+                                                          request_spec,
+                                                          filter_properties,
+                                                          timer=timer)
         if not weighed_hosts:
             msg = (_('No valid hosts for volume %(id)s with type %(type)s')
                    % {'id': request_spec['volume_id'],
@@ -169,8 +203,14 @@ class FilterScheduler(driver.Scheduler):
         return top_host.obj
 
     def get_pools(self, context, filters):
-        #TODO(zhiteng) Add filters support
-        return self.host_manager.get_pools(context)
+        return self.host_manager.get_pools(context, filters)
+
+    def get_pools_snapshot(self, context, filters, generation=None):
+        return self.host_manager.get_pools_snapshot(context, filters,
+                                                    generation)
+
+    def get_timings(self, context):
+        return self.stats.summary()
 
     def _post_select_populate_filter_properties(self, filter_properties,
                                                 host_state):
@@ -253,11 +293,13 @@ class FilterScheduler(driver.Scheduler):
             raise exception.NoValidHost(reason=msg)
 
     def _get_weighted_candidates(self, context, request_spec,
-                                 filter_properties=None):
+                                 filter_properties=None, timer=None):
         """Returns a list of hosts that meet the required specs,
         ordered by their fitness.
         """
         elevated = context.elevated()
+        if timer is None:
+            timer = timing.RequestTimer('get_weighted_candidates')
 
         volume_properties = request_spec['volume_properties']
         # Since Cinder is using mixed filters from Oslo and it's own, which
@@ -289,31 +331,66 @@ class FilterScheduler(driver.Scheduler):
 
         # Note: remember, we are using an iterator here. So only
         # traverse this list once.
-        hosts = self.host_manager.get_all_host_states(elevated)
+        with timer.span('get_all_host_states'):
+            hosts = self.host_manager.get_all_host_states(elevated)
 
         # Filter local hosts based on requirements ...
-        hosts = self.host_manager.get_filtered_hosts(hosts,
-                                                     filter_properties)
+        hosts = self._filter_hosts(hosts, filter_properties, timer)
         if not hosts:
             return []
 
         LOG.debug("Filtered %s" % hosts)
         # weighted_host = WeightedHost() ... the best
         # host for the job.
-        weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                                                            filter_properties)
+        return self._weigh_hosts(hosts, filter_properties, timer)
+
+    def _filter_hosts(self, hosts, filter_properties, timer):
+        timings = {}
+        host_counts = {}
+        hosts = list(hosts)
+        hosts_in = len(hosts)
+        start = time.time()
+        hosts = self.host_manager.get_filtered_hosts(hosts,
+                                                     filter_properties,
+                                                     timings=timings,
+                                                     host_counts=host_counts)
+        timer.add('filter', time.time() - start, hosts_in, len(hosts))
+        timer.add_all('filter', timings, host_counts)
+        return hosts
+
+    def _weigh_hosts(self, hosts, filter_properties, timer):
+        timings = {}
+        start = time.time()
+        weighed_hosts = self.host_manager.get_weighed_hosts(
+            hosts, filter_properties, timings=timings)
+        timer.add('weigh', time.time() - start, len(hosts),
+                  len(weighed_hosts))
+        timer.add_all('weigh', timings)
         return weighed_hosts
 
     def _get_weighted_candidates_group(self, context, request_spec_list,
-                                       filter_properties_list=None):
+                                       filter_properties_list=None,
+                                       timer=None):
         """Finds hosts that supports the consistencygroup.
 
         Returns a list of hosts that meet the required specs,
         ordered by their fitness.
         """
         elevated = context.elevated()
+        if timer is None:
+            timer = timing.RequestTimer('get_weighted_candidates_group')
+
+        # Every volume type of the group is filtered against the same
+        # snapshot of the host states.
+        with timer.span('get_all_host_states'):
+            all_hosts = list(self.host_manager.get_all_host_states(elevated))
+        if not all_hosts:
+            return []
 
+        # Hosts passing the filters of every volume type so far, with
+        # their combined weight.
         weighed_hosts = []
+        weights = {}
         index = 0
         for request_spec in request_spec_list:
             volume_properties = request_spec['volume_properties']
@@ -352,18 +429,8 @@ class FilterScheduler(driver.Scheduler):
                                             filter_properties)
 
             # Find our local list of acceptable hosts by filtering and
-            # weighing our options. we virtually consume resources on
-            # it so subsequent selections can adjust accordingly.
-
-            # Note: remember, we are using an iterator here. So only
-            # traverse this list once.
-            all_hosts = self.host_manager.get_all_host_states(elevated)
-            if not all_hosts:
-                return []
-
-            # Filter local hosts based on requirements ...
-            hosts = self.host_manager.get_filtered_hosts(all_hosts,
-                                                         filter_properties)
+            # weighing our options.
+            hosts = self._filter_hosts(all_hosts, filter_properties, timer)
 
             if not hosts:
                 return []
@@ -372,30 +439,37 @@ class FilterScheduler(driver.Scheduler):
 
             # weighted_host = WeightedHost() ... the best
             # host for the job.
-            temp_weighed_hosts = self.host_manager.get_weighed_hosts(
-                hosts,
-                filter_properties)
+            temp_weighed_hosts = self._weigh_hosts(hosts, filter_properties,
+                                                   timer)
             if not temp_weighed_hosts:
                 return []
             if index == 0:
                 weighed_hosts = temp_weighed_hosts
+                weights = dict((weighed.obj.host, weighed.weight)
+                               for weighed in weighed_hosts)
             else:
-                new_weighed_hosts = []
-                for host1 in weighed_hosts:
-                    for host2 in temp_weighed_hosts:
-                        if host1.obj.host == host2.obj.host:
-                            new_weighed_hosts.append(host1)
-                weighed_hosts = new_weighed_hosts
-                if not weighed_hosts:
+                temp_weights = dict((weighed.obj.host, weighed.weight)
+                                    for weighed in temp_weighed_hosts)
+                weights = dict((host, weight + temp_weights[host])
+                               for host, weight in weights.iteritems()
+                               if host in temp_weights)
+                if not weights:
                     return []
 
             index += 1
 
+        weighed_hosts = [weighed for weighed in weighed_hosts
+                         if weighed.obj.host in weights]
+        for weighed in weighed_hosts:
+            weighed.weight = weights[weighed.obj.host]
+        weighed_hosts.sort(key=lambda weighed: weighed.weight, reverse=True)
         return weighed_hosts
 
-    def _schedule(self, context, request_spec, filter_properties=None):
+    def _schedule(self, context, request_spec, filter_properties=None,
+                  timer=None):
         weighed_hosts = self._get_weighted_candidates(context, request_spec,
-                                                      filter_properties)
+                                                      filter_properties,
+                                                      timer=timer)
         if not weighed_hosts:
             LOG.warning(_LW('No weighed hosts found for volume '
                             'with properties: %s'),
@@ -404,11 +478,12 @@ class FilterScheduler(driver.Scheduler):
         return self._choose_top_host(weighed_hosts, request_spec)
 
     def _schedule_group(self, context, request_spec_list,
-                        filter_properties_list=None):
+                        filter_properties_list=None, timer=None):
         weighed_hosts = self._get_weighted_candidates_group(
             context,
             request_spec_list,
-            filter_properties_list)
+            filter_properties_list,
+            timer=timer)
         if not weighed_hosts:
             return None
         return self._choose_top_host_group(weighed_hosts, request_spec_list)
@@ -418,7 +493,9 @@ class FilterScheduler(driver.Scheduler):
         host_state = top_host.obj
         LOG.debug("Choosing %s" % host_state.host)
         volume_properties = request_spec['volume_properties']
-        host_state.consume_from_volume(volume_properties)
+        self.host_manager.consume_from_volume(
+            host_state, volume_properties,
+            resource_id=request_spec.get('volume_id'))
         return top_host
 
     def _choose_top_host_group(self, weighed_hosts, request_spec_list):
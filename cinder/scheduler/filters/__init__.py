@@ -0,0 +1,104 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Scheduler host filters
+"""
+
+import time
+
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler import base_filter
+from cinder.openstack.common.scheduler import filters
+from cinder.scheduler import parallel
+
+LOG = logging.getLogger(__name__)
+
+
+class HostFilterHandler(filters.HostFilterHandler):
+    """Host filter handler that can evaluate filters over host partitions.
+
+    Filters relying on the default filter_all() judge every host on its
+    own, so consecutive runs of such filters are evaluated over partitions
+    of the host list in parallel (see cinder.scheduler.parallel).  A
+    partition stops going through the chain as soon as it is empty.
+    Filters overriding filter_all() need to see all hosts at once and are
+    run against the merged survivors of the previous stage.
+    """
+
+    def get_filtered_objects(self, filter_classes, objs,
+                             filter_properties, timings=None,
+                             host_counts=None):
+        """Return the objects passing all filters.
+
+        :param timings: optional dict, updated in place with the seconds
+                        spent in each filter class, keyed by class name.
+        :param host_counts: optional dict, updated in place with the
+                            [before, after] host counts of each filter
+                            class, keyed by class name.
+        """
+        if timings is None:
+            timings = {}
+        if host_counts is None:
+            host_counts = {}
+        stats = (timings, host_counts)
+        objs = list(objs)
+
+        stage = []
+        for filter_obj in [filter_cls() for filter_cls in filter_classes]:
+            if not parallel.overrides(filter_obj, 'filter_all',
+                                      base_filter.BaseFilter):
+                stage.append(filter_obj)
+                continue
+            objs = self._run_stage(stage, objs, filter_properties, stats)
+            stage = []
+            if not objs:
+                return []
+            objs = self._run_filters([filter_obj], objs, filter_properties,
+                                     stats)
+            if not objs:
+                return []
+        return self._run_stage(stage, objs, filter_properties, stats)
+
+    def _run_stage(self, filter_objs, objs, filter_properties, stats):
+        if not filter_objs or not objs:
+            return objs
+
+        def _run(partition):
+            return self._run_filters(filter_objs, partition,
+                                     filter_properties, stats)
+
+        results = parallel.map_partitions(_run, objs)
+        return [obj for result in results for obj in result]
+
+    def _run_filters(self, filter_objs, objs, filter_properties, stats):
+        timings, host_counts = stats
+        for filter_obj in filter_objs:
+            name = filter_obj.__class__.__name__
+            hosts_in = len(objs)
+            start = time.time()
+            objs = list(filter_obj.filter_all(objs, filter_properties))
+            elapsed = time.time() - start
+            timings[name] = timings.get(name, 0.0) + elapsed
+            counts = host_counts.setdefault(name, [0, 0])
+            counts[0] += hosts_in
+            counts[1] += len(objs)
+            LOG.debug("Filter %(name)s returned %(count)d host(s) "
+                      "in %(elapsed).4fs",
+                      {'name': name, 'count': len(objs),
+                       'elapsed': elapsed})
+            if not objs:
+                break
+        return objs
@@ -24,18 +24,25 @@ LOG = logging.getLogger(__name__)
 
 
 class AffinityFilter(filters.BaseHostFilter):
+    # The scheduler hint listing the volumes of the filter
+    hint_name = None
+
     def __init__(self):
         self.volume_api = volume.API()
 
+    def host_passes(self, host_state, filter_properties):
+        return bool(self.filter_all([host_state], filter_properties))
 
-class DifferentBackendFilter(AffinityFilter):
-    """Schedule volume on a different back-end from a set of volumes."""
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Return the hosts passing the filter.
 
-    def host_passes(self, host_state, filter_properties):
+        The back-ends of the volumes named by the scheduler hint are looked
+        up once for all the hosts.
+        """
         context = filter_properties['context']
         scheduler_hints = filter_properties.get('scheduler_hints') or {}
 
-        affinity_uuids = scheduler_hints.get('different_host', [])
+        affinity_uuids = scheduler_hints.get(self.hint_name, [])
 
         # scheduler hint verification: affinity_uuids can be a list of uuids
         # or single uuid.  The checks here is to make sure every single string
@@ -47,56 +54,42 @@ class DifferentBackendFilter(AffinityFilter):
                 if uuidutils.is_uuid_like(uuid):
                     continue
                 else:
-                    return False
+                    return []
         elif uuidutils.is_uuid_like(affinity_uuids):
             affinity_uuids = [affinity_uuids]
         else:
             # Not a list, not a string looks like uuid, don't pass it
             # to DB for query to avoid potential risk.
-            return False
+            return []
 
-        if affinity_uuids:
-            return not self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
+        if not affinity_uuids:
+            # With no hint key
+            return list(filter_obj_list)
 
-        # With no different_host key
-        return True
+        volumes = self.volume_api.get_all(
+            context, filters={'id': affinity_uuids, 'deleted': False})
+        affinity_hosts = set(volume['host'] for volume in volumes)
+        return [host_state for host_state in filter_obj_list
+                if self._affinity_passes(host_state.host in affinity_hosts)]
 
+    def _affinity_passes(self, has_affinity_volume):
+        """Return whether a host holding a hinted volume or not passes."""
+        raise NotImplementedError()
 
-class SameBackendFilter(AffinityFilter):
-    """Schedule volume on the same back-end as another volume."""
 
-    def host_passes(self, host_state, filter_properties):
-        context = filter_properties['context']
-        scheduler_hints = filter_properties.get('scheduler_hints') or {}
+class DifferentBackendFilter(AffinityFilter):
+    """Schedule volume on a different back-end from a set of volumes."""
 
-        affinity_uuids = scheduler_hints.get('same_host', [])
+    hint_name = 'different_host'
 
-        # scheduler hint verification: affinity_uuids can be a list of uuids
-        # or single uuid.  The checks here is to make sure every single string
-        # in the list looks like a uuid, otherwise, this filter will fail to
-        # pass.  Note that the filter does *NOT* ignore string doesn't look
-        # like a uuid, it is better to fail the request than serving it wrong.
-        if isinstance(affinity_uuids, list):
-            for uuid in affinity_uuids:
-                if uuidutils.is_uuid_like(uuid):
-                    continue
-                else:
-                    return False
-        elif uuidutils.is_uuid_like(affinity_uuids):
-            affinity_uuids = [affinity_uuids]
-        else:
-            # Not a list, not a string looks like uuid, don't pass it
-            # to DB for query to avoid potential risk.
-            return False
+    def _affinity_passes(self, has_affinity_volume):
+        return not has_affinity_volume
+
+
+class SameBackendFilter(AffinityFilter):
+    """Schedule volume on the same back-end as another volume."""
 
-        if affinity_uuids:
-            return self.volume_api.get_all(
-                context, filters={'host': host_state.host,
-                                  'id': affinity_uuids,
-                                  'deleted': False})
+    hint_name = 'same_host'
 
-        # With no same_host key
-        return True
+    def _affinity_passes(self, has_affinity_volume):
+        return has_affinity_volume
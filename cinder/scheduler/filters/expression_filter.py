@@ -0,0 +1,62 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+
+from cinder import exception
+from cinder.i18n import _LW
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler import filters
+from cinder.scheduler import expression
+
+
+LOG = logging.getLogger(__name__)
+
+expression_filter_opts = [
+    cfg.StrOpt('scheduler_filter_function',
+               default=None,
+               help='Expression used by the ExpressionFilter, hosts for '
+                    'which it evaluates to false are filtered out. See '
+                    'cinder.scheduler.expression for the syntax.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(expression_filter_opts)
+
+
+class ExpressionFilter(filters.BaseHostFilter):
+    """Filters hosts with the operator defined scheduler_filter_function."""
+
+    def host_passes(self, host_state, filter_properties):
+        if not CONF.scheduler_filter_function:
+            return True
+
+        try:
+            expr = expression.get_expression(CONF.scheduler_filter_function)
+        except exception.InvalidSchedulerExpression:
+            # Logged once by get_expression
+            return False
+
+        try:
+            result = expr.evaluate(
+                expression.get_namespaces(host_state, filter_properties))
+        except exception.InvalidSchedulerExpression as e:
+            LOG.warning(_LW("Filtering out host %(host)s: %(error)s"),
+                        {'host': host_state.host, 'error': e})
+            return False
+
+        LOG.debug("Filter function for host %(host)s returned %(result)s",
+                  {'host': host_state.host, 'result': result})
+        return bool(result)
@@ -0,0 +1,148 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Partitioning of scheduling requests between scheduler instances.
+
+When scheduler_partition_key is set, the scheduling requests are sent to
+the scheduler instance owning their availability zone or volume type on a
+consistent hash ring instead of any instance listening on the scheduler
+topic.  The ring members are the scheduler services that are up according
+to the services table, so adding or removing an instance only moves the
+keys it gains or loses.
+
+With availability zone partitioning every backend is scheduled by a single
+instance, whose in-memory view of the capacity it consumed is then
+authoritative.  Volume type partitioning gives the same guarantee only for
+backends serving the volume types of a single partition.
+"""
+
+import bisect
+import hashlib
+import time
+
+from oslo.config import cfg
+import six
+
+from cinder import context
+from cinder import db
+from cinder.i18n import _LI
+from cinder.openstack.common import log as logging
+from cinder import utils
+
+
+hash_ring_opts = [
+    cfg.StrOpt('scheduler_partition_key',
+               default=None,
+               choices=['availability_zone', 'volume_type'],
+               help='Partition the scheduling requests between the '
+                    'scheduler instances by "availability_zone" or '
+                    '"volume_type". When unset any instance can handle '
+                    'any request.'),
+    cfg.IntOpt('scheduler_partition_replicas',
+               default=64,
+               help='Number of points of each scheduler instance on the '
+                    'consistent hash ring.'),
+    cfg.IntOpt('scheduler_partition_refresh_interval',
+               default=10,
+               help='Number of seconds the scheduler membership read from '
+                    'the database is cached.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(hash_ring_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+def _hash(value):
+    if isinstance(value, six.text_type):
+        value = value.encode('utf-8')
+    return int(hashlib.md5(str(value)).hexdigest()[:8], 16)
+
+
+class HashRing(object):
+    """Consistent hash ring mapping keys to members."""
+
+    def __init__(self, members, replicas=None):
+        if replicas is None:
+            replicas = CONF.scheduler_partition_replicas
+        self.members = frozenset(members)
+        ring = sorted((_hash('%s-%d' % (member, index)), member)
+                      for member in self.members
+                      for index in xrange(replicas))
+        self._hashes = [point for point, member in ring]
+        self._members = [member for point, member in ring]
+
+    def get_member(self, key):
+        """Return the member owning key, None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._members[index % len(self._members)]
+
+
+def get_partition_key(request_spec):
+    """Return the partition key of a scheduling request, if any."""
+    if not request_spec:
+        return None
+    volume_properties = request_spec.get('volume_properties') or {}
+    if CONF.scheduler_partition_key == 'availability_zone':
+        return volume_properties.get('availability_zone')
+    if CONF.scheduler_partition_key == 'volume_type':
+        volume_type = request_spec.get('volume_type') or {}
+        return (request_spec.get('volume_type_id') or
+                volume_type.get('id') or
+                volume_properties.get('volume_type_id'))
+    return None
+
+
+class RequestPartitioner(object):
+    """Finds the scheduler instance owning a scheduling request."""
+
+    def __init__(self):
+        # Fail at startup on an invalid scheduler_partition_key, reading an
+        # option checks its value against the choices.
+        CONF.scheduler_partition_key
+        self.ring = HashRing([])
+        self.refreshed_at = None
+
+    def _get_ring(self):
+        if (self.refreshed_at is None or time.time() - self.refreshed_at >=
+                CONF.scheduler_partition_refresh_interval):
+            services = db.service_get_all_by_topic(
+                context.get_admin_context(), CONF.scheduler_topic,
+                disabled=False)
+            members = [service['host'] for service in services
+                       if utils.service_is_up(service)]
+            if frozenset(members) != self.ring.members:
+                LOG.info(_LI("Scheduler partition members: %s"),
+                         ', '.join(sorted(members)))
+                self.ring = HashRing(members)
+            self.refreshed_at = time.time()
+        return self.ring
+
+    def get_owner(self, request_spec):
+        """Return the host of the scheduler owning the request.
+
+        None means that the request is not partitioned and may be handled
+        by any scheduler.
+        """
+        if not CONF.scheduler_partition_key:
+            return None
+        key = get_partition_key(request_spec)
+        if key is None:
+            return None
+        return self._get_ring().get_member(key)
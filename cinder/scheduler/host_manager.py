@@ -17,17 +17,23 @@
 Manage hosts in the current zone.
 """
 
+import copy
+import time
 import UserDict
+import uuid
 
 from oslo.config import cfg
+from oslo.utils import importutils
 from oslo.utils import timeutils
 
 from cinder import db
 from cinder import exception
 from cinder.i18n import _LI, _LW
 from cinder.openstack.common import log as logging
-from cinder.openstack.common.scheduler import filters
-from cinder.openstack.common.scheduler import weights
+from cinder.openstack.common.scheduler.filters import capabilities_filter
+from cinder.scheduler import capabilities as capability_reports
+from cinder.scheduler import filters
+from cinder.scheduler import weights
 from cinder import utils
 from cinder.volume import utils as vol_utils
 
@@ -45,12 +51,18 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_pools_snapshot_ttl',
+               default=10,
+               help='Number of seconds the pool list returned by get_pools '
+                    'is reused when no capability update was received, '
+                    'before checking the volume services again.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(host_manager_opts)
 CONF.import_opt('scheduler_driver', 'cinder.scheduler.manager')
+CONF.import_opt('scheduler_capacity_ledger', 'cinder.scheduler.ledger')
 
 LOG = logging.getLogger(__name__)
 
@@ -311,6 +323,25 @@ class PoolState(HostState):
         # Do nothing, since we don't have pools within pool, yet
         pass
 
+    def apply_reservations(self, reservations):
+        """Deduct capacity reserved since the last capability report.
+
+        :param reservations: list of (size, created_at) tuples
+        """
+        reported = self.capabilities
+        if 'free_capacity_gb' not in reported:
+            return
+        since = reported.get('timestamp')
+        pending = sum(size for size, created_at in reservations
+                      if since is None or created_at >= since)
+
+        self.allocated_capacity_gb = (
+            reported.get('allocated_capacity_gb', 0) + pending)
+        free = reported['free_capacity_gb']
+        if free not in ('infinite', 'unknown'):
+            free -= pending
+        self.free_capacity_gb = free
+
 
 class HostManager(object):
     """Base HostManager class."""
@@ -319,13 +350,29 @@ class HostManager(object):
 
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
+        # { <host>: (<seq of the last report>, <reported capabilities>) }
+        self.report_bases = {}
+        # { <host>: <last applied capabilities, as reported> }
+        self.reported_capabilities = {}
         self.host_state_map = {}
+        # Bumped whenever the capabilities or the set of hosts change, a
+        # report repeating the previous capabilities keeps the generation.
+        self.generation = 0
+        # Number of capability reports received, the pool list is rebuilt
+        # after any of them to show its timestamp.
+        self.report_count = 0
+        self.generation_prefix = uuid.uuid4().hex[:8]
+        self.pools_snapshot = None
         self.filter_handler = filters.HostFilterHandler('cinder.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
         self.weight_handler = weights.HostWeightHandler('cinder.scheduler.'
                                                         'weights')
         self.weight_classes = self.weight_handler.get_all_classes()
+        self.capacity_ledger = None
+        if CONF.scheduler_capacity_ledger:
+            self.capacity_ledger = importutils.import_object(
+                CONF.scheduler_capacity_ledger)
 
         default_filters = ['AvailabilityZoneFilter',
                            'CapacityFilter',
@@ -400,38 +447,87 @@ class HostManager(object):
         return good_weighers
 
     def get_filtered_hosts(self, hosts, filter_properties,
-                           filter_class_names=None):
+                           filter_class_names=None, timings=None,
+                           host_counts=None):
         """Filter hosts and return only ones passing all filters."""
         filter_classes = self._choose_host_filters(filter_class_names)
-        return self.filter_handler.get_filtered_objects(filter_classes,
-                                                        hosts,
-                                                        filter_properties)
+        return self.filter_handler.get_filtered_objects(
+            filter_classes, hosts, filter_properties,
+            timings=timings, host_counts=host_counts)
 
     def get_weighed_hosts(self, hosts, weight_properties,
-                          weigher_class_names=None):
+                          weigher_class_names=None, timings=None):
         """Weigh the hosts."""
         weigher_classes = self._choose_host_weighers(weigher_class_names)
         return self.weight_handler.get_weighed_objects(weigher_classes,
                                                        hosts,
-                                                       weight_properties)
+                                                       weight_properties,
+                                                       timings=timings)
+
+    def update_service_capabilities(self, service_name, host, capabilities,
+                                    report=None):
+        """Update the per-service capabilities based on this notification.
 
-    def update_service_capabilities(self, service_name, host, capabilities):
-        """Update the per-service capabilities based on this notification."""
+        :param report: None for a legacy full report, otherwise
+                       {'seq': <report number>, 'full': <bool>}; when full
+                       is False capabilities is a delta against the
+                       previous report (see cinder.scheduler.capabilities).
+        """
         if service_name != 'volume':
             LOG.debug('Ignoring %(service_name)s service update '
                       'from %(host)s',
                       {'service_name': service_name, 'host': host})
             return
 
-        # Copy the capabilities, so we don't modify the original dict
-        capab_copy = dict(capabilities)
-        capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
-        self.service_states[host] = capab_copy
-
         LOG.debug("Received %(service_name)s service update from "
-                  "%(host)s: %(cap)s" %
+                  "%(host)s (report %(report)s): %(cap)s",
                   {'service_name': service_name, 'host': host,
-                   'cap': capabilities})
+                   'report': report, 'cap': capabilities})
+
+        if report is None:
+            self.report_bases.pop(host, None)
+            reported = capabilities
+        else:
+            if report['full']:
+                reported = capabilities
+            else:
+                reported = self._apply_capabilities_delta(
+                    host, capabilities, report['seq'])
+                if reported is None:
+                    return
+            self.report_bases[host] = (report['seq'], reported)
+
+        # HostState adds backend info to the pools, keep the reported ones
+        # intact for the next delta and for change detection.
+        capab_copy = dict(reported)
+        if isinstance(reported.get('pools'), list):
+            capab_copy['pools'] = [dict(pool) for pool in reported['pools']]
+
+        capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
+        self.service_states[host] = capab_copy
+        self.report_count += 1
+        # Periodic reports mostly repeat the previous one, the clients
+        # knowing the current generation do not need to fetch the pools
+        # again.
+        if self.reported_capabilities.get(host) != reported:
+            self.reported_capabilities[host] = copy.deepcopy(reported)
+            self.generation += 1
+        if self.capacity_ledger:
+            # The report accounts for the capacity reserved before it.
+            self.capacity_ledger.release(host, capab_copy["timestamp"])
+
+    def _apply_capabilities_delta(self, host, delta, seq):
+        last_seq, reported = self.report_bases.get(host, (None, None))
+        if last_seq is None or seq != last_seq + 1:
+            # A report was lost (or the scheduler restarted), keep the
+            # current capabilities until the next full report.
+            LOG.warning(_LW("Ignoring capability update %(seq)s from "
+                            "%(host)s, last applied update was %(last)s. "
+                            "Waiting for a full update."),
+                        {'seq': seq, 'host': host, 'last': last_seq})
+            self.report_bases.pop(host, None)
+            return None
+        return capability_reports.apply(reported, delta)
 
     def _update_host_state_map(self, context):
 
@@ -454,6 +550,7 @@ class HostManager(object):
                                                  service=
                                                  dict(service.iteritems()))
                 self.host_state_map[host] = host_state
+                self.generation += 1
             # update capabilities and attributes in host_state
             host_state.update_from_volume_capability(capabilities,
                                                      service=
@@ -466,6 +563,23 @@ class HostManager(object):
             LOG.info(_LI("Removing non-active host: %(host)s from "
                          "scheduler cache.") % {'host': host})
             del self.host_state_map[host]
+            self.generation += 1
+
+        if self.capacity_ledger:
+            self._apply_capacity_reservations()
+
+    def _apply_capacity_reservations(self):
+        reserved = self.capacity_ledger.get_reserved()
+        for state in self.host_state_map.values():
+            for pool in state.pools.values():
+                pool.apply_reservations(reserved.get(pool.host, []))
+
+    def consume_from_volume(self, host_state, volume, resource_id=None):
+        """Account for a volume placed on the given pool."""
+        host_state.consume_from_volume(volume)
+        if self.capacity_ledger:
+            self.capacity_ledger.reserve(host_state.host, volume['size'],
+                                         resource_id=resource_id)
 
     def get_all_host_states(self, context):
         """Returns a dict of all the hosts the HostManager knows about.
@@ -490,8 +604,67 @@ class HostManager(object):
 
         return all_pools.itervalues()
 
-    def get_pools(self, context):
+    def get_pools(self, context, filters=None):
         """Returns a dict of all pools on all hosts HostManager knows about."""
+        return self.get_pools_snapshot(context, filters)['pools']
+
+    def get_pools_snapshot(self, context, filters=None, generation=None):
+        """Returns the pools matching filters from a cached pool list.
+
+        The pool list is rebuilt when a capability update was received or
+        after scheduler_pools_snapshot_ttl seconds.
+
+        :param filters: dict with the optional keys
+                        - name: pool name (host@backend#pool)
+                        - backend_name: volume_backend_name of the pools
+                        - capabilities: {key: value} the pool capabilities
+                          must match, a value of None only requires the key
+                        - volume_type: volume type whose extra specs the
+                          pools must satisfy
+                        - fields: capability keys to return
+                        - marker: name of the last pool of the previous page
+                        - limit: maximum number of pools to return
+        :param generation: generation of the pool list known by the caller,
+                           it only changes with the capabilities or the
+                           hosts, not with their report timestamps
+        :returns: {'generation': <generation of the pool list>,
+                   'pools': <list of pools, None if generation is the
+                             current generation>}
+        """
+        snapshot = self._get_pools_snapshot(context)
+        if generation is not None and generation == snapshot['generation']:
+            return {'generation': generation, 'pools': None}
+
+        filters = filters or {}
+        pools = [pool for pool, state in snapshot['pools']
+                 if self._pool_matches(pool, state, filters)]
+
+        marker = filters.get('marker')
+        if marker:
+            # Pools are sorted by name.
+            pools = [pool for pool in pools if pool['name'] > marker]
+        limit = filters.get('limit')
+        if limit:
+            pools = pools[:limit]
+
+        fields = filters.get('fields')
+        if fields:
+            pools = [dict(name=pool['name'],
+                          capabilities=dict(
+                              (key, pool['capabilities'][key])
+                              for key in fields
+                              if key in pool['capabilities']))
+                     for pool in pools]
+
+        return {'generation': snapshot['generation'], 'pools': pools}
+
+    def _get_pools_snapshot(self, context):
+        snapshot = self.pools_snapshot
+        if (snapshot and snapshot['host_generation'] == self.generation and
+                snapshot['report_count'] == self.report_count and
+                time.time() - snapshot['created'] <
+                CONF.scheduler_pools_snapshot_ttl):
+            return snapshot
 
         self._update_host_state_map(context)
 
@@ -503,6 +676,33 @@ class HostManager(object):
                 pool_key = vol_utils.append_host(host, pool.pool_name)
                 new_pool = dict(name=pool_key)
                 new_pool.update(dict(capabilities=pool.capabilities))
-                all_pools.append(new_pool)
-
-        return all_pools
+                all_pools.append((new_pool, pool))
+        all_pools.sort(key=lambda entry: entry[0]['name'])
+
+        self.pools_snapshot = {
+            'generation': '%s-%d' % (self.generation_prefix,
+                                     self.generation),
+            'host_generation': self.generation,
+            'report_count': self.report_count,
+            'created': time.time(),
+            'pools': all_pools}
+        return self.pools_snapshot
+
+    def _pool_matches(self, pool, state, filters):
+        capabilities = pool['capabilities'] or {}
+        if 'name' in filters and pool['name'] != filters['name']:
+            return False
+        if ('backend_name' in filters and
+                capabilities.get('volume_backend_name') !=
+                filters['backend_name']):
+            return False
+        for key, value in (filters.get('capabilities') or {}).items():
+            if key not in capabilities:
+                return False
+            if value is not None and str(capabilities[key]) != str(value):
+                return False
+        volume_type = filters.get('volume_type')
+        if volume_type:
+            return capabilities_filter.CapabilitiesFilter().host_passes(
+                state, {'resource_type': volume_type})
+        return True
@@ -0,0 +1,122 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Capacity reservation ledgers.
+
+HostState.consume_from_volume() only adjusts the copy of a pool's stats
+held by one scheduler process.  A ledger records the capacity handed out
+by every scheduler so that all of them deduct it from the pools until the
+backend's next capability report, which is expected to account for it.
+"""
+
+import datetime
+
+from oslo.config import cfg
+from oslo.utils import timeutils
+
+from cinder import context
+from cinder import db
+
+
+capacity_ledger_opts = [
+    cfg.StrOpt('scheduler_capacity_ledger',
+               default=None,
+               help='Class used to share pending capacity allocations '
+                    'between scheduler instances, e.g. '
+                    'cinder.scheduler.ledger.DbCapacityLedger. When unset '
+                    'each scheduler only tracks its own allocations.'),
+    cfg.IntOpt('scheduler_capacity_reservation_ttl',
+               default=300,
+               help='Number of seconds a capacity reservation is held if '
+                    'its backend does not report its capabilities.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(capacity_ledger_opts)
+
+
+class CapacityLedger(object):
+    """Base class for capacity reservation ledgers."""
+
+    def reserve(self, host, size, resource_id=None):
+        """Record size GB allocated on a pool (host@backend#pool)."""
+        raise NotImplementedError()
+
+    def release(self, backend, before):
+        """Drop the reservations on backend made before a report time."""
+        raise NotImplementedError()
+
+    def get_reserved(self):
+        """Return {pool: [(size, created_at), ...]} for pending reservations.
+        """
+        raise NotImplementedError()
+
+    def _expire(self):
+        return (timeutils.utcnow() +
+                datetime.timedelta(
+                    seconds=CONF.scheduler_capacity_reservation_ttl))
+
+
+class LocalCapacityLedger(CapacityLedger):
+    """In-memory ledger, only shared by users of the same instance."""
+
+    def __init__(self):
+        self.reservations = []
+
+    def reserve(self, host, size, resource_id=None):
+        self.reservations.append({'host': host,
+                                  'backend': host.partition('#')[0],
+                                  'size': size,
+                                  'resource_id': resource_id,
+                                  'created_at': timeutils.utcnow(),
+                                  'expire': self._expire()})
+
+    def release(self, backend, before):
+        now = timeutils.utcnow()
+        self.reservations = [r for r in self.reservations
+                             if r['expire'] > now and
+                             (r['backend'] != backend or
+                              r['created_at'] >= before)]
+
+    def get_reserved(self):
+        now = timeutils.utcnow()
+        reserved = {}
+        for r in self.reservations:
+            if r['expire'] > now:
+                reserved.setdefault(r['host'], []).append(
+                    (r['size'], r['created_at']))
+        return reserved
+
+
+class DbCapacityLedger(CapacityLedger):
+    """Ledger shared by all schedulers through the database."""
+
+    def reserve(self, host, size, resource_id=None):
+        db.capacity_reservation_create(context.get_admin_context(), host,
+                                       size, self._expire(),
+                                       resource_id=resource_id)
+
+    def release(self, backend, before):
+        db.capacity_reservation_release(context.get_admin_context(),
+                                        backend, before)
+
+    def get_reserved(self):
+        reserved = {}
+        for r in db.capacity_reservation_get_all(
+                context.get_admin_context()):
+            reserved.setdefault(r['host'], []).append(
+                (r['size'], r['created_at']))
+        return reserved
@@ -53,7 +53,7 @@ LOG = logging.getLogger(__name__)
 class SchedulerManager(manager.Manager):
     """Chooses a host to create volumes."""
 
-    RPC_API_VERSION = '1.7'
+    RPC_API_VERSION = '1.10'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -79,13 +79,15 @@ class SchedulerManager(manager.Manager):
         self.request_service_capabilities(ctxt)
 
     def update_service_capabilities(self, context, service_name=None,
-                                    host=None, capabilities=None, **kwargs):
+                                    host=None, capabilities=None,
+                                    report=None, **kwargs):
         """Process a capability update from a service node."""
         if capabilities is None:
             capabilities = {}
         self.driver.update_service_capabilities(service_name,
                                                 host,
-                                                capabilities)
+                                                capabilities,
+                                                report=report)
 
     def create_consistencygroup(self, context, topic,
                                 group_id,
@@ -133,7 +135,8 @@ class SchedulerManager(manager.Manager):
             flow_engine.run()
 
     def request_service_capabilities(self, context):
-        volume_rpcapi.VolumeAPI().publish_service_capabilities(context)
+        volume_rpcapi.VolumeAPI().publish_service_capabilities(
+            context, full_report=True)
 
     def migrate_volume_to_host(self, context, topic, volume_id, host,
                                force_host_copy, request_spec,
@@ -245,6 +248,14 @@ class SchedulerManager(manager.Manager):
         """Get active pools from scheduler's cache."""
         return self.driver.get_pools(context, filters)
 
+    def get_pools_snapshot(self, context, filters=None, generation=None):
+        """Get active pools and the generation of scheduler's cache."""
+        return self.driver.get_pools_snapshot(context, filters, generation)
+
+    def get_timings(self, context):
+        """Get the timing spans summary of scheduling requests."""
+        return self.driver.get_timings(context)
+
     def _set_volume_state_and_notify(self, method, updates, context, ex,
                                      request_spec, msg=None):
         # TODO(harlowja): move into a task that just does this later.
@@ -0,0 +1,66 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Helpers to evaluate scheduler filters and weighers over partitions of the
+host list in a pool of green threads.
+"""
+
+from eventlet import greenpool
+from oslo.config import cfg
+
+
+scheduler_parallel_opts = [
+    cfg.IntOpt('scheduler_evaluation_workers',
+               default=1,
+               help='Number of green threads used to evaluate filters and '
+                    'weighers over partitions of the pool list. A value of '
+                    '1 evaluates every pool in the calling thread.'),
+    cfg.IntOpt('scheduler_evaluation_partition_size',
+               default=100,
+               help='Number of pools evaluated by one scheduler worker. '
+                    'Pool lists not larger than this are always evaluated '
+                    'serially.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(scheduler_parallel_opts)
+
+
+def overrides(obj, method_name, base_cls):
+    """Return True if obj's class overrides base_cls.method_name."""
+    method = getattr(type(obj), method_name)
+    base_method = getattr(base_cls, method_name)
+    return method.__func__ is not base_method.__func__
+
+
+def partition(objs, size):
+    """Split a list into consecutive chunks of at most size items."""
+    return [objs[i:i + size] for i in xrange(0, len(objs), size)]
+
+
+def map_partitions(func, objs):
+    """Apply func to partitions of objs and return the results in order.
+
+    When parallel evaluation is disabled, or objs fits in one partition,
+    func is simply called once with the whole list.
+    """
+    workers = CONF.scheduler_evaluation_workers
+    size = max(CONF.scheduler_evaluation_partition_size, 1)
+    if workers <= 1 or len(objs) <= size:
+        return [func(objs)]
+
+    pool = greenpool.GreenPool(workers)
+    return list(pool.imap(func, partition(objs, size)))
@@ -21,6 +21,7 @@ from oslo import messaging
 from oslo.serialization import jsonutils
 
 from cinder import rpc
+from cinder.scheduler import hash_ring
 
 
 CONF = cfg.CONF
@@ -40,6 +41,9 @@ class SchedulerAPI(object):
         1.5 - Add manage_existing method
         1.6 - Add create_consistencygroup method
         1.7 - Add get_active_pools method
+        1.8 - Add get_timings method
+        1.9 - Add report argument to update_service_capabilities
+        1.10 - Add get_pools_snapshot method
     '''
 
     RPC_API_VERSION = '1.0'
@@ -48,13 +52,22 @@ class SchedulerAPI(object):
         super(SchedulerAPI, self).__init__()
         target = messaging.Target(topic=CONF.scheduler_topic,
                                   version=self.RPC_API_VERSION)
-        self.client = rpc.get_client(target, version_cap='1.7')
+        self.client = rpc.get_client(target, version_cap='1.10')
+        self.partitioner = hash_ring.RequestPartitioner()
+
+    def _prepare(self, request_spec, **kwargs):
+        """Prepare a call to the scheduler owning the request, if any."""
+        owner = self.partitioner.get_owner(request_spec)
+        if owner:
+            kwargs['server'] = owner
+        return self.client.prepare(**kwargs)
 
     def create_consistencygroup(self, ctxt, topic, group_id,
                                 request_spec_list=None,
                                 filter_properties_list=None):
 
-        cctxt = self.client.prepare(version='1.6')
+        cctxt = self._prepare(request_spec_list and request_spec_list[0],
+                              version='1.6')
         request_spec_p_list = []
         for request_spec in request_spec_list:
             request_spec_p = jsonutils.to_primitive(request_spec)
@@ -70,7 +83,7 @@ class SchedulerAPI(object):
                       image_id=None, request_spec=None,
                       filter_properties=None):
 
-        cctxt = self.client.prepare(version='1.2')
+        cctxt = self._prepare(request_spec, version='1.2')
         request_spec_p = jsonutils.to_primitive(request_spec)
         return cctxt.cast(ctxt, 'create_volume',
                           topic=topic,
@@ -84,7 +97,7 @@ class SchedulerAPI(object):
                                force_host_copy=False, request_spec=None,
                                filter_properties=None):
 
-        cctxt = self.client.prepare(version='1.3')
+        cctxt = self._prepare(request_spec, version='1.3')
         request_spec_p = jsonutils.to_primitive(request_spec)
         return cctxt.cast(ctxt, 'migrate_volume_to_host',
                           topic=topic,
@@ -97,7 +110,7 @@ class SchedulerAPI(object):
     def retype(self, ctxt, topic, volume_id,
                request_spec=None, filter_properties=None):
 
-        cctxt = self.client.prepare(version='1.4')
+        cctxt = self._prepare(request_spec, version='1.4')
         request_spec_p = jsonutils.to_primitive(request_spec)
         return cctxt.cast(ctxt, 'retype',
                           topic=topic,
@@ -107,7 +120,7 @@ class SchedulerAPI(object):
 
     def manage_existing(self, ctxt, topic, volume_id,
                         request_spec=None, filter_properties=None):
-        cctxt = self.client.prepare(version='1.5')
+        cctxt = self._prepare(request_spec, version='1.5')
         request_spec_p = jsonutils.to_primitive(request_spec)
         return cctxt.cast(ctxt, 'manage_existing',
                           topic=topic,
@@ -120,11 +133,26 @@ class SchedulerAPI(object):
         return cctxt.call(ctxt, 'get_pools',
                           filters=filters)
 
+    def get_pools_snapshot(self, ctxt, filters=None, generation=None):
+        cctxt = self.client.prepare(version='1.10')
+        return cctxt.call(ctxt, 'get_pools_snapshot',
+                          filters=filters, generation=generation)
+
+    def get_timings(self, ctxt):
+        cctxt = self.client.prepare(version='1.8')
+        return cctxt.call(ctxt, 'get_timings')
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
-                                    capabilities):
+                                    capabilities, report=None):
         # FIXME(flaper87): What to do with fanout?
-        cctxt = self.client.prepare(fanout=True)
+        if report is None:
+            cctxt = self.client.prepare(fanout=True)
+            cctxt.cast(ctxt, 'update_service_capabilities',
+                       service_name=service_name, host=host,
+                       capabilities=capabilities)
+            return
+        cctxt = self.client.prepare(fanout=True, version='1.9')
         cctxt.cast(ctxt, 'update_service_capabilities',
                    service_name=service_name, host=host,
-                   capabilities=capabilities)
+                   capabilities=capabilities, report=report)
@@ -0,0 +1,172 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Timing spans for scheduler decisions.
+
+Each scheduling request collects a list of spans in a RequestTimer
+(refreshing host states, every filter and weigher, the DB update and the
+RPC cast).  SchedulerStats aggregates them per span name and keeps the
+spans of the most recent slow requests, which is what the scheduler_stats
+API extension reports.
+"""
+
+import collections
+import contextlib
+import time
+
+from oslo.config import cfg
+
+from cinder.i18n import _LW
+from cinder.openstack.common import log as logging
+
+
+scheduler_timing_opts = [
+    cfg.BoolOpt('scheduler_debug_timing',
+                default=False,
+                help='Log the timing spans of every scheduling request, '
+                     'including the host counts before and after each '
+                     'filter, at debug level.'),
+    cfg.FloatOpt('scheduler_slow_request_threshold',
+                 default=1.0,
+                 help='Scheduling requests taking longer than this number '
+                      'of seconds are logged with their timing spans and '
+                      'kept in the slow request history.'),
+    cfg.IntOpt('scheduler_slow_request_history',
+               default=20,
+               help='Number of slow scheduling requests kept for the '
+                    'scheduler timing report.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(scheduler_timing_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+class RequestTimer(object):
+    """Collects the timing spans of a single scheduling request."""
+
+    def __init__(self, name, resource_id=None):
+        self.name = name
+        self.resource_id = resource_id
+        self.spans = []
+        self.start = time.time()
+        self.end = None
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, elapsed, hosts_in=None, hosts_out=None):
+        self.spans.append({'name': name,
+                           'elapsed': elapsed,
+                           'hosts_in': hosts_in,
+                           'hosts_out': hosts_out})
+
+    def add_all(self, prefix, timings, host_counts=None):
+        """Add the per-class timings collected by a filter/weight handler."""
+        host_counts = host_counts or {}
+        for name, elapsed in timings.items():
+            hosts_in, hosts_out = host_counts.get(name, (None, None))
+            self.add('%s.%s' % (prefix, name), elapsed, hosts_in, hosts_out)
+
+    def stop(self):
+        self.end = time.time()
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self):
+        return {'name': self.name,
+                'resource_id': self.resource_id,
+                'elapsed': self.elapsed,
+                'spans': list(self.spans)}
+
+
+class SchedulerStats(object):
+    """Aggregates the timing spans of the requests of one scheduler."""
+
+    def __init__(self):
+        self.request_count = 0
+        self.spans = {}
+        self.slow_requests = collections.deque(
+            maxlen=CONF.scheduler_slow_request_history)
+
+    @contextlib.contextmanager
+    def request(self, name, resource_id=None):
+        """Time a scheduling request and record it when it finishes."""
+        timer = RequestTimer(name, resource_id)
+        try:
+            yield timer
+        finally:
+            timer.stop()
+            self.record(timer)
+
+    def _aggregate(self, name, elapsed):
+        entry = self.spans.setdefault(name, {'count': 0,
+                                             'total': 0.0,
+                                             'max': 0.0})
+        entry['count'] += 1
+        entry['total'] += elapsed
+        entry['max'] = max(entry['max'], elapsed)
+
+    def record(self, timer):
+        self.request_count += 1
+        self._aggregate(timer.name, timer.elapsed)
+        for span in timer.spans:
+            self._aggregate(span['name'], span['elapsed'])
+
+        if CONF.scheduler_debug_timing:
+            for span in timer.spans:
+                LOG.debug("%(request)s %(id)s: %(span)s took "
+                          "%(elapsed).4fs, hosts %(in)s -> %(out)s",
+                          {'request': timer.name, 'id': timer.resource_id,
+                           'span': span['name'],
+                           'elapsed': span['elapsed'],
+                           'in': span['hosts_in'],
+                           'out': span['hosts_out']})
+
+        if timer.elapsed >= CONF.scheduler_slow_request_threshold:
+            slowest = sorted(timer.spans, key=lambda s: s['elapsed'],
+                             reverse=True)[:3]
+            LOG.warning(_LW("Slow scheduling request %(request)s %(id)s "
+                            "took %(elapsed).3fs, slowest spans: "
+                            "%(spans)s"),
+                        {'request': timer.name, 'id': timer.resource_id,
+                         'elapsed': timer.elapsed,
+                         'spans': ', '.join('%s=%.3fs' % (s['name'],
+                                                          s['elapsed'])
+                                            for s in slowest)})
+            self.slow_requests.append(timer.to_dict())
+
+    def summary(self):
+        """Return the aggregated spans, slowest in total first."""
+        spans = []
+        for name, entry in self.spans.items():
+            spans.append({'name': name,
+                          'count': entry['count'],
+                          'total': entry['total'],
+                          'average': entry['total'] / entry['count'],
+                          'max': entry['max']})
+        spans.sort(key=lambda s: s['total'], reverse=True)
+        return {'requests': self.request_count,
+                'spans': spans,
+                'slow_requests': list(self.slow_requests)}
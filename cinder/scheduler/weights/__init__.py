@@ -0,0 +1,71 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Scheduler host weights
+"""
+
+import time
+
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler import base_weight
+from cinder.openstack.common.scheduler import weights
+from cinder.scheduler import parallel
+
+LOG = logging.getLogger(__name__)
+
+
+class HostWeightHandler(weights.HostWeightHandler):
+    """Host weight handler that can weigh host partitions in parallel.
+
+    Weighers relying on the default weigh_objects() score every host on
+    its own and are evaluated over partitions of the host list (see
+    cinder.scheduler.parallel).  Weighers overriding weigh_objects() are
+    given the full list.
+    """
+
+    def get_weighed_objects(self, weigher_classes, obj_list,
+                            weighing_properties, timings=None):
+        """Return a sorted (highest score first) list of WeighedHosts.
+
+        :param timings: optional dict, updated in place with the seconds
+                        spent in each weigher class, keyed by class name.
+        """
+        if not obj_list:
+            return []
+        if timings is None:
+            timings = {}
+
+        weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
+        for weigher_cls in weigher_classes:
+            weigher = weigher_cls()
+            name = weigher_cls.__name__
+            start = time.time()
+            if parallel.overrides(weigher, 'weigh_objects',
+                                  base_weight.BaseWeigher):
+                weigher.weigh_objects(weighed_objs, weighing_properties)
+            else:
+                parallel.map_partitions(
+                    lambda part: weigher.weigh_objects(part,
+                                                       weighing_properties),
+                    weighed_objs)
+            elapsed = time.time() - start
+            timings[name] = timings.get(name, 0.0) + elapsed
+            LOG.debug("Weigher %(name)s weighed %(count)d host(s) "
+                      "in %(elapsed).4fs",
+                      {'name': name, 'count': len(weighed_objs),
+                       'elapsed': elapsed})
+
+        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
@@ -0,0 +1,81 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Goodness Weigher.  Weigh hosts with an operator defined expression.
+
+The 'scheduler_goodness_function' option is evaluated for every host (see
+cinder.scheduler.expression for the syntax), higher results win.  To use
+the expression as a cost function, where lower results win, set the
+'goodness_weight_multiplier' option to a negative number.
+"""
+
+
+from oslo.config import cfg
+
+from cinder import exception
+from cinder.i18n import _LW
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler import weights
+from cinder.scheduler import expression
+
+
+LOG = logging.getLogger(__name__)
+
+
+goodness_weight_opts = [
+    cfg.StrOpt('scheduler_goodness_function',
+               default=None,
+               help='Expression used by the GoodnessWeigher to weigh '
+                    'hosts, higher results win. Hosts for which it cannot '
+                    'be evaluated get a weight of 0.'),
+    cfg.FloatOpt('goodness_weight_multiplier',
+                 default=1.0,
+                 help='Multiplier used for weighing the goodness function. '
+                      'Negative numbers turn it into a cost function.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(goodness_weight_opts)
+
+
+class GoodnessWeigher(weights.BaseHostWeigher):
+    def _weight_multiplier(self):
+        """Override the weight multiplier."""
+        return CONF.goodness_weight_multiplier
+
+    def _weigh_object(self, host_state, weight_properties):
+        if not CONF.scheduler_goodness_function:
+            return 0.0
+
+        try:
+            expr = expression.get_expression(
+                CONF.scheduler_goodness_function)
+        except exception.InvalidSchedulerExpression:
+            # Logged once by get_expression
+            return 0.0
+
+        try:
+            goodness = float(expr.evaluate(
+                expression.get_namespaces(host_state, weight_properties)))
+        except (exception.InvalidSchedulerExpression, TypeError,
+                ValueError) as e:
+            LOG.warning(_LW("Cannot weigh host %(host)s: %(error)s"),
+                        {'host': host_state.host, 'error': e})
+            return 0.0
+
+        LOG.debug("Goodness function for host %(host)s returned "
+                  "%(goodness)s",
+                  {'host': host_state.host, 'goodness': goodness})
+        return goodness
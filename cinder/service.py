@@ -33,7 +33,9 @@ import osprofiler.web
 
 from cinder import context
 from cinder import db
+from cinder.db.sqlalchemy import query_stats
 from cinder import exception
+from cinder import heartbeat
 from cinder.i18n import _
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import loopingcall
@@ -154,6 +156,9 @@ class Service(service.Service):
         target = messaging.Target(topic=self.topic, server=self.host)
         endpoints = [self.manager]
         endpoints.extend(self.manager.additional_endpoints)
+        if CONF.debug:
+            endpoints = [query_stats.Endpoint(endpoint)
+                         for endpoint in endpoints]
         self.rpcserver = rpc.get_server(target, endpoints)
         self.rpcserver.start()
 
@@ -282,23 +287,14 @@ class Service(service.Service):
     def report_state(self):
         """Update the state of this service in the datastore."""
         ctxt = context.get_admin_context()
-        zone = CONF.storage_availability_zone
-        state_catalog = {}
+        state_catalog = {'availability_zone': CONF.storage_availability_zone}
+        driver = heartbeat.get_driver()
         try:
-            try:
-                service_ref = db.service_get(ctxt, self.service_id)
-            except exception.NotFound:
+            if not driver.report(ctxt, self.service_id, state_catalog):
                 LOG.debug('The service database object disappeared, '
                           'Recreating it.')
                 self._create_service_ref(ctxt)
-                service_ref = db.service_get(ctxt, self.service_id)
-
-            state_catalog['report_count'] = service_ref['report_count'] + 1
-            if zone != service_ref['availability_zone']:
-                state_catalog['availability_zone'] = zone
-
-            db.service_update(ctxt,
-                              self.service_id, state_catalog)
+                driver.report(ctxt, self.service_id, state_catalog)
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(self, 'model_disconnected', False):
@@ -21,6 +21,7 @@ inline callbacks.
 
 """
 
+import contextlib
 import logging
 import os
 import shutil
@@ -42,7 +43,9 @@ import testtools
 from cinder.common import config  # noqa Need to register global_opts
 from cinder.db import migration
 from cinder.db.sqlalchemy import api as sqla_api
+from cinder.db.sqlalchemy import query_stats
 from cinder.openstack.common import log as oslo_logging
+from cinder import quota
 from cinder import rpc
 from cinder import service
 from cinder.tests import conf_fixture
@@ -167,6 +170,11 @@ class TestCase(testtools.TestCase):
                                  sqlite_clean_db=CONF.sqlite_clean_db)
         self.useFixture(_DB_CACHE)
 
+        # The quota resources of the volume types are cached per process,
+        # but every test starts with a fresh database.
+        quota.QUOTAS.invalidate_resources()
+        self.addCleanup(quota.QUOTAS.invalidate_resources)
+
         # emulate some of the mox stuff, we can't use the metaclass
         # because it screws with our generators
         self.mox = mox.Mox()
@@ -261,6 +269,24 @@ class TestCase(testtools.TestCase):
         return new_attr
 
     # Useful assertions
+    @contextlib.contextmanager
+    def assertMaxQueries(self, maximum):
+        """Assert that the block runs at most maximum database queries.
+
+        Yields the QueryStats of the block, whose statements are listed in
+        the failure message.
+        """
+        with query_stats.collect(self.id()) as stats:
+            yield stats
+        if stats.queries > maximum:
+            statements = '\n'.join('%d x %s' % (count, statement)
+                                   for statement, count
+                                   in stats.statements.most_common())
+            self.fail('%(queries)d database queries were run, more than the '
+                      '%(maximum)d allowed:\n%(statements)s' %
+                      {'queries': stats.queries, 'maximum': maximum,
+                       'statements': statements})
+
     def assertDictMatch(self, d1, d2, approx_equal=False, tolerance=0.001):
         """Assert two dicts are equivalent.
 
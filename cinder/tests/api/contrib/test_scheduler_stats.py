@@ -15,6 +15,7 @@
 #    under the License.
 
 import mock
+import webob
 
 from cinder.api.contrib import scheduler_stats
 from cinder import context
@@ -22,7 +23,7 @@ from cinder import test
 from cinder.tests.api import fakes
 
 
-def schedule_rpcapi_get_pools(self, context, filters=None):
+def schedule_rpcapi_get_pools(self, context, filters=None, generation=None):
     all_pools = []
     pool1 = dict(name='pool1',
                  capabilities=dict(
@@ -39,10 +40,12 @@ def schedule_rpcapi_get_pools(self, context, filters=None):
                      QoS_support='True', updated=None))
     all_pools.append(pool2)
 
-    return all_pools
+    if generation == 'gen-1':
+        return {'generation': generation, 'pools': None}
+    return {'generation': 'gen-1', 'pools': all_pools}
 
 
-@mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.get_pools',
+@mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.get_pools_snapshot',
             schedule_rpcapi_get_pools)
 class SchedulerStatsAPITest(test.TestCase):
     def setUp(self):
@@ -54,7 +57,7 @@ class SchedulerStatsAPITest(test.TestCase):
     def test_get_pools_summery(self):
         req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats')
         req.environ['cinder.context'] = self.ctxt
-        res = self.controller.get_pools(req)
+        res = self.controller.get_pools(req).obj
 
         self.assertEqual(2, len(res['pools']))
 
@@ -74,7 +77,7 @@ class SchedulerStatsAPITest(test.TestCase):
     def test_get_pools_detail(self):
         req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats?detail=True')
         req.environ['cinder.context'] = self.ctxt
-        res = self.controller.get_pools(req)
+        res = self.controller.get_pools(req).obj
 
         self.assertEqual(2, len(res['pools']))
 
@@ -108,3 +111,93 @@ class SchedulerStatsAPITest(test.TestCase):
         }
 
         self.assertDictMatch(res, expected)
+
+    @mock.patch('cinder.volume.volume_types.get_volume_type_by_name')
+    def test_get_pools_filters(self, _mock_get_type):
+        _mock_get_type.return_value = {'name': 'gold',
+                                       'extra_specs': {'tier': 'gold'}}
+        req = fakes.HTTPRequest.blank(
+            '/v2/fake/scheduler_stats/get_pools?backend_name=lvm'
+            '&capability=QoS_support:True&capability=thin'
+            '&volume_type=gold&fields=free_capacity&marker=pool0&limit=1')
+        req.environ['cinder.context'] = self.ctxt
+        with mock.patch.object(self.controller.scheduler_api,
+                               'get_pools_snapshot') as _mock_get_pools:
+            _mock_get_pools.return_value = {
+                'generation': 'gen-1',
+                'pools': [dict(name='pool1',
+                               capabilities=dict(free_capacity=100))]}
+            res = self.controller.get_pools(req)
+
+        filters = {'backend_name': 'lvm',
+                   'capabilities': {'QoS_support': 'True', 'thin': None},
+                   'volume_type': _mock_get_type.return_value,
+                   'fields': ['free_capacity'],
+                   'marker': 'pool0',
+                   'limit': 1}
+        _mock_get_pools.assert_called_once_with(self.ctxt, filters=filters,
+                                                generation=None)
+        self.assertEqual([{'name': 'pool1',
+                           'capabilities': {'free_capacity': 100}}],
+                         res.obj['pools'])
+        self.assertEqual(1, len(res.obj['pools_links']))
+        self.assertIn('marker=pool1', res.obj['pools_links'][0]['href'])
+
+    def _get_pools_limit(self, limit):
+        req = fakes.HTTPRequest.blank(
+            '/v2/fake/scheduler_stats/get_pools?limit=%s' % limit)
+        req.environ['cinder.context'] = self.ctxt
+        with mock.patch.object(self.controller.scheduler_api,
+                               'get_pools_snapshot') as _mock_get_pools:
+            _mock_get_pools.return_value = {'generation': 'gen-1',
+                                            'pools': []}
+            self.controller.get_pools(req)
+        return _mock_get_pools.call_args[1]['filters']['limit']
+
+    def test_get_pools_limit_clamped(self):
+        self.flags(osapi_max_limit=100)
+        self.assertEqual(10, self._get_pools_limit(10))
+        self.assertEqual(100, self._get_pools_limit(0))
+        self.assertEqual(100, self._get_pools_limit(1000))
+
+    def test_get_pools_invalid_limit(self):
+        for limit in ('-1', 'abc'):
+            self.assertRaises(webob.exc.HTTPBadRequest,
+                              self._get_pools_limit, limit)
+
+    def test_get_pools_etag(self):
+        req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats')
+        req.environ['cinder.context'] = self.ctxt
+        res = self.controller.get_pools(req)
+        etag = res['ETag']
+        self.assertTrue(etag.startswith('"gen-1:'))
+
+        req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats')
+        req.environ['cinder.context'] = self.ctxt
+        req.headers['If-None-Match'] = etag
+        res = self.controller.get_pools(req)
+        self.assertEqual(304, res.status_int)
+        self.assertEqual(etag, res.headers['ETag'])
+
+        # The ETag of another query does not match.
+        req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats?detail=True')
+        req.environ['cinder.context'] = self.ctxt
+        req.headers['If-None-Match'] = etag
+        res = self.controller.get_pools(req)
+        self.assertEqual(2, len(res.obj['pools']))
+
+    @mock.patch('cinder.scheduler.rpcapi.SchedulerAPI.get_timings')
+    def test_get_timings(self, _mock_get_timings):
+        summary = {
+            'requests': 2,
+            'spans': [{'name': 'filter', 'count': 2, 'total': 0.5,
+                       'average': 0.25, 'max': 0.3}],
+            'slow_requests': [],
+        }
+        _mock_get_timings.return_value = summary
+        req = fakes.HTTPRequest.blank('/v2/fake/scheduler_stats/get_timings')
+        req.environ['cinder.context'] = self.ctxt
+        res = self.controller.get_timings(req)
+
+        _mock_get_timings.assert_called_once_with(self.ctxt)
+        self.assertDictMatch({'timings': summary}, res)
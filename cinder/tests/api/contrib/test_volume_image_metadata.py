@@ -17,6 +17,7 @@ import json
 import uuid
 from xml.dom import minidom
 
+import mock
 import webob
 
 from cinder.api import common
@@ -65,6 +66,11 @@ def fake_get_volumes_image_metadata(*args, **kwargs):
     return {'fake': fake_image_metadata}
 
 
+def fake_get_list_volumes_image_metadata(self, context, volume_id_list):
+    return dict((volume_id, fake_image_metadata)
+                for volume_id in volume_id_list)
+
+
 class VolumeImageMetadataTest(test.TestCase):
     content_type = 'application/json'
 
@@ -76,6 +82,8 @@ class VolumeImageMetadataTest(test.TestCase):
                        fake_get_volume_image_metadata)
         self.stubs.Set(volume.API, 'get_volumes_image_metadata',
                        fake_get_volumes_image_metadata)
+        self.stubs.Set(volume.API, 'get_list_volumes_image_metadata',
+                       fake_get_list_volumes_image_metadata)
         self.stubs.Set(db, 'volume_get', fake_volume_get)
         self.UUID = uuid.uuid4()
 
@@ -106,6 +114,18 @@ class VolumeImageMetadataTest(test.TestCase):
         self.assertEqual(self._get_image_metadata_list(res.body)[0],
                          fake_image_metadata)
 
+    @mock.patch.object(volume.API, 'get_volumes_image_metadata')
+    def test_list_detail_volumes_reads_page_metadata(self, get_all_metadata):
+        with mock.patch.object(volume.API,
+                               'get_list_volumes_image_metadata') as get_meta:
+            get_meta.return_value = {'fake': fake_image_metadata}
+            res = self._make_request('/v2/fake/volumes/detail')
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(self._get_image_metadata_list(res.body)[0],
+                         fake_image_metadata)
+        get_meta.assert_called_once_with(mock.ANY, ['fake'])
+        self.assertFalse(get_all_metadata.called)
+
 
 class ImageMetadataXMLDeserializer(common.MetadataXMLDeserializer):
     metadata_node_name = "volume_image_metadata"
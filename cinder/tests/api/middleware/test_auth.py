@@ -74,3 +74,48 @@ class TestCinderKeystoneContextMiddleware(test.TestCase):
         self.request.environ[request_id.ENV_REQUEST_ID] = req_id
         self.request.get_response(self.middleware)
         self.assertEqual(req_id, self.context.request_id)
+
+    def test_read_replica_default(self):
+        self.request.headers['X_USER_ID'] = 'testuserid'
+        self.request.get_response(self.middleware)
+        self.assertIsNone(self.context.read_replica)
+
+    def test_read_replica_disabled(self):
+        self.request.headers['X_USER_ID'] = 'testuserid'
+        self.request.headers['X-Read-Replica'] = 'false'
+        self.request.get_response(self.middleware)
+        self.assertIs(False, self.context.read_replica)
+
+    def test_read_replica_enabled(self):
+        self.request.headers['X_USER_ID'] = 'testuserid'
+        self.request.headers['X-Read-Replica'] = 'true'
+        self.request.get_response(self.middleware)
+        self.assertIsNone(self.context.read_replica)
+
+
+class TestNoAuthMiddleware(test.TestCase):
+
+    def setUp(self):
+        super(TestNoAuthMiddleware, self).setUp()
+
+        @webob.dec.wsgify()
+        def fake_app(req):
+            self.context = req.environ['cinder.context']
+            return webob.Response()
+
+        self.context = None
+        self.middleware = cinder.api.middleware.auth.NoAuthMiddleware(
+            fake_app)
+        self.request = webob.Request.blank('/')
+        self.request.headers['X-Auth-Token'] = 'testuser:testproject'
+
+    def test_context(self):
+        self.request.get_response(self.middleware)
+        self.assertEqual('testuser', self.context.user_id)
+        self.assertEqual('testproject', self.context.project_id)
+        self.assertIsNone(self.context.read_replica)
+
+    def test_read_replica_disabled(self):
+        self.request.headers['X-Read-Replica'] = 'False'
+        self.request.get_response(self.middleware)
+        self.assertIs(False, self.context.read_replica)
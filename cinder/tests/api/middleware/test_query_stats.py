@@ -0,0 +1,47 @@
+# Copyright (c) 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import webob
+import webob.dec
+
+from cinder.api.middleware import query_stats
+from cinder import context
+from cinder import db
+from cinder import test
+
+
+class TestQueryStatsMiddleware(test.TestCase):
+
+    def setUp(self):
+        super(TestQueryStatsMiddleware, self).setUp()
+
+        @webob.dec.wsgify()
+        def fake_app(req):
+            db.volume_get_all(context.get_admin_context(), None, None,
+                              ['id'], ['asc'])
+            return webob.Response()
+
+        self.middleware = query_stats.QueryStatsMiddleware(fake_app)
+
+    def test_headers(self):
+        self.flags(debug=True)
+        response = webob.Request.blank('/').get_response(self.middleware)
+        self.assertEqual('1', response.headers['X-DB-Query-Count'])
+        self.assertEqual('0', response.headers['X-DB-Query-Rows'])
+        self.assertIn('X-DB-Query-Time', response.headers)
+
+    def test_no_headers_without_debug(self):
+        self.flags(debug=False)
+        response = webob.Request.blank('/').get_response(self.middleware)
+        self.assertNotIn('X-DB-Query-Count', response.headers)
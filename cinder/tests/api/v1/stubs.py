@@ -105,6 +105,14 @@ def stub_volume_get_all_by_project(self, context, search_opts=None):
     return [stub_volume_get(self, context, '1')]
 
 
+def stub_snapshot_filter(snapshots, filters=None):
+    """Applies the exact match filters the database would."""
+    filters = filters or {}
+    return [snapshot for snapshot in snapshots
+            if all(snapshot.get(key) == value
+                   for key, value in filters.items())]
+
+
 def stub_snapshot(id, **kwargs):
     snapshot = {'id': id,
                 'volume_id': 12,
@@ -119,14 +127,15 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self):
-    return [stub_snapshot(100, project_id='fake'),
-            stub_snapshot(101, project_id='superfake'),
-            stub_snapshot(102, project_id='superduperfake')]
+def stub_snapshot_get_all(self, filters=None, **kwargs):
+    return stub_snapshot_filter(
+        [stub_snapshot(100, project_id='fake'),
+         stub_snapshot(101, project_id='superfake'),
+         stub_snapshot(102, project_id='superduperfake')], filters)
 
 
-def stub_snapshot_get_all_by_project(self, context):
-    return [stub_snapshot(1)]
+def stub_snapshot_get_all_by_project(self, context, filters=None, **kwargs):
+    return stub_snapshot_filter([stub_snapshot(1)], filters)
 
 
 def stub_snapshot_update(self, context, *args, **param):
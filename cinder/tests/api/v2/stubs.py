@@ -125,7 +125,7 @@ def stub_volume_get_db(context, volume_id):
 
 def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
                         sort_key='created_at', sort_dir='desc', filters=None,
-                        viewable_admin_meta=False):
+                        viewable_admin_meta=False, fields=None, cursor=None):
     return [stub_volume(100, project_id='fake'),
             stub_volume(101, project_id='superfake'),
             stub_volume(102, project_id='superduperfake')]
@@ -133,11 +133,20 @@ def stub_volume_get_all(context, search_opts=None, marker=None, limit=None,
 
 def stub_volume_get_all_by_project(self, context, marker, limit, sort_key,
                                    sort_dir, filters=None,
-                                   viewable_admin_meta=False):
+                                   viewable_admin_meta=False,
+                                   fields=None, cursor=None):
     filters = filters or {}
     return [stub_volume_get(self, context, '1')]
 
 
+def stub_snapshot_filter(snapshots, filters=None):
+    """Applies the exact match filters the database would."""
+    filters = filters or {}
+    return [snapshot for snapshot in snapshots
+            if all(snapshot.get(key) == value
+                   for key, value in filters.items())]
+
+
 def stub_snapshot(id, **kwargs):
     snapshot = {'id': id,
                 'volume_id': 12,
@@ -152,14 +161,15 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self):
-    return [stub_snapshot(100, project_id='fake'),
-            stub_snapshot(101, project_id='superfake'),
-            stub_snapshot(102, project_id='superduperfake')]
+def stub_snapshot_get_all(self, filters=None, **kwargs):
+    return stub_snapshot_filter(
+        [stub_snapshot(100, project_id='fake'),
+         stub_snapshot(101, project_id='superfake'),
+         stub_snapshot(102, project_id='superduperfake')], filters)
 
 
-def stub_snapshot_get_all_by_project(self, context):
-    return [stub_snapshot(1)]
+def stub_snapshot_get_all_by_project(self, context, filters=None, **kwargs):
+    return stub_snapshot_filter([stub_snapshot(1)], filters)
 
 
 def stub_snapshot_update(self, context, *args, **param):
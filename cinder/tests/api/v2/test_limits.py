@@ -20,7 +20,9 @@ Tests dealing with HTTP rate-limiting.
 import httplib
 from xml.dom import minidom
 
+import fixtures
 from lxml import etree
+import mock
 from oslo.serialization import jsonutils
 import six
 import webob
@@ -258,6 +260,17 @@ class LimitMiddlewareTest(BaseLimitTestSuite):
         response = request.get_response(self.app)
         self.assertEqual(200, response.status_int)
 
+    def test_good_request_single_backend_call(self):
+        """Test the limits are reported without reading the backend."""
+        backend = self.app._limiter.backend
+        request = webob.Request.blank("/")
+        with mock.patch.object(backend, 'get') as mock_get:
+            response = request.get_response(self.app)
+        self.assertEqual(200, response.status_int)
+        self.assertFalse(mock_get.called)
+        limit = request.environ["cinder.limits"][0]
+        self.assertEqual(0, limit["remaining"])
+
     def test_limited_request_json(self):
         """Test a rate-limited (413) GET request through middleware."""
         request = webob.Request.blank("/")
@@ -564,6 +577,138 @@ class LimiterTest(BaseLimitTestSuite):
         self.assertEqual(expected, results)
 
 
+class LimitMatcherTest(BaseLimitTestSuite):
+
+    """Tests for the `limits.LimitMatcher` class."""
+
+    def test_match(self):
+        matcher = limits.LimitMatcher(TEST_LIMITS)
+        self.assertEqual([1, 2], matcher.match("POST", "/volumes/1"))
+        self.assertEqual([1], matcher.match("POST", "/snapshots"))
+        self.assertEqual([3], matcher.match("PUT", "/snapshots"))
+        self.assertEqual([], matcher.match("GET", "/snapshots"))
+        self.assertEqual([], matcher.match("DELETE", "/volumes"))
+
+    def test_match_chunks(self):
+        self.stubs.Set(limits, 'MATCHER_CHUNK_SIZE', 2)
+        _limits = [limits.Limit("GET", "/%d" % i, "^/%d" % i, 1,
+                                limits.PER_MINUTE)
+                   for i in range(5)]
+        _limits.append(limits.Limit("GET", "*", ".*", 1, limits.PER_MINUTE))
+        matcher = limits.LimitMatcher(_limits)
+        self.assertEqual([3, 5], matcher.match("GET", "/3"))
+        self.assertEqual([5], matcher.match("GET", "/6"))
+
+
+class BackendTestMixin(object):
+
+    def _check(self, limiter, num, verb, url, username=None):
+        return [limiter.check_for_delay(verb, url, username)[0]
+                for x in xrange(num)]
+
+    def test_shared_state(self):
+        limiter1 = limits.Limiter(TEST_LIMITS, backend=self.backend)
+        limiter2 = limits.Limiter(TEST_LIMITS, backend=self._get_backend())
+
+        self.assertEqual([None] * 5,
+                         self._check(limiter1, 5, "PUT", "/anything"))
+        self.assertEqual([None] * 5 + [6.0],
+                         self._check(limiter2, 6, "PUT", "/anything"))
+        self.assertEqual([6.0], self._check(limiter1, 1, "PUT", "/anything"))
+        self.assertEqual([None],
+                         self._check(limiter1, 1, "PUT", "/anything",
+                                     "user1"))
+
+        displayed = dict((limit['URI'], limit)
+                         for limit in limiter2.get_limits())
+        self.assertEqual(0, displayed['*']['remaining'])
+        self.assertEqual(6, displayed['*']['resetTime'])
+
+    def test_get_limits_user(self):
+        limiter = limits.Limiter(TEST_LIMITS, backend=self.backend,
+                                 **{'limits.user0': '(put, *, .*, 2, minute)'})
+        self._check(limiter, 1, "PUT", "/anything", "user0")
+        self.assertEqual([1], [limit['remaining']
+                               for limit in limiter.get_limits("user0")])
+        self.assertEqual([1, 7, 3, 10, 5],
+                         [limit['value']
+                          for limit in limiter.get_limits("user1")])
+
+
+class LocalBackendTest(BackendTestMixin, BaseLimitTestSuite):
+
+    """Tests for the `limits.LocalBackend` class."""
+
+    def setUp(self):
+        super(LocalBackendTest, self).setUp()
+        self.backend = limits.LocalBackend()
+
+    def _get_backend(self):
+        return self.backend
+
+    def test_configured_backend(self):
+        limiter = limits.Limiter(TEST_LIMITS)
+        self.assertIsInstance(limiter.backend, limits.LocalBackend)
+        self.assertIsNot(limiter.backend,
+                         limits.Limiter(TEST_LIMITS).backend)
+
+    def test_default_backend(self):
+        self.assertIsInstance(limits.get_backend(), limits.LocalBackend)
+
+
+class FileBackendTest(BackendTestMixin, BaseLimitTestSuite):
+
+    """Tests for the `limits.FileBackend` class."""
+
+    def setUp(self):
+        super(FileBackendTest, self).setUp()
+        self.flags(rate_limit_backend='cinder.api.v2.limits.FileBackend',
+                   rate_limit_state_path=self.useFixture(
+                       fixtures.TempDir()).path)
+        self.backend = self._get_backend()
+
+    def _get_backend(self):
+        return limits.get_backend()
+
+    def test_get_missing(self):
+        self.assertIsNone(self.backend.get('user1'))
+
+    def test_update(self):
+        self.assertEqual('result',
+                         self.backend.update(u'user\u00e9',
+                                             lambda state: ('result', [1])))
+        self.assertEqual([1], self.backend.get(u'user\u00e9'))
+        self.assertIsNone(self.backend.get(None))
+
+
+class DbBackendTest(BackendTestMixin, BaseLimitTestSuite):
+
+    """Tests for the `limits.DbBackend` class."""
+
+    def setUp(self):
+        super(DbBackendTest, self).setUp()
+        self.flags(rate_limit_backend='cinder.api.v2.limits.DbBackend')
+        self.backend = self._get_backend()
+
+    def _get_backend(self):
+        return limits.get_backend()
+
+    def test_get_missing(self):
+        self.assertIsNone(self.backend.get('user1'))
+
+    def test_update(self):
+        self.assertEqual('result',
+                         self.backend.update(u'user\u00e9',
+                                             lambda state: ('result', [1])))
+        self.assertEqual([1], self.backend.get(u'user\u00e9'))
+        self.assertEqual('result2',
+                         self.backend.update(u'user\u00e9',
+                                             lambda state: ('result2',
+                                                            state + [2])))
+        self.assertEqual([1, 2], self.backend.get(u'user\u00e9'))
+        self.assertIsNone(self.backend.get(None))
+
+
 class WsgiLimiterTest(BaseLimitTestSuite):
 
     """Tests for `limits.WsgiLimiter` class."""
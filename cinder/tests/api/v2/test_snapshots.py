@@ -16,6 +16,7 @@
 import datetime
 
 from lxml import etree
+import mock
 import webob
 
 from cinder.api.v2 import snapshots
@@ -70,7 +71,7 @@ def stub_snapshot_get(self, context, snapshot_id):
     return param
 
 
-def stub_snapshot_get_all(self, context, search_opts=None):
+def stub_snapshot_get_all(self, context, search_opts=None, **kwargs):
     param = _get_default_snapshot_param()
     return [param]
 
@@ -246,15 +247,16 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp_snapshot['id'], UUID)
 
     def test_snapshot_list_by_status(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id,
+                                             filters=None, **kwargs):
+            return stubs.stub_snapshot_filter([
                 stubs.stub_snapshot(1, display_name='backup1',
                                     status='available'),
                 stubs.stub_snapshot(2, display_name='backup2',
                                     status='available'),
                 stubs.stub_snapshot(3, display_name='backup3',
                                     status='creating'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -279,12 +281,13 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(len(resp['snapshots']), 0)
 
     def test_snapshot_list_by_volume(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id,
+                                             filters=None, **kwargs):
+            return stubs.stub_snapshot_filter([
                 stubs.stub_snapshot(1, volume_id='vol1', status='creating'),
                 stubs.stub_snapshot(2, volume_id='vol1', status='available'),
                 stubs.stub_snapshot(3, volume_id='vol2', status='available'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -308,12 +311,13 @@ class SnapshotApiTest(test.TestCase):
         self.assertEqual(resp['snapshots'][0]['status'], 'available')
 
     def test_snapshot_list_by_name(self):
-        def stub_snapshot_get_all_by_project(context, project_id):
-            return [
+        def stub_snapshot_get_all_by_project(context, project_id,
+                                             filters=None, **kwargs):
+            return stubs.stub_snapshot_filter([
                 stubs.stub_snapshot(1, display_name='backup1'),
                 stubs.stub_snapshot(2, display_name='backup2'),
                 stubs.stub_snapshot(3, display_name='backup3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'snapshot_get_all_by_project',
                        stub_snapshot_get_all_by_project)
 
@@ -339,14 +343,45 @@ class SnapshotApiTest(test.TestCase):
         self.assertIn('snapshots', res)
         self.assertEqual(1, len(res['snapshots']))
 
+    @mock.patch.object(volume.api.API, 'get_all_snapshots')
+    def test_snapshot_list_with_pagination(self, get_all_snapshots):
+        get_all_snapshots.return_value = [stubs.stub_snapshot(1)]
+        req = fakes.HTTPRequest.blank('/v2/snapshots?marker=m&limit=1'
+                                      '&sort_key=id&sort_dir=asc'
+                                      '&status=available')
+        resp = self.controller.index(req)
+
+        self.assertEqual(1, len(resp['snapshots']))
+        get_all_snapshots.assert_called_once_with(
+            req.environ['cinder.context'],
+            search_opts={'status': 'available'}, marker='m', limit='1',
+            sort_key='id', sort_dir='asc')
+
+    @mock.patch.object(volume.api.API, 'get_all_snapshots')
+    def test_snapshot_list_default_sort(self, get_all_snapshots):
+        get_all_snapshots.return_value = []
+        req = fakes.HTTPRequest.blank('/v2/snapshots?limit=1&offset=1')
+        self.controller.index(req)
+
+        # The offset is applied on the listing, so is the limit
+        get_all_snapshots.assert_called_once_with(
+            req.environ['cinder.context'], search_opts={}, marker=None,
+            limit=None, sort_key='created_at', sort_dir='desc')
+
+    def test_snapshot_list_invalid_limit(self):
+        req = fakes.HTTPRequest.blank('/v2/snapshots?limit=a')
+        self.assertRaises(exception.InvalidInput,
+                          self.controller.index, req)
+
     def test_list_snapshots_with_limit_and_offset(self):
         def list_snapshots_with_limit_and_offset(is_admin):
-            def stub_snapshot_get_all_by_project(context, project_id):
-                return [
+            def stub_snapshot_get_all_by_project(context, project_id,
+                                                 filters=None, **kwargs):
+                return stubs.stub_snapshot_filter([
                     stubs.stub_snapshot(1, display_name='backup1'),
                     stubs.stub_snapshot(2, display_name='backup2'),
                     stubs.stub_snapshot(3, display_name='backup3'),
-                ]
+                ], filters)
 
             self.stubs.Set(db, 'snapshot_get_all_by_project',
                            stub_snapshot_get_all_by_project)
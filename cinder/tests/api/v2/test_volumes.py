@@ -32,6 +32,7 @@ from cinder.tests.api import fakes
 from cinder.tests.api.v2 import stubs
 from cinder.tests import fake_notifier
 from cinder.tests.image import fake as fake_image
+from cinder import utils
 from cinder.volume import api as volume_api
 
 CONF = cfg.CONF
@@ -812,6 +813,21 @@ class VolumeApiTest(test.TestCase):
         # Finally test that we cached the returned volumes
         self.assertEqual(1, len(req.cached_resource()))
 
+    def test_volume_list_summary_loads_summary_fields(self):
+        def stub_volume_get_all_by_project(context, project_id, marker,
+                                           limit, sort_key, sort_dir,
+                                           filters=None, fields=None,
+                                           cursor=None):
+            self.assertEqual(('id', 'display_name'), fields)
+            return [stubs.stub_volume(1)]
+        self.stubs.Set(db, 'volume_get_all_by_project',
+                       stub_volume_get_all_by_project)
+
+        req = fakes.HTTPRequest.blank('/v2/volumes')
+        res_dict = self.controller.index(req)
+        self.assertEqual(1, len(res_dict['volumes']))
+        self.assertEqual('displayname', res_dict['volumes'][0]['name'])
+
     def test_volume_list_detail(self):
         self.stubs.Set(volume_api.API, 'get_all',
                        stubs.stub_volume_get_all_by_project)
@@ -928,7 +944,8 @@ class VolumeApiTest(test.TestCase):
     def test_volume_index_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_key, sort_dir, filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -963,6 +980,53 @@ class VolumeApiTest(test.TestCase):
         self.assertTrue('marker' in params)
         self.assertEqual('1', params['limit'][0])
 
+    def test_volume_index_cursor(self):
+        def stub_volume_get_all_by_project(context, project_id, marker, limit,
+                                           sort_key, sort_dir, filters=None,
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
+            self.assertIsNone(marker)
+            self.assertEqual('fake-cursor', cursor)
+            self.assertEqual(['size', 'display_name'], sort_key)
+            self.assertEqual(['desc', 'asc'], sort_dir)
+            self.assertEqual(('id', 'display_name', 'size', 'created_at'),
+                             fields)
+            return [stubs.stub_volume(1, size=2, display_name='vol1')]
+        self.stubs.Set(db, 'volume_get_all_by_project',
+                       stub_volume_get_all_by_project)
+
+        req = fakes.HTTPRequest.blank('/v2/volumes?cursor=fake-cursor&'
+                                      'limit=1&sort_key=size,display_name&'
+                                      'sort_dir=desc,asc')
+        res_dict = self.controller.index(req)
+
+        links = res_dict['volumes_links']
+        self.assertEqual(links[0]['rel'], 'next')
+        params = urlparse.parse_qs(urlparse.urlparse(links[0]['href']).query)
+        self.assertFalse('marker' in params)
+        self.assertEqual([2, 'vol1', datetime.datetime(1900, 1, 1, 1, 1, 1),
+                          1],
+                         utils.decode_pagination_cursor(params['cursor'][0]))
+
+    def test_volume_index_cursor_pagination_enabled(self):
+        self.flags(osapi_volume_cursor_pagination=True)
+        self.stubs.Set(db, 'volume_get_all_by_project',
+                       stubs.stub_volume_get_all_by_project)
+
+        req = fakes.HTTPRequest.blank('/v2/volumes/detail?limit=1')
+        res_dict = self.controller.detail(req)
+
+        href = res_dict['volumes_links'][0]['href']
+        params = urlparse.parse_qs(urlparse.urlparse(href).query)
+        self.assertFalse('marker' in params)
+        self.assertTrue('cursor' in params)
+
+    def test_volume_index_marker_and_cursor(self):
+        req = fakes.HTTPRequest.blank('/v2/volumes?marker=1&cursor=abc')
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index,
+                          req)
+
     def test_volume_index_limit_negative(self):
         req = fakes.HTTPRequest.blank('/v2/volumes?limit=-1')
         self.assertRaises(exception.Invalid,
@@ -989,7 +1053,8 @@ class VolumeApiTest(test.TestCase):
     def test_volume_index_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_key, sort_dir, filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1017,7 +1082,8 @@ class VolumeApiTest(test.TestCase):
     def test_volume_detail_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_key, sort_dir, filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1078,7 +1144,8 @@ class VolumeApiTest(test.TestCase):
     def test_volume_detail_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_key, sort_dir, filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
             return [
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
@@ -1137,7 +1204,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all(context, marker, limit,
                                 sort_key, sort_dir,
                                 filters=None,
-                                viewable_admin_meta=False):
+                                viewable_admin_meta=False,
+                                fields=None, cursor=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(CONF.osapi_max_limit)]
             if limit is None or limit >= len(vols):
@@ -1156,7 +1224,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all2(context, marker, limit,
                                  sort_key, sort_dir,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 fields=None, cursor=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(100)]
             if limit is None or limit >= len(vols):
@@ -1174,7 +1243,8 @@ class VolumeApiTest(test.TestCase):
         def stub_volume_get_all3(context, marker, limit,
                                  sort_key, sort_dir,
                                  filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 fields=None, cursor=None):
             vols = [stubs.stub_volume(i)
                     for i in xrange(CONF.osapi_max_limit + 100)]
             if limit is None or limit >= len(vols):
@@ -1214,14 +1284,16 @@ class VolumeApiTest(test.TestCase):
         # Non-admin, project function should be called with no_migration_status
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
                                            sort_key, sort_dir, filters=None,
-                                           viewable_admin_meta=False):
+                                           viewable_admin_meta=False,
+                                           fields=None, cursor=None):
             self.assertEqual(filters['no_migration_targets'], True)
             self.assertFalse('all_tenants' in filters)
             return [stubs.stub_volume(1, display_name='vol1')]
 
         def stub_volume_get_all(context, marker, limit,
                                 sort_key, sort_dir, filters=None,
-                                viewable_admin_meta=False):
+                                viewable_admin_meta=False,
+                                fields=None, cursor=None):
             return []
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
@@ -1238,13 +1310,15 @@ class VolumeApiTest(test.TestCase):
         # without no_migration_status
         def stub_volume_get_all_by_project2(context, project_id, marker, limit,
                                             sort_key, sort_dir, filters=None,
-                                            viewable_admin_meta=False):
+                                            viewable_admin_meta=False,
+                                            fields=None, cursor=None):
             self.assertFalse('no_migration_targets' in filters)
             return [stubs.stub_volume(1, display_name='vol2')]
 
         def stub_volume_get_all2(context, marker, limit,
                                  sort_key, sort_dir, filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 fields=None, cursor=None):
             return []
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project2)
@@ -1259,12 +1333,14 @@ class VolumeApiTest(test.TestCase):
         # without no_migration_status
         def stub_volume_get_all_by_project3(context, project_id, marker, limit,
                                             sort_key, sort_dir, filters=None,
-                                            viewable_admin_meta=False):
+                                            viewable_admin_meta=False,
+                                            fields=None, cursor=None):
             return []
 
         def stub_volume_get_all3(context, marker, limit,
                                  sort_key, sort_dir, filters=None,
-                                 viewable_admin_meta=False):
+                                 viewable_admin_meta=False,
+                                 fields=None, cursor=None):
             self.assertFalse('no_migration_targets' in filters)
             self.assertFalse('all_tenants' in filters)
             return [stubs.stub_volume(1, display_name='vol3')]
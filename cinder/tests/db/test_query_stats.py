@@ -0,0 +1,220 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the accounting of the database queries."""
+
+import mock
+from oslo.config import cfg
+from oslo.utils import importutils
+
+from cinder import context
+from cinder import db
+from cinder.db.sqlalchemy import query_stats
+from cinder import quota
+from cinder.scheduler import filters
+from cinder.scheduler.filters import affinity_filter
+from cinder.scheduler import weights
+from cinder.scheduler.weights import volume_number
+from cinder import test
+from cinder.tests.api import fakes
+from cinder.tests.scheduler import fakes as scheduler_fakes
+from cinder.tests import utils as tests_utils
+
+CONF = cfg.CONF
+
+
+class QueryStatsTestCase(test.TestCase):
+
+    def setUp(self):
+        super(QueryStatsTestCase, self).setUp()
+        self.ctxt = context.RequestContext('fake_user', 'fake_project',
+                                           is_admin=True)
+
+    def test_collect(self):
+        tests_utils.create_volume(self.ctxt)
+        tests_utils.create_volume(self.ctxt)
+        with query_stats.collect('test') as stats:
+            volumes = db.volume_get_all(self.ctxt, None, None, ['id'],
+                                        ['asc'])
+        self.assertEqual(2, len(volumes))
+        self.assertEqual(1, stats.queries)
+        self.assertEqual(2, stats.rows)
+        self.assertEqual(1, len(stats.statements))
+
+    def test_collect_write(self):
+        volume = tests_utils.create_volume(self.ctxt)
+        with query_stats.collect('test') as stats:
+            db.volume_update(self.ctxt, volume['id'], {'status': 'error'})
+        self.assertTrue(any(statement.startswith('UPDATE volumes')
+                            for statement in stats.statements))
+        self.assertTrue(stats.rows >= 1)
+
+    def test_collect_nested(self):
+        with query_stats.collect('outer') as outer:
+            db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+            with query_stats.collect('inner') as inner:
+                db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+        self.assertEqual(2, outer.queries)
+        self.assertEqual(1, inner.queries)
+
+    def test_not_collecting(self):
+        db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+        self.assertIsNone(query_stats._active())
+
+    @mock.patch.object(query_stats, 'LOG')
+    def test_report_repeated(self, mock_log):
+        self.flags(db_query_repeat_threshold=3)
+        volume = tests_utils.create_volume(self.ctxt)
+
+        def get_volumes():
+            for i in range(3):
+                db.volume_get(self.ctxt, volume['id'])
+
+        query_stats.instrument('get_volumes', get_volumes)()
+        self.assertTrue(mock_log.debug.called)
+        self.assertEqual(1, mock_log.warning.call_count)
+        self.assertEqual(3, mock_log.warning.call_args[0][1]['count'])
+
+    @mock.patch.object(query_stats, 'LOG')
+    def test_report_not_repeated(self, mock_log):
+        volume = tests_utils.create_volume(self.ctxt)
+        get_volume = query_stats.instrument('get_volume', db.volume_get)
+        get_volume(self.ctxt, volume['id'])
+        self.assertTrue(mock_log.debug.called)
+        self.assertFalse(mock_log.warning.called)
+
+    @mock.patch.object(query_stats, 'report')
+    def test_endpoint(self, mock_report):
+        class Manager(object):
+            target = 'target'
+
+            def get_volume(self, context, volume_id):
+                return db.volume_get(context, volume_id)
+
+        volume = tests_utils.create_volume(self.ctxt)
+        endpoint = query_stats.Endpoint(Manager())
+        self.assertEqual('target', endpoint.target)
+        self.assertEqual(volume['id'],
+                         endpoint.get_volume(self.ctxt, volume['id'])['id'])
+        stats = mock_report.call_args[0][0]
+        self.assertEqual('Manager.get_volume', stats.name)
+        self.assertEqual(1, stats.queries)
+
+    def test_assert_max_queries(self):
+        with self.assertMaxQueries(1):
+            db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+        self.assertRaises(AssertionError, self._run_two_queries)
+
+    def _run_two_queries(self):
+        with self.assertMaxQueries(1):
+            db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+            db.snapshot_get_all(self.ctxt)
+
+    def test_volume_get_all_by_project_budget(self):
+        for i in range(5):
+            volume = tests_utils.create_volume(self.ctxt)
+            tests_utils.create_snapshot(self.ctxt, volume['id'])
+        with self.assertMaxQueries(1):
+            volumes = db.volume_get_all_by_project(
+                self.ctxt, self.ctxt.project_id, None, None, ['id'], ['asc'])
+            for volume in volumes:
+                volume['volume_metadata']
+                volume['volume_type']
+        self.assertEqual(5, len(volumes))
+
+    def test_volume_list_api_budget(self):
+        """The extensions decorating the volumes add no query per volume."""
+        for i in range(5):
+            volume = tests_utils.create_volume(self.ctxt, metadata={'a': 'b'})
+            db.volume_glance_metadata_create(self.ctxt, volume['id'],
+                                             'image_id', 'fake_image')
+        app = fakes.wsgi_app(fake_auth_context=self.ctxt)
+        req = fakes.HTTPRequest.blank('/v2/fake_project/volumes/detail')
+        with self.assertMaxQueries(2):
+            res = req.get_response(app)
+        self.assertEqual(200, res.status_int)
+        volumes = res.json['volumes']
+        self.assertEqual(5, len(volumes))
+        # The extensions did decorate the volumes.
+        for volume in volumes:
+            self.assertEqual('test_host',
+                             volume['os-vol-host-attr:host'])
+            self.assertEqual('fake_project',
+                             volume['os-vol-tenant-attr:tenant_id'])
+            self.assertEqual({'image_id': 'fake_image'},
+                             volume['volume_image_metadata'])
+
+    def test_init_host_budget(self):
+        """init_host updates the volumes in bulk."""
+        self.flags(host='fake_host')
+        for status in ('available', 'in-use', 'downloading'):
+            for i in range(3):
+                # Legacy volumes, without a pool in their host.
+                tests_utils.create_volume(self.ctxt, host='fake_host',
+                                          status=status)
+        manager = importutils.import_object(CONF.volume_manager)
+        with mock.patch.object(manager.driver, 'ensure_export',
+                               side_effect=Exception()):
+            with self.assertMaxQueries(4):
+                manager.init_host()
+        volumes = db.volume_get_all(self.ctxt, None, None, ['id'], ['asc'])
+        self.assertEqual(3, len([volume for volume in volumes
+                                 if volume['status'] == 'available']))
+        self.assertTrue(all(volume['host'].startswith('fake_host#')
+                            for volume in volumes
+                            if volume['status'] == 'available'))
+
+    def test_quota_reserve_commit_budget(self):
+        reservations = quota.QUOTAS.reserve(self.ctxt, volumes=1,
+                                            gigabytes=1)
+        quota.QUOTAS.commit(self.ctxt, reservations)
+        # The usages exist now, the budget covers the steady state.
+        with self.assertMaxQueries(14):
+            reservations = quota.QUOTAS.reserve(self.ctxt, volumes=1,
+                                                gigabytes=1)
+            quota.QUOTAS.commit(self.ctxt, reservations)
+        usages = db.quota_usage_get_all_by_project(self.ctxt,
+                                                   self.ctxt.project_id)
+        self.assertEqual(2, usages['volumes']['in_use'])
+
+    def _get_hosts(self, count):
+        return [scheduler_fakes.FakeHostState('host%d' % i,
+                                              {'free_capacity_gb': 100})
+                for i in range(count)]
+
+    def test_affinity_filters_budget(self):
+        """The affinity filters look the volumes up once for all hosts."""
+        volume = tests_utils.create_volume(self.ctxt, host='host1')
+        hints = {'same_host': [volume['id']],
+                 'different_host': [volume['id']]}
+        filter_properties = {'context': self.ctxt,
+                             'scheduler_hints': hints}
+        handler = filters.HostFilterHandler('cinder.scheduler.filters')
+        for filter_class, expected in (
+                (affinity_filter.SameBackendFilter, ['host1']),
+                (affinity_filter.DifferentBackendFilter,
+                 ['host0', 'host2', 'host3', 'host4'])):
+            with self.assertMaxQueries(1):
+                hosts = handler.get_filtered_objects(
+                    [filter_class], self._get_hosts(5), filter_properties)
+            self.assertEqual(expected, [host.host for host in hosts])
+
+    def test_volume_number_weigher_budget(self):
+        """The volume number weigher runs one query per host."""
+        handler = weights.HostWeightHandler('cinder.scheduler.weights')
+        with self.assertMaxQueries(5):
+            handler.get_weighed_objects([volume_number.VolumeNumberWeigher],
+                                        self._get_hosts(5),
+                                        {'context': self.ctxt})
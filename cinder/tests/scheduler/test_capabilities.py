@@ -0,0 +1,161 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests for capability report deltas.
+"""
+
+import copy
+
+import mock
+
+from cinder import context
+from cinder import manager
+from cinder.scheduler import capabilities
+from cinder import test
+
+
+class CapabilityDeltaTestCase(test.TestCase):
+    """Test case for capability report deltas."""
+
+    def setUp(self):
+        super(CapabilityDeltaTestCase, self).setUp()
+        self.old = {'volume_backend_name': 'AAA',
+                    'vendor_name': 'Open Source',
+                    'QoS_support': False,
+                    'pools': [{'pool_name': 'pool1',
+                               'free_capacity_gb': 100,
+                               'total_capacity_gb': 500},
+                              {'pool_name': 'pool2',
+                               'free_capacity_gb': 200,
+                               'total_capacity_gb': 500}]}
+
+    def _assert_round_trip(self, new):
+        old = copy.deepcopy(self.old)
+        delta = capabilities.diff(old, new)
+        self.assertEqual(new, capabilities.apply(old, delta))
+        self.assertEqual(self.old, old)
+        return delta
+
+    def test_unchanged(self):
+        delta = self._assert_round_trip(copy.deepcopy(self.old))
+        self.assertEqual({}, delta)
+
+    def test_changed_fields(self):
+        new = copy.deepcopy(self.old)
+        new['QoS_support'] = True
+        del new['vendor_name']
+        new['pools'][1]['free_capacity_gb'] = 150
+
+        delta = self._assert_round_trip(new)
+        self.assertEqual({'set': {'QoS_support': True},
+                          'unset': ['vendor_name'],
+                          'pools': {'pool2': {'set': {'free_capacity_gb':
+                                                      150}}}},
+                         delta)
+
+    def test_added_and_removed_pools(self):
+        new = copy.deepcopy(self.old)
+        del new['pools'][0]
+        new['pools'].append({'pool_name': 'pool3',
+                             'free_capacity_gb': 300})
+
+        delta = self._assert_round_trip(new)
+        self.assertEqual({'pools': {'pool3': {'set': {'pool_name': 'pool3',
+                                                      'free_capacity_gb':
+                                                      300}}},
+                          'removed_pools': ['pool1']},
+                         delta)
+
+    def test_unchanged_pools_are_shared(self):
+        new = copy.deepcopy(self.old)
+        new['pools'][0]['free_capacity_gb'] = 50
+
+        result = capabilities.apply(self.old,
+                                    capabilities.diff(self.old, new))
+        self.assertIs(self.old['pools'][1], result['pools'][1])
+        self.assertEqual(50, result['pools'][0]['free_capacity_gb'])
+        self.assertEqual(100, self.old['pools'][0]['free_capacity_gb'])
+
+    def test_legacy_driver_without_pools(self):
+        self.old = {'volume_backend_name': 'AAA',
+                    'free_capacity_gb': 100}
+        delta = self._assert_round_trip({'volume_backend_name': 'AAA',
+                                         'free_capacity_gb': 90})
+        self.assertEqual({'set': {'free_capacity_gb': 90}}, delta)
+
+    def test_pools_added_to_legacy_driver(self):
+        new = copy.deepcopy(self.old)
+        self.old = {'volume_backend_name': 'AAA'}
+        self._assert_round_trip(new)
+
+
+class PublishCapabilitiesTestCase(test.TestCase):
+    """Test case for publishing capability report deltas."""
+
+    def setUp(self):
+        super(PublishCapabilitiesTestCase, self).setUp()
+        self.flags(capability_report_deltas=True,
+                   capability_full_report_interval=3)
+        self.context = context.get_admin_context()
+        self.manager = manager.SchedulerDependentManager(
+            host='host1', service_name='volume')
+
+    def _publish(self, stats, full_report=False):
+        self.manager.update_service_capabilities(stats)
+        with mock.patch.object(self.manager.scheduler_rpcapi,
+                               'update_service_capabilities') as mock_update:
+            self.manager._publish_service_capabilities(
+                self.context, full_report=full_report)
+        mock_update.assert_called_once_with(self.context, 'volume', 'host1',
+                                            mock.ANY, report=mock.ANY)
+        args, kwargs = mock_update.call_args
+        return args[3], kwargs['report']
+
+    def test_publish_deltas(self):
+        stats = {'pools': [{'pool_name': 'pool1', 'free_capacity_gb': 10}]}
+
+        caps, report = self._publish(stats)
+        self.assertEqual({'seq': 1, 'full': True}, report)
+        self.assertEqual(stats, caps)
+
+        # Drivers may update their stats in place.
+        stats['pools'][0]['free_capacity_gb'] = 5
+        caps, report = self._publish(stats)
+        self.assertEqual({'seq': 2, 'full': False}, report)
+        self.assertEqual({'pools': {'pool1': {'set': {'free_capacity_gb':
+                                                      5}}}},
+                         caps)
+
+        caps, report = self._publish(stats)
+        self.assertEqual({'seq': 3, 'full': False}, report)
+        self.assertEqual({}, caps)
+
+        # Every capability_full_report_interval reports are full ones.
+        caps, report = self._publish(stats)
+        self.assertEqual({'seq': 4, 'full': True}, report)
+        self.assertEqual(stats, caps)
+
+        caps, report = self._publish(stats, full_report=True)
+        self.assertEqual({'seq': 5, 'full': True}, report)
+
+    def test_publish_full_without_deltas(self):
+        self.flags(capability_report_deltas=False)
+        stats = {'free_capacity_gb': 10}
+        self.manager.update_service_capabilities(stats)
+        with mock.patch.object(self.manager.scheduler_rpcapi,
+                               'update_service_capabilities') as mock_update:
+            self.manager._publish_service_capabilities(self.context)
+        mock_update.assert_called_once_with(self.context, 'volume', 'host1',
+                                            stats)
@@ -0,0 +1,108 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For scheduler expressions.
+"""
+
+import mock
+
+from cinder import exception
+from cinder.scheduler import expression
+from cinder import test
+
+
+class ExpressionTestCase(test.TestCase):
+    """Test case for scheduler expressions."""
+
+    def setUp(self):
+        super(ExpressionTestCase, self).setUp()
+        self.namespaces = {'stats': {'free_capacity_gb': 300,
+                                     'total_capacity_gb': 1000},
+                           'capabilities': {'latency': 4,
+                                            'storage_protocol': 'iSCSI'},
+                           'volume': {'size': 10},
+                           'extra': {}}
+
+    def _evaluate(self, text):
+        return expression.Expression(text).evaluate(self.namespaces)
+
+    def test_arithmetic(self):
+        self.assertEqual(7, self._evaluate('1 + 2 * 3'))
+        self.assertEqual(9, self._evaluate('(1 + 2) * 3'))
+        self.assertEqual(2.5, self._evaluate('5 / 2'))
+        self.assertEqual(1, self._evaluate('7 % 3'))
+        self.assertEqual(512, self._evaluate('2 ^ 3 ^ 2'))
+        self.assertEqual(-4, self._evaluate('-2 ^ 2'))
+        self.assertEqual(0.5, self._evaluate('2 ^ -1'))
+        self.assertEqual(-1.5, self._evaluate('-.5 - 1'))
+
+    def test_comparisons_and_logic(self):
+        self.assertTrue(self._evaluate('1 < 2 and 2 <= 2'))
+        self.assertTrue(self._evaluate('1 > 2 || 2 >= 2'))
+        self.assertFalse(self._evaluate('not 1 == 1'))
+        self.assertTrue(self._evaluate('!(1 != 1) && true'))
+        self.assertFalse(self._evaluate('false or 0'))
+
+    def test_ternary(self):
+        self.assertEqual(1, self._evaluate('1 < 2 ? 1 : 2'))
+        self.assertEqual(3, self._evaluate('1 > 2 ? 1 : 2 > 3 ? 2 : 3'))
+
+    def test_functions(self):
+        self.assertEqual(3, self._evaluate('abs(-3)'))
+        self.assertEqual(1, self._evaluate('min(3, 1, 2)'))
+        self.assertEqual(3, self._evaluate('max(1, 3)'))
+
+    def test_variables(self):
+        expr = expression.Expression(
+            "stats.free_capacity_gb / stats.total_capacity_gb > 0.25 and "
+            "capabilities.storage_protocol == 'iSCSI' ? "
+            "100 - capabilities.latency - volume.size : 0")
+        self.assertEqual(86, expr.evaluate(self.namespaces))
+        self.assertEqual(frozenset(['stats.free_capacity_gb',
+                                    'stats.total_capacity_gb',
+                                    'capabilities.storage_protocol',
+                                    'capabilities.latency',
+                                    'volume.size']),
+                         expr.variables)
+
+    def test_parse_errors(self):
+        for text in ('', '1 +', '(1', '1 2', 'foo', 'stats.foo',
+                     'capabilities.', 'abs(1, 2)', 'max(1)', '1 ? 2',
+                     '__import__("os")', '1 ; 2', 'capabilities["a"]'):
+            self.assertRaises(exception.InvalidSchedulerExpression,
+                              expression.Expression, text)
+
+    def test_evaluation_errors(self):
+        for text in ('capabilities.missing', '1 / 0',
+                     "capabilities.storage_protocol - 1"):
+            self.assertRaises(exception.InvalidSchedulerExpression,
+                              self._evaluate, text)
+
+    def test_get_expression_parses_once(self):
+        expr = expression.get_expression('volume.size * 2')
+        self.assertIs(expr, expression.get_expression('volume.size * 2'))
+        self.assertEqual(20, expr.evaluate(self.namespaces))
+
+    @mock.patch.dict('cinder.scheduler.expression._expressions',
+                     clear=True)
+    @mock.patch.object(expression, 'LOG')
+    def test_get_expression_malformed_parses_once(self, mock_log):
+        with mock.patch.object(expression, 'Expression',
+                               wraps=expression.Expression) as mock_expr:
+            for i in range(3):
+                self.assertRaises(exception.InvalidSchedulerExpression,
+                                  expression.get_expression, 'volume.size +')
+        self.assertEqual(1, mock_expr.call_count)
+        self.assertEqual(1, mock_log.error.call_count)
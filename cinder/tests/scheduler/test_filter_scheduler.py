@@ -20,6 +20,7 @@ import mock
 
 from cinder import context
 from cinder import exception
+from cinder.openstack.common.scheduler import weights
 from cinder.scheduler import filter_scheduler
 from cinder.scheduler import host_manager
 from cinder.tests.scheduler import fakes
@@ -106,6 +107,40 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    @mock.patch('cinder.scheduler.filter_scheduler.FilterScheduler.'
+                '_weigh_hosts')
+    def test_get_weighted_candidates_group_combined_weight(self,
+                                                           _mock_weigh):
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = mock.Mock()
+        hosts = [host_manager.HostState('host%s' % i) for i in xrange(1, 4)]
+        sched.host_manager.get_all_host_states.return_value = iter(hosts)
+        sched.host_manager.get_filtered_hosts.side_effect = (
+            lambda hosts, *args, **kwargs: hosts)
+        _mock_weigh.side_effect = [
+            [weights.WeighedHost(hosts[0], 3),
+             weights.WeighedHost(hosts[1], 2),
+             weights.WeighedHost(hosts[2], 1)],
+            [weights.WeighedHost(hosts[2], 5),
+             weights.WeighedHost(hosts[1], 1)],
+        ]
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+        request_spec_list = [
+            {'volume_properties': {'project_id': 1, 'size': 0},
+             'volume_type': {'name': 'Type%s' % i, 'extra_specs': {}}}
+            for i in (1, 2)]
+
+        weighed_hosts = sched._get_weighted_candidates_group(
+            fake_context, request_spec_list)
+
+        # A single snapshot of the host states is used for every type and
+        # host1, filtered out by the second type, is dropped.
+        sched.host_manager.get_all_host_states.assert_called_once_with(
+            mock.ANY)
+        self.assertEqual([('host3', 6), ('host2', 3)],
+                         [(h.obj.host, h.weight) for h in weighed_hosts])
+
     def test_create_volume_no_hosts(self):
         # Ensure empty hosts/child_zones result in NoValidHosts exception.
         sched = fakes.FakeFilterScheduler()
@@ -162,6 +197,46 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertIsNotNone(weighed_host.obj)
         self.assertTrue(_mock_service_get_all_by_topic.called)
 
+    @mock.patch('cinder.volume.rpcapi.VolumeAPI.create_volume')
+    @mock.patch('cinder.scheduler.driver.volume_update_db')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_schedule_create_volume_records_timings(
+            self, _mock_service_get_all_by_topic, _mock_volume_update_db,
+            _mock_create_volume):
+        self.flags(scheduler_slow_request_threshold=0)
+        sched = fakes.FakeFilterScheduler()
+        sched.host_manager = fakes.FakeHostManager()
+        fake_context = context.RequestContext('user', 'project',
+                                              is_admin=True)
+
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+
+        request_spec = {'volume_type': {'name': 'LVM_iSCSI'},
+                        'volume_properties': {'project_id': 1,
+                                              'size': 300},
+                        'volume_id': 'fake-id1',
+                        'snapshot_id': None,
+                        'image_id': None}
+        sched.schedule_create_volume(fake_context, request_spec, {})
+        self.assertTrue(_mock_create_volume.called)
+
+        timings = sched.get_timings(fake_context)
+        self.assertEqual(1, timings['requests'])
+        names = [span['name'] for span in timings['spans']]
+        for name in ['create_volume', 'get_all_host_states', 'filter',
+                     'filter.CapacityFilter', 'weigh',
+                     'weigh.CapacityWeigher', 'update_db', 'rpc_cast']:
+            self.assertIn(name, names)
+
+        slow = timings['slow_requests'][0]
+        self.assertEqual('fake-id1', slow['resource_id'])
+        spans = dict((span['name'], span) for span in slow['spans'])
+        # Only host1 and host5 (unknown free space) can take 300GB.
+        self.assertEqual(5, spans['filter']['hosts_in'])
+        self.assertEqual(2, spans['filter']['hosts_out'])
+        self.assertEqual(5, spans['filter.CapacityFilter']['hosts_in'])
+        self.assertEqual(2, spans['filter.CapacityFilter']['hosts_out'])
+
     def test_max_attempts(self):
         self.flags(scheduler_max_attempts=4)
 
@@ -0,0 +1,106 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Goodness Weigher.
+"""
+
+import mock
+from oslo.config import cfg
+
+from cinder import context
+from cinder.openstack.common.scheduler.weights import HostWeightHandler
+from cinder.scheduler.weights.goodness import GoodnessWeigher
+from cinder import test
+from cinder.tests.scheduler import fakes
+from cinder.volume import utils
+
+CONF = cfg.CONF
+
+
+class GoodnessWeigherTestCase(test.TestCase):
+    def setUp(self):
+        super(GoodnessWeigherTestCase, self).setUp()
+        self.host_manager = fakes.FakeHostManager()
+        self.weight_handler = HostWeightHandler('cinder.scheduler.weights')
+
+    def _get_weighed_hosts(self, hosts, weight_properties=None):
+        if weight_properties is None:
+            weight_properties = {}
+        return self.weight_handler.get_weighed_objects([GoodnessWeigher],
+                                                       hosts,
+                                                       weight_properties)
+
+    @mock.patch('cinder.db.sqlalchemy.api.service_get_all_by_topic')
+    def _get_all_hosts(self, _mock_service_get_all_by_topic, disabled=False):
+        ctxt = context.get_admin_context()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic,
+                                         disabled=disabled)
+        host_states = self.host_manager.get_all_host_states(ctxt)
+        _mock_service_get_all_by_topic.assert_called_once_with(
+            ctxt, CONF.volume_topic, disabled=disabled)
+        return host_states
+
+    def test_no_goodness_function(self):
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts())
+        self.assertEqual([0.0] * 5, [h.weight for h in weighed_hosts])
+
+    def test_goodness_function(self):
+        # Prefer the pools with the lowest utilization, host5 reports an
+        # unknown free capacity and gets a weight of 0.
+        self.flags(scheduler_goodness_function='100 * '
+                                               'stats.free_capacity_gb / '
+                                               'stats.total_capacity_gb')
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts())
+
+        # host1: 100%, host3: 50%, host2: 14.6%, host4: 9.8%
+        self.assertEqual(['host1', 'host3', 'host2', 'host4', 'host5'],
+                         [utils.extract_host(h.obj.host)
+                          for h in weighed_hosts])
+        self.assertEqual(100.0, weighed_hosts[0].weight)
+        self.assertEqual(0.0, weighed_hosts[-1].weight)
+
+    def test_cost_function(self):
+        self.flags(scheduler_goodness_function='stats.allocated_capacity_gb',
+                   goodness_weight_multiplier=-1.0)
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts())
+
+        # host1: 0, host3: 256, host5: 1548, host2: 1748, host4: 1848
+        self.assertEqual(['host1', 'host3', 'host5', 'host2', 'host4'],
+                         [utils.extract_host(h.obj.host)
+                          for h in weighed_hosts])
+
+    def test_goodness_function_uses_volume_type(self):
+        self.flags(scheduler_goodness_function=
+                   "extra.tier == 'gold' ? stats.total_capacity_gb : 0")
+        weight_properties = {'volume_type': {'extra_specs':
+                                             {'tier': 'gold'}}}
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts(),
+                                                weight_properties)
+        self.assertEqual(2048.0, weighed_hosts[0].weight)
+
+        weight_properties = {'volume_type': {'extra_specs':
+                                             {'tier': 'silver'}}}
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts(),
+                                                weight_properties)
+        self.assertEqual(0.0, weighed_hosts[0].weight)
+
+    @mock.patch.dict('cinder.scheduler.expression._expressions',
+                     clear=True)
+    @mock.patch('cinder.scheduler.expression.LOG')
+    def test_malformed_goodness_function(self, mock_log):
+        self.flags(scheduler_goodness_function='stats.free_capacity_gb *')
+        weighed_hosts = self._get_weighed_hosts(self._get_all_hosts())
+        self.assertEqual([0.0] * 5, [h.weight for h in weighed_hosts])
+        self.assertEqual(1, mock_log.error.call_count)
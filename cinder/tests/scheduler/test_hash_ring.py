@@ -0,0 +1,118 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For scheduler request partitioning.
+"""
+
+import mock
+from oslo.utils import timeutils
+
+from cinder.scheduler import hash_ring
+from cinder import test
+
+
+class HashRingTestCase(test.TestCase):
+    """Test case for the consistent hash ring."""
+
+    def test_empty_ring(self):
+        self.assertIsNone(hash_ring.HashRing([]).get_member('zone1'))
+
+    def test_keys_spread_over_members(self):
+        ring = hash_ring.HashRing(['sched1', 'sched2', 'sched3'])
+        owners = [ring.get_member('zone%d' % i) for i in xrange(300)]
+        self.assertEqual(set(['sched1', 'sched2', 'sched3']), set(owners))
+        self.assertEqual(owners,
+                         [ring.get_member('zone%d' % i) for i in xrange(300)])
+
+    def test_adding_member_only_moves_its_keys(self):
+        keys = ['zone%d' % i for i in xrange(300)]
+        ring = hash_ring.HashRing(['sched1', 'sched2', 'sched3'])
+        new_ring = hash_ring.HashRing(['sched1', 'sched2', 'sched3',
+                                       'sched4'])
+        for key in keys:
+            owner = new_ring.get_member(key)
+            if owner != 'sched4':
+                self.assertEqual(ring.get_member(key), owner)
+
+    def test_get_partition_key(self):
+        request_spec = {'volume_properties': {'availability_zone': 'zone1',
+                                              'volume_type_id': 'type1'},
+                        'volume_type': {'id': 'type1'}}
+        self.assertIsNone(hash_ring.get_partition_key(request_spec))
+        self.flags(scheduler_partition_key='availability_zone')
+        self.assertEqual('zone1', hash_ring.get_partition_key(request_spec))
+        self.flags(scheduler_partition_key='volume_type')
+        self.assertEqual('type1', hash_ring.get_partition_key(request_spec))
+        self.assertIsNone(hash_ring.get_partition_key(None))
+
+    def test_partition_key_choices(self):
+        opt = [opt for opt in hash_ring.hash_ring_opts
+               if opt.name == 'scheduler_partition_key'][0]
+        self.assertEqual('volume_type', opt.type('volume_type'))
+        self.assertRaises(ValueError, opt.type, 'host')
+
+
+class RequestPartitionerTestCase(test.TestCase):
+    """Test case for the scheduler request partitioner."""
+
+    def setUp(self):
+        super(RequestPartitionerTestCase, self).setUp()
+        self.partitioner = hash_ring.RequestPartitioner()
+        self.request_spec = {'volume_properties':
+                             {'availability_zone': 'zone1'}}
+        self.services = [
+            dict(id=1, host='sched1', topic='cinder-scheduler',
+                 disabled=False, updated_at=timeutils.utcnow()),
+            dict(id=2, host='sched2', topic='cinder-scheduler',
+                 disabled=False, updated_at=timeutils.utcnow()),
+        ]
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_partitioning_disabled(self, _mock_service_get_all_by_topic):
+        self.assertIsNone(self.partitioner.get_owner(self.request_spec))
+        self.assertFalse(_mock_service_get_all_by_topic.called)
+
+    @mock.patch('cinder.utils.service_is_up')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_get_owner(self, _mock_service_get_all_by_topic,
+                       _mock_service_is_up):
+        self.flags(scheduler_partition_key='availability_zone')
+        _mock_service_get_all_by_topic.return_value = self.services
+        _mock_service_is_up.side_effect = (
+            lambda service: service['host'] == 'sched2')
+
+        self.assertEqual('sched2',
+                         self.partitioner.get_owner(self.request_spec))
+        # The membership is cached.
+        self.partitioner.get_owner(self.request_spec)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+        # Requests without a partition key are not partitioned.
+        self.assertIsNone(self.partitioner.get_owner(
+            {'volume_properties': {}}))
+
+    @mock.patch('cinder.utils.service_is_up')
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_membership_refresh(self, _mock_service_get_all_by_topic,
+                                _mock_service_is_up):
+        self.flags(scheduler_partition_key='availability_zone',
+                   scheduler_partition_refresh_interval=0)
+        _mock_service_get_all_by_topic.return_value = []
+        _mock_service_is_up.return_value = True
+
+        self.assertIsNone(self.partitioner.get_owner(self.request_spec))
+        _mock_service_get_all_by_topic.return_value = self.services
+        self.assertIn(self.partitioner.get_owner(self.request_spec),
+                      ('sched1', 'sched2'))
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
@@ -317,3 +317,41 @@ class HostFiltersTestCase(test.TestCase):
             'same_host': "NOT-a-valid-UUID", }}
 
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
+
+    def test_expression_filter_no_function_passes(self):
+        filt_cls = self.class_map['ExpressionFilter']()
+        host = fakes.FakeHostState('host1', {})
+        self.assertTrue(filt_cls.host_passes(host, {}))
+
+    def test_expression_filter(self):
+        self.flags(scheduler_filter_function='stats.free_capacity_gb > '
+                                             'volume.size * 2 and '
+                                             'capabilities.latency < 10')
+        filt_cls = self.class_map['ExpressionFilter']()
+        filter_properties = {'request_spec': {'volume_properties':
+                                              {'size': 100}}}
+        host = fakes.FakeHostState('host1',
+                                   {'free_capacity_gb': 250,
+                                    'capabilities': {'latency': 5}})
+        self.assertTrue(filt_cls.host_passes(host, filter_properties))
+        host = fakes.FakeHostState('host1',
+                                   {'free_capacity_gb': 150,
+                                    'capabilities': {'latency': 5}})
+        self.assertFalse(filt_cls.host_passes(host, filter_properties))
+
+    def test_expression_filter_fails_on_error(self):
+        self.flags(scheduler_filter_function='capabilities.latency < 10')
+        filt_cls = self.class_map['ExpressionFilter']()
+        host = fakes.FakeHostState('host1', {'capabilities': {}})
+        self.assertFalse(filt_cls.host_passes(host, {}))
+
+    @mock.patch.dict('cinder.scheduler.expression._expressions',
+                     clear=True)
+    @mock.patch('cinder.scheduler.expression.LOG')
+    def test_expression_filter_malformed_function(self, mock_log):
+        self.flags(scheduler_filter_function='capabilities.latency <')
+        filt_cls = self.class_map['ExpressionFilter']()
+        for host in ('host1', 'host2'):
+            host = fakes.FakeHostState(host, {'capabilities': {}})
+            self.assertFalse(filt_cls.host_passes(host, {}))
+        self.assertEqual(1, mock_log.error.call_count)
@@ -22,8 +22,11 @@ from oslo.utils import timeutils
 
 from cinder import exception
 from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common.scheduler import weights
 from cinder.scheduler import host_manager
+from cinder.scheduler import ledger
 from cinder import test
+from cinder.tests.scheduler import fakes
 
 
 CONF = cfg.CONF
@@ -39,6 +42,26 @@ class FakeFilterClass2(filters.BaseHostFilter):
         pass
 
 
+class FakeOddHostFilter(filters.BaseHostFilter):
+    def host_passes(self, host_state, filter_properties):
+        return int(host_state.host[len('fake_host'):]) % 2 == 1
+
+
+class FakeNoHostFilter(filters.BaseHostFilter):
+    def host_passes(self, host_state, filter_properties):
+        return False
+
+
+class FakeFirstHostFilter(filters.BaseHostFilter):
+    def filter_all(self, filter_obj_list, filter_properties):
+        return filter_obj_list[:1]
+
+
+class FakeIndexWeigher(weights.BaseHostWeigher):
+    def _weigh_object(self, host_state, weight_properties):
+        return int(host_state.host[len('fake_host'):])
+
+
 class HostManagerTestCase(test.TestCase):
     """Test case for HostManager class."""
 
@@ -84,6 +107,60 @@ class HostManagerTestCase(test.TestCase):
         self.assertEqual(expected, mock_func.call_args_list)
         self.assertEqual(set(result), set(self.fake_hosts))
 
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_filters')
+    def test_get_filtered_hosts_partitioned(self, _mock_choose_host_filters):
+        self.flags(scheduler_evaluation_workers=4,
+                   scheduler_evaluation_partition_size=2)
+        _mock_choose_host_filters.return_value = [FakeOddHostFilter,
+                                                  FakeFirstHostFilter,
+                                                  FakeOddHostFilter]
+        hosts = [host_manager.HostState('fake_host%s' % x)
+                 for x in xrange(1, 10)]
+        timings = {}
+
+        result = self.host_manager.filter_handler.get_filtered_objects(
+            [FakeOddHostFilter, FakeFirstHostFilter, FakeOddHostFilter],
+            hosts, {}, timings=timings)
+
+        # FakeFirstHostFilter needs the whole list, so it only keeps
+        # fake_host1 rather than the first host of every partition.
+        self.assertEqual(['fake_host1'], [h.host for h in result])
+        self.assertEqual(set(['FakeOddHostFilter', 'FakeFirstHostFilter']),
+                         set(timings.keys()))
+
+        result = self.host_manager.get_filtered_hosts(hosts, {})
+        self.assertEqual(['fake_host1'], [h.host for h in result])
+
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_filters')
+    def test_get_filtered_hosts_partitioned_early_exit(
+            self, _mock_choose_host_filters):
+        self.flags(scheduler_evaluation_workers=4,
+                   scheduler_evaluation_partition_size=2)
+        filter_class = FakeFilterClass2
+        mock_func = mock.Mock(return_value=True)
+        self.stubs.Set(filter_class, '_filter_one', mock_func)
+        _mock_choose_host_filters.return_value = [FakeNoHostFilter,
+                                                  filter_class]
+
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts, {})
+        self.assertEqual([], result)
+        self.assertFalse(mock_func.called)
+
+    @mock.patch('cinder.scheduler.host_manager.HostManager.'
+                '_choose_host_weighers')
+    def test_get_weighed_hosts_partitioned(self, _mock_choose_host_weighers):
+        self.flags(scheduler_evaluation_workers=4,
+                   scheduler_evaluation_partition_size=3)
+        _mock_choose_host_weighers.return_value = [FakeIndexWeigher]
+        hosts = [host_manager.HostState('fake_host%s' % x)
+                 for x in xrange(1, 10)]
+
+        result = self.host_manager.get_weighed_hosts(hosts, {})
+        self.assertEqual(['fake_host%s' % x for x in xrange(9, 0, -1)],
+                         [h.obj.host for h in result])
+
     @mock.patch('oslo.utils.timeutils.utcnow')
     def test_update_service_capabilities(self, _mock_utcnow):
         service_states = self.host_manager.service_states
@@ -116,6 +193,41 @@ class HostManagerTestCase(test.TestCase):
                     'host3': host3_volume_capabs}
         self.assertDictMatch(service_states, expected)
 
+    @mock.patch('oslo.utils.timeutils.utcnow')
+    def test_update_service_capabilities_delta(self, _mock_utcnow):
+        _mock_utcnow.return_value = 31337
+        pool1 = dict(pool_name='pool1', free_capacity_gb=100)
+        pool2 = dict(pool_name='pool2', free_capacity_gb=200)
+        capabs = dict(volume_backend_name='AAA', pools=[pool1, pool2])
+
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', capabs, report={'seq': 1, 'full': True})
+        # HostState adds backend info to the pools it is given.
+        self.host_manager.service_states['host1']['pools'][0]['fake'] = 1
+
+        delta = {'pools': {'pool1': {'set': {'free_capacity_gb': 90}}}}
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', delta, report={'seq': 2, 'full': False})
+        expected = dict(volume_backend_name='AAA',
+                        pools=[dict(pool_name='pool1', free_capacity_gb=90),
+                               pool2],
+                        timestamp=31337)
+        self.assertEqual(expected, self.host_manager.service_states['host1'])
+
+        # Report 3 was lost, the following deltas are ignored.
+        delta = {'removed_pools': ['pool2']}
+        for seq in (4, 5):
+            self.host_manager.update_service_capabilities(
+                'volume', 'host1', delta, report={'seq': seq, 'full': False})
+            self.assertEqual(expected,
+                             self.host_manager.service_states['host1'])
+
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(pools=[pool1]),
+            report={'seq': 6, 'full': True})
+        self.assertEqual(dict(pools=[pool1], timestamp=31337),
+                         self.host_manager.service_states['host1'])
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     @mock.patch('cinder.utils.service_is_up')
     @mock.patch('oslo.utils.timeutils.utcnow')
@@ -167,6 +279,84 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(1, len(res))
             self.assertEqual(402, res[0]['capabilities']['timestamp'])
 
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_get_pools_snapshot(self, _mock_service_get_all_by_topic):
+        context = 'fake_context'
+        manager = fakes.FakeHostManager()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+
+        res = manager.get_pools_snapshot(context)
+        self.assertEqual(['host1#lvm1', 'host2#lvm2', 'host3#lvm3',
+                          'host4#lvm4', 'host5#_pool0'],
+                         [pool['name'] for pool in res['pools']])
+        generation = res['generation']
+
+        # The snapshot is reused until a capability update is received.
+        res = manager.get_pools_snapshot(context, generation=generation)
+        self.assertEqual({'generation': generation, 'pools': None}, res)
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        res = manager.get_pools_snapshot(
+            context, {'backend_name': 'lvm2', 'fields': ['free_capacity_gb']})
+        self.assertEqual([{'name': 'host2#lvm2',
+                           'capabilities': {'free_capacity_gb': 300}}],
+                         res['pools'])
+
+        res = manager.get_pools_snapshot(
+            context, {'capabilities': {'consistencygroup_support': None}})
+        self.assertEqual(['host4#lvm4'],
+                         [pool['name'] for pool in res['pools']])
+
+        volume_type = {'extra_specs': {'reserved_percentage': '<= 5'}}
+        res = manager.get_pools_snapshot(context,
+                                         {'volume_type': volume_type})
+        self.assertEqual(['host3#lvm3', 'host4#lvm4', 'host5#_pool0'],
+                         [pool['name'] for pool in res['pools']])
+
+        res = manager.get_pools_snapshot(context,
+                                         {'marker': 'host2#lvm2', 'limit': 2})
+        self.assertEqual(['host3#lvm3', 'host4#lvm4'],
+                         [pool['name'] for pool in res['pools']])
+        self.assertEqual(1, _mock_service_get_all_by_topic.call_count)
+
+        manager.update_service_capabilities('volume', 'host1',
+                                            dict(free_capacity_gb=10))
+        res = manager.get_pools_snapshot(context, generation=generation)
+        self.assertNotEqual(generation, res['generation'])
+        self.assertEqual(5, len(res['pools']))
+        self.assertEqual(2, _mock_service_get_all_by_topic.call_count)
+
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    def test_get_pools_snapshot_unchanged_capabilities(
+            self, _mock_service_get_all_by_topic):
+        context = 'fake_context'
+        manager = fakes.FakeHostManager()
+        fakes.mock_host_manager_db_calls(_mock_service_get_all_by_topic)
+        capabilities = {'pools': [{'pool_name': 'pool1',
+                                   'free_capacity_gb': 10}]}
+        manager.update_service_capabilities('volume', 'host1',
+                                            capabilities)
+        generation = manager.get_pools_snapshot(context)['generation']
+
+        # The same capabilities reported again keep the pool list.
+        manager.update_service_capabilities('volume', 'host1',
+                                            capabilities)
+        manager.update_service_capabilities(
+            'volume', 'host1', capabilities, report={'seq': 1, 'full': True})
+        manager.update_service_capabilities(
+            'volume', 'host1', {},
+            report={'seq': 2, 'full': False})
+        res = manager.get_pools_snapshot(context, generation=generation)
+        self.assertEqual({'generation': generation, 'pools': None}, res)
+
+        capabilities['pools'][0]['free_capacity_gb'] = 5
+        manager.update_service_capabilities('volume', 'host1',
+                                            capabilities)
+        res = manager.get_pools_snapshot(context, generation=generation)
+        self.assertNotEqual(generation, res['generation'])
+        self.assertEqual(5, res['pools'][0]['capabilities'][
+            'free_capacity_gb'])
+
     @mock.patch('cinder.db.service_get_all_by_topic')
     @mock.patch('cinder.utils.service_is_up')
     def test_get_all_host_states(self, _mock_service_is_up,
@@ -319,6 +509,55 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(len(expected), len(res))
             self.assertEqual(sorted(expected), sorted(res))
 
+    @mock.patch('cinder.db.service_get_all_by_topic')
+    @mock.patch('cinder.utils.service_is_up')
+    def test_capacity_ledger_shared_between_managers(
+            self, _mock_service_is_up, _mock_service_get_all_by_topic):
+        self.flags(scheduler_capacity_ledger='cinder.scheduler.ledger.'
+                                             'LocalCapacityLedger')
+        context = 'fake_context'
+        services = [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+        _mock_service_get_all_by_topic.return_value = services
+        _mock_service_is_up.return_value = True
+
+        manager1 = host_manager.HostManager()
+        manager2 = host_manager.HostManager()
+        self.assertIsInstance(manager1.capacity_ledger,
+                              ledger.LocalCapacityLedger)
+        # Both schedulers share the same ledger.
+        manager2.capacity_ledger = manager1.capacity_ledger
+
+        capabilities = dict(volume_backend_name='AAA',
+                            total_capacity_gb=512, free_capacity_gb=200,
+                            allocated_capacity_gb=100,
+                            reserved_percentage=0)
+        for manager in (manager1, manager2):
+            manager.update_service_capabilities('volume', 'host1',
+                                                dict(capabilities))
+
+        pool1 = list(manager1.get_all_host_states(context))[0]
+        manager1.consume_from_volume(pool1, {'size': 50},
+                                     resource_id='fake_volume')
+        self.assertEqual(150, pool1.free_capacity_gb)
+
+        for manager in (manager1, manager2):
+            pool = list(manager.get_all_host_states(context))[0]
+            self.assertEqual('host1#AAA', pool.host)
+            self.assertEqual(150, pool.free_capacity_gb)
+            self.assertEqual(150, pool.allocated_capacity_gb)
+
+        # A new capability report accounts for the reserved capacity.
+        capabilities['free_capacity_gb'] = 150
+        manager2.update_service_capabilities('volume', 'host1',
+                                             dict(capabilities))
+        self.assertEqual({}, manager2.capacity_ledger.get_reserved())
+        pool = list(manager2.get_all_host_states(context))[0]
+        self.assertEqual(150, pool.free_capacity_gb)
+        self.assertEqual(100, pool.allocated_capacity_gb)
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class."""
@@ -39,7 +39,7 @@ class SchedulerRpcAPITestCase(test.TestCase):
         super(SchedulerRpcAPITestCase, self).tearDown()
 
     def _test_scheduler_api(self, method, rpc_method,
-                            fanout=False, **kwargs):
+                            fanout=False, server=None, **kwargs):
         ctxt = context.RequestContext('fake_user', 'fake_project')
         rpcapi = scheduler_rpcapi.SchedulerAPI()
         expected_retval = 'foo' if rpc_method == 'call' else None
@@ -48,6 +48,8 @@ class SchedulerRpcAPITestCase(test.TestCase):
             "fanout": fanout,
             "version": kwargs.pop('version', rpcapi.RPC_API_VERSION)
         }
+        if server:
+            target['server'] = server
 
         expected_msg = copy.deepcopy(kwargs)
 
@@ -55,6 +57,7 @@ class SchedulerRpcAPITestCase(test.TestCase):
         self.fake_kwargs = None
 
         def _fake_prepare_method(*args, **kwds):
+            self.assertEqual('server' in target, 'server' in kwds)
             for kwd in kwds:
                 self.assertEqual(kwds[kwd], target[kwd])
             return rpcapi.client
@@ -76,6 +79,21 @@ class SchedulerRpcAPITestCase(test.TestCase):
                 for arg, expected_arg in zip(self.fake_args, expected_args):
                     self.assertEqual(arg, expected_arg)
 
+    @mock.patch('cinder.scheduler.hash_ring.RequestPartitioner.get_owner')
+    def test_create_volume_partitioned(self, _mock_get_owner):
+        _mock_get_owner.return_value = 'sched1'
+        self._test_scheduler_api('create_volume',
+                                 rpc_method='cast',
+                                 topic='topic',
+                                 volume_id='volume_id',
+                                 snapshot_id='snapshot_id',
+                                 image_id='image_id',
+                                 request_spec='fake_request_spec',
+                                 filter_properties='filter_properties',
+                                 server='sched1',
+                                 version='1.2')
+        _mock_get_owner.assert_called_once_with('fake_request_spec')
+
     def test_update_service_capabilities(self):
         self._test_scheduler_api('update_service_capabilities',
                                  rpc_method='cast',
@@ -84,6 +102,16 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  capabilities='fake_capabilities',
                                  fanout=True)
 
+    def test_update_service_capabilities_report(self):
+        self._test_scheduler_api('update_service_capabilities',
+                                 rpc_method='cast',
+                                 service_name='fake_name',
+                                 host='fake_host',
+                                 capabilities='fake_capabilities',
+                                 report={'seq': 1, 'full': True},
+                                 fanout=True,
+                                 version='1.9')
+
     def test_create_volume(self):
         self._test_scheduler_api('create_volume',
                                  rpc_method='cast',
@@ -129,3 +157,15 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  rpc_method='call',
                                  filters=None,
                                  version='1.7')
+
+    def test_get_pools_snapshot(self):
+        self._test_scheduler_api('get_pools_snapshot',
+                                 rpc_method='call',
+                                 filters={'backend_name': 'lvm'},
+                                 generation='abc-1',
+                                 version='1.10')
+
+    def test_get_timings(self):
+        self._test_scheduler_api('get_timings',
+                                 rpc_method='call',
+                                 version='1.8')
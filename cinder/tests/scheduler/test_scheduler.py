@@ -69,7 +69,8 @@ class SchedulerManagerTestCase(test.TestCase):
         self.manager.update_service_capabilities(self.context,
                                                  service_name=service,
                                                  host=host)
-        _mock_update_cap.assert_called_once_with(service, host, {})
+        _mock_update_cap.assert_called_once_with(service, host, {},
+                                                 report=None)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.'
                 'update_service_capabilities')
@@ -83,7 +84,8 @@ class SchedulerManagerTestCase(test.TestCase):
                                                  service_name=service,
                                                  host=host,
                                                  capabilities=capabilities)
-        _mock_update_cap.assert_called_once_with(service, host, capabilities)
+        _mock_update_cap.assert_called_once_with(service, host, capabilities,
+                                                 report=None)
 
     @mock.patch('cinder.scheduler.driver.Scheduler.schedule_create_volume')
     @mock.patch('cinder.db.volume_update')
@@ -0,0 +1,90 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For scheduler timing spans.
+"""
+
+import mock
+
+from cinder.scheduler import timing
+from cinder import test
+
+
+class SchedulerStatsTestCase(test.TestCase):
+    """Test case for SchedulerStats class."""
+
+    def setUp(self):
+        super(SchedulerStatsTestCase, self).setUp()
+        self.stats = timing.SchedulerStats()
+
+    def test_request_aggregates_spans(self):
+        with self.stats.request('create_volume', 'fake-id') as timer:
+            timer.add('filter', 0.5, 4, 2)
+            timer.add_all('filter', {'CapacityFilter': 0.5},
+                          {'CapacityFilter': [4, 2]})
+        with self.stats.request('create_volume', 'fake-id2') as timer:
+            timer.add('filter', 0.25, 4, 4)
+
+        summary = self.stats.summary()
+        self.assertEqual(2, summary['requests'])
+        spans = dict((span['name'], span) for span in summary['spans'])
+        self.assertEqual(2, spans['create_volume']['count'])
+        self.assertEqual(2, spans['filter']['count'])
+        self.assertEqual(0.75, spans['filter']['total'])
+        self.assertEqual(0.375, spans['filter']['average'])
+        self.assertEqual(0.5, spans['filter']['max'])
+        self.assertEqual(1, spans['filter.CapacityFilter']['count'])
+        self.assertEqual('filter', summary['spans'][0]['name'])
+
+    @mock.patch('time.time')
+    def test_span(self, _mock_time):
+        _mock_time.side_effect = [10.0, 11.0, 13.5]
+        timer = timing.RequestTimer('create_volume')
+
+        with timer.span('get_all_host_states'):
+            pass
+
+        self.assertEqual([{'name': 'get_all_host_states', 'elapsed': 2.5,
+                           'hosts_in': None, 'hosts_out': None}],
+                         timer.spans)
+
+    def test_slow_requests(self):
+        self.flags(scheduler_slow_request_threshold=0)
+
+        with self.stats.request('create_volume', 'fake-id') as timer:
+            timer.add('filter', 0.1, 5, 3)
+
+        slow = self.stats.summary()['slow_requests']
+        self.assertEqual(1, len(slow))
+        self.assertEqual('fake-id', slow[0]['resource_id'])
+        self.assertEqual([{'name': 'filter', 'elapsed': 0.1,
+                           'hosts_in': 5, 'hosts_out': 3}],
+                         slow[0]['spans'])
+
+    def test_fast_requests_not_kept(self):
+        self.flags(scheduler_slow_request_threshold=60)
+
+        with self.stats.request('create_volume', 'fake-id'):
+            pass
+
+        self.assertEqual([], self.stats.summary()['slow_requests'])
+
+    def test_request_recorded_on_failure(self):
+        def _fail():
+            with self.stats.request('create_volume', 'fake-id'):
+                raise ValueError()
+
+        self.assertRaises(ValueError, _fail)
+        self.assertEqual(1, self.stats.summary()['requests'])
@@ -12,9 +12,12 @@
 
 import contextlib
 import datetime
+import json
+import os
 import StringIO
 import sys
 
+import fixtures
 import mock
 from oslo.config import cfg
 import rtslib
@@ -28,6 +31,7 @@ from cinder.cmd import scheduler as cinder_scheduler
 from cinder.cmd import volume as cinder_volume
 from cinder.cmd import volume_usage_audit
 from cinder import context
+from cinder import exception
 from cinder import test
 from cinder import version
 
@@ -343,6 +347,40 @@ class TestCinderManageCmd(test.TestCase):
         db_cmds.version()
         self.assertEqual(1, db_version.call_count)
 
+    @mock.patch('cinder.db.purge_deleted_rows')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_db_commands_purge(self, get_admin_context, purge_deleted_rows):
+        get_admin_context.return_value = mock.sentinel.ctxt
+        purge_deleted_rows.return_value = {'volumes': 2,
+                                           'volume_metadata': 3,
+                                           'snapshots': 0}
+
+        with mock.patch('sys.stdout', new=StringIO.StringIO()) as fake_out:
+            expected_out = ("%-32s\t%s\n" % ('Table', 'Rows purged') +
+                            "%-32s\t%d\n" % ('volume_metadata', 3) +
+                            "%-32s\t%d\n" % ('volumes', 2) +
+                            "%-32s\t%d\n" % ('Total', 5))
+            db_cmds = cinder_manage.DbCommands()
+            db_cmds.purge(age_in_days=30, batch_size=100, sleep=0)
+
+            purge_deleted_rows.assert_called_once_with(
+                mock.sentinel.ctxt, 30, batch_size=100, throttle=0)
+            self.assertEqual(expected_out, fake_out.getvalue())
+
+    @mock.patch('cinder.db.purge_deleted_rows')
+    def test_db_commands_purge_invalid_age(self, purge_deleted_rows):
+        purge_deleted_rows.side_effect = exception.InvalidParameterValue(
+            err='invalid age')
+        db_cmds = cinder_manage.DbCommands()
+        with mock.patch('sys.stdout', new=StringIO.StringIO()):
+            exit = self.assertRaises(SystemExit, db_cmds.purge, -1)
+        self.assertEqual(1, exit.code)
+
+    def test_get_arg_string(self):
+        self.assertEqual('age_in_days',
+                         cinder_manage.get_arg_string('--age-in-days'))
+        self.assertEqual('zone', cinder_manage.get_arg_string('zone'))
+
     @mock.patch('cinder.version.version_string')
     def test_versions_commands_list(self, version_string):
         version_cmds = cinder_manage.VersionCommands()
@@ -442,6 +480,24 @@ class TestCinderManageCmd(test.TestCase):
         cctxt.cast.assert_called_once_with(ctxt, 'delete_volume',
                                            volume_id=volume['id'])
 
+    @mock.patch('cinder.db.volume_update_many')
+    @mock.patch('cinder.db.volume_get_all_by_host')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_volume_commands_update_host(self, get_admin_context,
+                                         volume_get_all_by_host,
+                                         volume_update_many):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        get_admin_context.return_value = ctxt
+        volume_get_all_by_host.return_value = [{'id': '1'}, {'id': '2'}]
+
+        volume_cmds = cinder_manage.VolumeCommands()
+        volume_cmds.update_host('fake-host', 'new-host')
+
+        volume_get_all_by_host.assert_called_once_with(ctxt, 'fake-host',
+                                                       fields=['id'])
+        volume_update_many.assert_called_once_with(ctxt, ['1', '2'],
+                                                   {'host': 'new-host'})
+
     @mock.patch('cinder.db.volume_destroy')
     @mock.patch('cinder.db.volume_get')
     @mock.patch('cinder.context.get_admin_context')
@@ -1105,7 +1161,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000)
         notify_about_volume_usage.assert_any_call(ctxt, volume1, 'exists',
                                                   extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
@@ -1171,7 +1228,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000)
         notify_about_volume_usage.assert_any_call(
             ctxt, volume1, 'exists', extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
@@ -1249,7 +1307,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000)
         self.assertFalse(notify_about_volume_usage.called)
         notify_about_snapshot_usage.assert_any_call(ctxt, snapshot1, 'exists',
                                                     extra_info)
@@ -1326,7 +1385,8 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         get_logger.assert_called_once_with('cinder')
         rpc_init.assert_called_once_with(CONF)
         last_completed_audit_period.assert_called_once_with()
-        volume_get_active_by_window.assert_called_once_with(ctxt, begin, end)
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker=None, limit=1000)
         notify_about_volume_usage.assert_any_call(
             ctxt, volume1, 'exists', extra_usage_info=extra_info)
         notify_about_volume_usage.assert_any_call(
@@ -1356,3 +1416,117 @@ class TestCinderVolumeUsageAuditCmd(test.TestCase):
         notify_about_snapshot_usage.assert_any_call(
             ctxt, snapshot1, 'delete.end',
             extra_usage_info=extra_info_snapshot_delete)
+
+    @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
+    @mock.patch('cinder.db.snapshot_get_active_by_window')
+    @mock.patch('cinder.volume.utils.notify_about_volume_usage')
+    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.utils.last_completed_audit_period')
+    @mock.patch('cinder.rpc.init')
+    @mock.patch('cinder.openstack.common.log.getLogger')
+    @mock.patch('cinder.openstack.common.log.setup')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_main_batches(self, get_admin_context, log_setup, get_logger,
+                          rpc_init, last_completed_audit_period,
+                          volume_get_active_by_window,
+                          notify_about_volume_usage,
+                          snapshot_get_active_by_window,
+                          notify_about_snapshot_usage):
+        CONF.set_override('batch_size', 2)
+        begin = datetime.datetime(2014, 1, 1, 1, 0)
+        end = datetime.datetime(2014, 2, 2, 2, 0)
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        get_admin_context.return_value = ctxt
+        last_completed_audit_period.return_value = (begin, end)
+        volumes = [mock.MagicMock(id=str(i), project_id='fake-project')
+                   for i in xrange(3)]
+        volume_get_active_by_window.side_effect = [volumes[:2], volumes[2:]]
+        snapshots = [mock.MagicMock(id=str(i), project_id='fake-project')
+                     for i in xrange(2)]
+        snapshot_get_active_by_window.side_effect = [snapshots, []]
+
+        volume_usage_audit.main()
+
+        self.assertEqual(
+            [mock.call(ctxt, begin, end, marker=None, limit=2),
+             mock.call(ctxt, begin, end, marker='1', limit=2)],
+            volume_get_active_by_window.call_args_list)
+        self.assertEqual(
+            [mock.call(ctxt, begin, end, marker=None, limit=2),
+             mock.call(ctxt, begin, end, marker='1', limit=2)],
+            snapshot_get_active_by_window.call_args_list)
+        self.assertEqual(3, notify_about_volume_usage.call_count)
+        self.assertEqual(2, notify_about_snapshot_usage.call_count)
+
+    @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
+    @mock.patch('cinder.db.snapshot_get_active_by_window')
+    @mock.patch('cinder.volume.utils.notify_about_volume_usage')
+    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.utils.last_completed_audit_period')
+    @mock.patch('cinder.rpc.init')
+    @mock.patch('cinder.openstack.common.log.getLogger')
+    @mock.patch('cinder.openstack.common.log.setup')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_main_shard(self, get_admin_context, log_setup, get_logger,
+                        rpc_init, last_completed_audit_period,
+                        volume_get_active_by_window,
+                        notify_about_volume_usage,
+                        snapshot_get_active_by_window,
+                        notify_about_snapshot_usage):
+        CONF.set_override('shard_index', 1)
+        CONF.set_override('shard_count', 4)
+        begin = datetime.datetime(2014, 1, 1, 1, 0)
+        end = datetime.datetime(2014, 2, 2, 2, 0)
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        get_admin_context.return_value = ctxt
+        last_completed_audit_period.return_value = (begin, end)
+        volume1 = mock.MagicMock(id='4fffffff-0000', project_id='p')
+        volume2 = mock.MagicMock(id='80000000-0000', project_id='p')
+        volume_get_active_by_window.return_value = [volume1, volume2]
+        snapshot_get_active_by_window.return_value = []
+
+        volume_usage_audit.main()
+
+        volume_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker='40000000', limit=1000)
+        notify_about_volume_usage.assert_called_once_with(
+            ctxt, volume1, 'exists', extra_usage_info=mock.ANY)
+
+    @mock.patch('cinder.volume.utils.notify_about_snapshot_usage')
+    @mock.patch('cinder.db.snapshot_get_active_by_window')
+    @mock.patch('cinder.volume.utils.notify_about_volume_usage')
+    @mock.patch('cinder.db.volume_get_active_by_window')
+    @mock.patch('cinder.utils.last_completed_audit_period')
+    @mock.patch('cinder.rpc.init')
+    @mock.patch('cinder.openstack.common.log.getLogger')
+    @mock.patch('cinder.openstack.common.log.setup')
+    @mock.patch('cinder.context.get_admin_context')
+    def test_main_resume_from_checkpoint(self, get_admin_context, log_setup,
+                                         get_logger, rpc_init,
+                                         last_completed_audit_period,
+                                         volume_get_active_by_window,
+                                         notify_about_volume_usage,
+                                         snapshot_get_active_by_window,
+                                         notify_about_snapshot_usage):
+        checkpoint_file = os.path.join(self.useFixture(
+            fixtures.TempDir()).path, 'audit.json')
+        CONF.set_override('checkpoint_file', checkpoint_file)
+        begin = datetime.datetime(2014, 1, 1, 1, 0)
+        end = datetime.datetime(2014, 2, 2, 2, 0)
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        get_admin_context.return_value = ctxt
+        last_completed_audit_period.return_value = (begin, end)
+        with open(checkpoint_file, 'w') as f:
+            json.dump({'audit_period_beginning': str(begin),
+                       'audit_period_ending': str(end),
+                       'shard': '0/1',
+                       'markers': {'snapshots': 'snap-1'},
+                       'completed': ['volumes']}, f)
+        snapshot_get_active_by_window.return_value = []
+
+        volume_usage_audit.main()
+
+        self.assertFalse(volume_get_active_by_window.called)
+        snapshot_get_active_by_window.assert_called_once_with(
+            ctxt, begin, end, marker='snap-1', limit=1000)
+        self.assertFalse(os.path.exists(checkpoint_file))
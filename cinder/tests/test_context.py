@@ -40,6 +40,15 @@ class ContextTestCase(test.TestCase):
         ctxt.read_deleted = 'no'
         self.assertEqual(ctxt.read_deleted, 'no')
 
+    def test_request_context_read_replica(self):
+        ctxt = context.RequestContext('111', '222')
+        self.assertIsNone(ctxt.read_replica)
+
+        ctxt = context.RequestContext('111', '222', read_replica=False)
+        self.assertFalse(ctxt.read_replica)
+        ctxt = context.RequestContext.from_dict(ctxt.to_dict())
+        self.assertFalse(ctxt.read_replica)
+
     def test_request_context_read_deleted_invalid(self):
         self.assertRaises(ValueError,
                           context.RequestContext,
@@ -16,14 +16,21 @@
 
 import datetime
 
+import mock
 from oslo.config import cfg
+from oslo.db import exception as db_exc
+from oslo.utils import timeutils
+import sqlalchemy
 
 from cinder import context
 from cinder import db
+from cinder.db.sqlalchemy import api as sqlalchemy_api
+from cinder.db.sqlalchemy import models
 from cinder import exception
 from cinder.openstack.common import uuidutils
 from cinder.quota import ReservableResource
 from cinder import test
+from cinder import utils
 
 
 CONF = cfg.CONF
@@ -149,6 +156,20 @@ class DBAPIServiceTestCase(BaseTest):
         self.assertRaises(exception.ServiceNotFound,
                           db.service_update, self.ctxt, 100500, {})
 
+    def test_service_heartbeat(self):
+        service = self._create_service({'availability_zone': 'az1'})
+        self.assertTrue(db.service_heartbeat(self.ctxt, service['id'],
+                                             {'availability_zone': 'az2'}))
+        updated_service = db.service_get(self.ctxt, service['id'])
+        self.assertEqual(4, updated_service['report_count'])
+        self.assertEqual('az2', updated_service['availability_zone'])
+        self.assertIsNotNone(updated_service['updated_at'])
+
+    def test_service_heartbeat_not_found(self):
+        service = self._create_service({})
+        db.service_destroy(self.ctxt, service['id'])
+        self.assertFalse(db.service_heartbeat(self.ctxt, service['id']))
+
     def test_service_get(self):
         service1 = self._create_service({})
         real_service1 = db.service_get(self.ctxt, service1['id'])
@@ -370,6 +391,76 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualListsOfObjects(volumes[2:], db.volume_get_all(
                                         self.ctxt, 2, 2, 'id', None))
 
+    def test_volume_get_all_cursor(self):
+        for i, (size, name) in enumerate([(1, 'a'), (2, 'b'), (2, 'a'),
+                                          (3, 'c'), (2, 'a')]):
+            db.volume_create(self.ctxt, {'id': str(i), 'size': size,
+                                         'display_name': name})
+        sort_keys = ['size', 'display_name']
+        sort_dirs = ['desc', 'asc']
+        expected = db.volume_get_all(self.ctxt, None, None, sort_keys,
+                                     sort_dirs)
+        self.assertEqual(['3', '2', '4', '1', '0'],
+                         [volume.id for volume in expected])
+
+        keys = utils.get_pagination_sort_params(sort_keys, sort_dirs)[0]
+        cursor = None
+        pages = []
+        while True:
+            page = db.volume_get_all(self.ctxt, None, 2, sort_keys, sort_dirs,
+                                     cursor=cursor)
+            if not page:
+                break
+            pages.append([volume.id for volume in page])
+            cursor = utils.encode_pagination_cursor(
+                [page[-1][key] for key in keys])
+        self.assertEqual([['3', '2'], ['4', '1'], ['0']], pages)
+
+    def test_volume_get_all_cursor_null_sort_values(self):
+        for i, name in enumerate(['b', None, 'a', None, 'c']):
+            db.volume_create(self.ctxt, {'id': str(i),
+                                         'display_name': name})
+
+        for sort_dir, expected in [('asc', ['1', '3', '2', '0', '4']),
+                                   ('desc', ['4', '0', '2', '3', '1'])]:
+            sort_keys = ['display_name', 'id']
+            sort_dirs = [sort_dir, sort_dir]
+            cursor = None
+            volume_ids = []
+            while True:
+                page = db.volume_get_all(self.ctxt, None, 2, sort_keys,
+                                         sort_dirs, cursor=cursor)
+                if not page:
+                    break
+                volume_ids.extend(volume.id for volume in page)
+                keys = utils.get_pagination_sort_params(sort_keys,
+                                                        sort_dirs)[0]
+                cursor = utils.encode_pagination_cursor(
+                    [page[-1][key] for key in keys])
+            self.assertEqual(expected, volume_ids)
+
+    def test_volume_get_all_by_project_invalid_cursor(self):
+        self.assertRaises(exception.InvalidInput,
+                          db.volume_get_all_by_project, self.ctxt,
+                          self.ctxt.project_id, None, 2, 'size', 'asc',
+                          cursor=utils.encode_pagination_cursor([1]))
+
+    def test_volume_get_active_by_window_paginated(self):
+        begin = datetime.datetime(2014, 1, 1)
+        for i in xrange(5):
+            db.volume_create(self.ctxt, {'id': str(i)})
+        db.volume_destroy(self.ctxt, '3')
+
+        first = db.volume_get_active_by_window(self.ctxt, begin, limit=2)
+        second = db.volume_get_active_by_window(self.ctxt, begin,
+                                                marker=first[-1].id, limit=2)
+        last = db.volume_get_active_by_window(self.ctxt, begin,
+                                              marker=second[-1].id, limit=2)
+
+        self.assertEqual(['0', '1'], [volume.id for volume in first])
+        self.assertEqual(['2', '3'], [volume.id for volume in second])
+        self.assertEqual(['4'], [volume.id for volume in last])
+
     def test_volume_get_all_by_host(self):
         volumes = []
         for i in xrange(3):
@@ -380,6 +471,30 @@ class DBAPIVolumeTestCase(BaseTest):
                                             db.volume_get_all_by_host(
                                             self.ctxt, 'h%d' % i))
 
+    def test_volume_get_all_by_host_with_fields(self):
+        db.volume_create(self.ctxt, {'host': 'h1', 'size': 1,
+                                     'metadata': {'a': 'b'}})
+        volumes = db.volume_get_all_by_host(
+            self.ctxt, 'h1', fields=['size', 'volume_metadata'])
+        self.assertEqual(1, len(volumes))
+        self.assertEqual(1, volumes[0]['size'])
+        self.assertEqual([('a', 'b')], [(meta.key, meta.value) for meta in
+                                        volumes[0]['volume_metadata']])
+        # Only the requested fields and the primary key are loaded
+        self.assertIn('id', volumes[0].__dict__)
+        self.assertNotIn('display_name', volumes[0].__dict__)
+
+    def test_volume_get_all_with_fields(self):
+        volumes = [db.volume_create(self.ctxt, {'display_name': 'vol%d' % i})
+                   for i in xrange(3)]
+        result = db.volume_get_all(self.ctxt, volumes[0]['id'], 1,
+                                   'display_name', 'asc',
+                                   filters={'status': None},
+                                   fields=['display_name'])
+        self.assertEqual([(volumes[1]['id'], 'vol1')],
+                         [(vol['id'], vol['display_name']) for vol in result])
+        self.assertNotIn('status', result[0].__dict__)
+
     def test_volume_get_all_by_host_with_pools(self):
         volumes = []
         vol_on_host_wo_pool = [db.volume_create(self.ctxt, {'host': 'foo'})
@@ -684,6 +799,48 @@ class DBAPIVolumeTestCase(BaseTest):
         self.assertRaises(exception.VolumeNotFound, db.volume_update,
                           self.ctxt, 42, {})
 
+    def test_volume_update_many(self):
+        volumes = [db.volume_create(self.ctxt, {'host': 'h1'})
+                   for i in range(3)]
+        updated = db.volume_update_many(
+            self.ctxt, [volume['id'] for volume in volumes[:2]],
+            {'host': 'h2'})
+        self.assertEqual(2, updated)
+        self.assertEqual(['h2', 'h2', 'h1'],
+                         [db.volume_get(self.ctxt, volume['id'])['host']
+                          for volume in volumes])
+
+    def test_volume_update_many_chunks(self):
+        self.stubs.Set(sqlalchemy_api, '_IN_CHUNK_SIZE', 2)
+        volumes = [db.volume_create(self.ctxt, {'host': 'h1'})
+                   for i in range(5)]
+        updated = db.volume_update_many(
+            self.ctxt, [volume['id'] for volume in volumes], {'host': 'h2'})
+        self.assertEqual(5, updated)
+        self.assertEqual(5, len(db.volume_get_all_by_host(self.ctxt, 'h2')))
+
+    def test_volume_update_many_metadata(self):
+        volume = db.volume_create(self.ctxt, {})
+        self.assertRaises(exception.InvalidInput, db.volume_update_many,
+                          self.ctxt, [volume['id']], {'metadata': {}})
+
+    def test_volume_status_transition_many(self):
+        in_use = db.volume_create(self.ctxt, {'status': 'in-use'})
+        downloading = db.volume_create(self.ctxt, {'status': 'downloading'})
+        available = db.volume_create(self.ctxt, {'status': 'available'})
+        volume_ids = [in_use['id'], downloading['id'], available['id']]
+
+        updated = db.volume_status_transition_many(
+            self.ctxt, volume_ids, 'in-use', {'status': 'error'})
+        self.assertEqual(1, updated)
+        updated = db.volume_status_transition_many(
+            self.ctxt, volume_ids, ['downloading', 'error'],
+            {'status': 'error_deleting'})
+        self.assertEqual(2, updated)
+        self.assertEqual(['error_deleting', 'error_deleting', 'available'],
+                         [db.volume_get(self.ctxt, volume_id)['status']
+                          for volume_id in volume_ids])
+
     def test_volume_metadata_get(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1, 'metadata': metadata})
@@ -710,6 +867,42 @@ class DBAPIVolumeTestCase(BaseTest):
 
         self.assertEqual(should_be, db_meta)
 
+    def test_volume_metadata_update_bulk(self):
+        metadata1 = dict(('key%d' % i, 'value%d' % i) for i in xrange(50))
+        metadata2 = dict(('key%d' % i, 'new%d' % i) for i in xrange(25, 75))
+        db.volume_create(self.ctxt, {'id': 1, 'metadata': metadata1})
+
+        engine = sqlalchemy_api.get_engine()
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context,
+                    executemany):
+            if ('FROM volume_metadata' in statement or
+                    statement.startswith(('UPDATE volume_metadata',
+                                          'INSERT INTO volume_metadata'))):
+                statements.append(statement)
+
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            db_meta = db.volume_metadata_update(self.ctxt, 1, metadata2, True)
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute', _record)
+
+        self.assertEqual(metadata2, db_meta)
+        self.assertEqual(metadata2, db.volume_metadata_get(self.ctxt, 1))
+        # One read of the existing keys, then one delete, update and insert
+        # statement
+        self.assertEqual(4, len(statements))
+
+    def test_volume_update_metadata(self):
+        db.volume_create(self.ctxt, {'id': 1,
+                                     'metadata': {'a': '1', 'b': '2'}})
+        volume = db.volume_update(self.ctxt, 1,
+                                  {'metadata': {'a': '3', 'c': '4'}})
+        self.assertEqual({'a': '3', 'c': '4'},
+                         dict((meta.key, meta.value)
+                              for meta in volume.volume_metadata))
+
     def test_volume_metadata_delete(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1, 'metadata': metadata})
@@ -734,6 +927,21 @@ class DBAPISnapshotTestCase(BaseTest):
         actual = db.snapshot_data_get_for_project(self.ctxt, 'project1')
         self.assertEqual(actual, (1, 42))
 
+    def test_snapshot_create_many(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        db.volume_create(self.ctxt, {'id': 2})
+        snapshots = db.snapshot_create_many(
+            self.ctxt, [{'id': 2, 'volume_id': 2, 'metadata': {'a': 'b'}},
+                        {'id': 1, 'volume_id': 1}])
+        self.assertEqual(['2', '1'],
+                         [snapshot['id'] for snapshot in snapshots])
+        self.assertEqual('2', snapshots[0]['volume']['id'])
+        self.assertEqual('b', snapshots[0]['snapshot_metadata'][0]['value'])
+        self.assertEqual(2, len(db.snapshot_get_all(self.ctxt)))
+
+    def test_snapshot_create_many_empty(self):
+        self.assertEqual([], db.snapshot_create_many(self.ctxt, []))
+
     def test_snapshot_get_all(self):
         db.volume_create(self.ctxt, {'id': 1})
         snapshot = db.snapshot_create(self.ctxt, {'id': 1, 'volume_id': 1})
@@ -741,6 +949,70 @@ class DBAPISnapshotTestCase(BaseTest):
                                         db.snapshot_get_all(self.ctxt),
                                         ignored_keys=['metadata', 'volume'])
 
+    def test_snapshot_get_all_with_filters(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        db.volume_create(self.ctxt, {'id': 2})
+        snapshot1 = db.snapshot_create(self.ctxt,
+                                       {'id': 1, 'volume_id': 1,
+                                        'status': 'available',
+                                        'metadata': {'a': 'b'}})
+        snapshot2 = db.snapshot_create(self.ctxt,
+                                       {'id': 2, 'volume_id': 2,
+                                        'status': 'creating'})
+        snapshot3 = db.snapshot_create(self.ctxt,
+                                       {'id': 3, 'volume_id': 2,
+                                        'status': 'available'})
+
+        def _check(filters, expected):
+            result = db.snapshot_get_all(self.ctxt, filters=filters)
+            self.assertEqual(sorted(s['id'] for s in expected),
+                             sorted(s['id'] for s in result))
+
+        _check({'volume_id': 2}, [snapshot2, snapshot3])
+        _check({'volume_id': 2, 'status': 'available'}, [snapshot3])
+        _check({'status': ['available', 'error']}, [snapshot1, snapshot3])
+        _check({'metadata': {'a': 'b'}}, [snapshot1])
+        _check({'metadata': {'a': 'c'}}, [])
+        # Invalid filters return no snapshots
+        _check({'metadata': 'a'}, [])
+        _check({'foo': 'bar'}, [])
+        _check({'volume': 'fake'}, [])
+
+    def test_snapshot_get_all_by_project_paginate(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        snapshots = []
+        for i in xrange(4):
+            snapshots.append(db.snapshot_create(
+                self.ctxt, {'id': str(i), 'volume_id': 1,
+                            'project_id': 'project1',
+                            'display_name': 'snap%d' % i}))
+        db.snapshot_create(self.ctxt, {'id': 'other', 'volume_id': 1,
+                                       'project_id': 'project2'})
+
+        result = db.snapshot_get_all_by_project(self.ctxt, 'project1',
+                                                limit=3,
+                                                sort_key='display_name',
+                                                sort_dir='asc')
+        self.assertEqual([s['id'] for s in snapshots[:3]],
+                         [s['id'] for s in result])
+
+        result = db.snapshot_get_all_by_project(self.ctxt, 'project1',
+                                                marker='2', limit=3,
+                                                sort_key='display_name',
+                                                sort_dir='asc')
+        self.assertEqual(['3'], [s['id'] for s in result])
+
+        result = db.snapshot_get_all_by_project(self.ctxt, 'project1',
+                                                filters={'id': ['1', '2']},
+                                                sort_key='display_name',
+                                                sort_dir='desc')
+        self.assertEqual(['2', '1'], [s['id'] for s in result])
+
+    def test_snapshot_get_all_marker_not_found(self):
+        self.assertRaises(exception.SnapshotNotFound,
+                          db.snapshot_get_all, self.ctxt, marker='fake',
+                          limit=1)
+
     def test_snapshot_metadata_get(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1})
@@ -749,6 +1021,18 @@ class DBAPISnapshotTestCase(BaseTest):
 
         self.assertEqual(metadata, db.snapshot_metadata_get(self.ctxt, 1))
 
+    def test_snapshot_get_active_by_window_paginated(self):
+        begin = datetime.datetime(2014, 1, 1)
+        db.volume_create(self.ctxt, {'id': 1})
+        for i in xrange(3):
+            db.snapshot_create(self.ctxt, {'id': str(i), 'volume_id': 1})
+
+        snapshots = db.snapshot_get_active_by_window(self.ctxt, begin,
+                                                     marker='0', limit=1)
+
+        self.assertEqual(['1'], [snapshot.id for snapshot in snapshots])
+        self.assertEqual('1', snapshots[0].volume.id)
+
     def test_snapshot_metadata_update(self):
         metadata1 = {'a': '1', 'c': '2'}
         metadata2 = {'a': '3', 'd': '5'}
@@ -773,6 +1057,17 @@ class DBAPISnapshotTestCase(BaseTest):
 
         self.assertEqual(should_be, db_meta)
 
+    def test_snapshot_metadata_update_unchanged(self):
+        metadata = {'a': '1', 'c': '2'}
+
+        db.volume_create(self.ctxt, {'id': 1})
+        db.snapshot_create(self.ctxt,
+                           {'id': 1, 'volume_id': 1, 'metadata': metadata})
+        db_meta = db.snapshot_metadata_update(self.ctxt, 1, {'a': '1'}, True)
+
+        self.assertEqual({'a': '1'}, db_meta)
+        self.assertEqual({'a': '1'}, db.snapshot_metadata_get(self.ctxt, 1))
+
     def test_snapshot_metadata_delete(self):
         metadata = {'a': '1', 'c': '2'}
         should_be = {'a': '1'}
@@ -976,6 +1271,36 @@ class DBAPIReservationTestCase(BaseTest):
                              self.ctxt,
                              'project1'))
 
+    def test_reservation_expire_batches(self):
+        _quota_reserve(self.ctxt, 'project1')
+        _quota_reserve(self.ctxt, 'project2')
+        db.reservation_expire(self.ctxt, batch_size=3)
+
+        for project_id in ('project1', 'project2'):
+            expected = {'project_id': project_id,
+                        'gigabytes': {'reserved': 0, 'in_use': 0},
+                        'volumes': {'reserved': 0, 'in_use': 0}}
+            self.assertEqual(expected,
+                             db.quota_usage_get_all_by_project(
+                                 self.ctxt,
+                                 project_id))
+        self.assertEqual(0, sqlalchemy_api.model_query(
+            self.ctxt, models.Reservation, read_deleted="no").count())
+
+    def test_reservation_expire_lock_order(self):
+        _quota_reserve(self.ctxt, 'project1')
+        locked = []
+        with_lockmode = sqlalchemy.orm.query.Query.with_lockmode
+
+        def record_lock(query, mode):
+            locked.append(query.column_descriptions[0]['expr'].class_)
+            return with_lockmode(query, mode)
+
+        with mock.patch.object(sqlalchemy.orm.query.Query, 'with_lockmode',
+                               autospec=True, side_effect=record_lock):
+            db.reservation_expire(self.ctxt)
+        self.assertEqual([models.QuotaUsage, models.Reservation], locked)
+
 
 class DBAPIQuotaClassTestCase(BaseTest):
 
@@ -1149,6 +1474,95 @@ class DBAPIIscsiTargetTestCase(BaseTest):
         self.assertFalse(db.iscsi_target_create_safe(self.ctxt, values))
 
 
+class DBAPICapacityReservationTestCase(BaseTest):
+
+    """Tests for db.api.capacity_reservation_* methods."""
+
+    def _create(self, host, size=1, expire_seconds=60):
+        expire = timeutils.utcnow() + datetime.timedelta(
+            seconds=expire_seconds)
+        return db.capacity_reservation_create(self.ctxt, host, size, expire,
+                                              resource_id='fake_volume')
+
+    def test_capacity_reservation_create(self):
+        reservation = self._create('host1@lvm#pool1', size=10)
+        self.assertEqual('host1@lvm#pool1', reservation['host'])
+        self.assertEqual('host1@lvm', reservation['backend'])
+        self.assertEqual(10, reservation['size'])
+        self.assertEqual('fake_volume', reservation['resource_id'])
+
+    def test_capacity_reservation_get_all_skips_expired(self):
+        self._create('host1@lvm#pool1')
+        self._create('host1@lvm#pool2', expire_seconds=-1)
+        reservations = db.capacity_reservation_get_all(self.ctxt)
+        self.assertEqual(['host1@lvm#pool1'],
+                         [r['host'] for r in reservations])
+
+    def test_capacity_reservation_release(self):
+        self._create('host1@lvm#pool1')
+        self._create('host1@lvm#pool2')
+        self._create('host2@lvm#pool1')
+        self._create('host3@lvm#pool1', expire_seconds=-1)
+        before = timeutils.utcnow() + datetime.timedelta(seconds=1)
+
+        db.capacity_reservation_release(self.ctxt, 'host1@lvm', before)
+
+        reservations = db.capacity_reservation_get_all(self.ctxt)
+        self.assertEqual(['host2@lvm#pool1'],
+                         [r['host'] for r in reservations])
+        # The expired reservation on host3 is gone as well.
+        self.assertEqual(1, sqlalchemy_api.model_query(
+            self.ctxt, models.CapacityReservation,
+            read_deleted='yes').count())
+
+    def test_capacity_reservation_release_keeps_newer(self):
+        self._create('host1@lvm#pool1')
+        before = timeutils.utcnow() - datetime.timedelta(seconds=10)
+
+        db.capacity_reservation_release(self.ctxt, 'host1@lvm', before)
+
+        self.assertEqual(1, len(db.capacity_reservation_get_all(self.ctxt)))
+
+
+class DBAPIRateLimitStateTestCase(BaseTest):
+
+    """Tests for db.api.rate_limit_state_* methods."""
+
+    def test_rate_limit_state_get_missing(self):
+        self.assertIsNone(db.rate_limit_state_get(self.ctxt, 'fake_id'))
+
+    def test_rate_limit_state_update(self):
+        states = []
+
+        def update(state):
+            states.append(state)
+            return (state or '') + 'x'
+
+        self.assertEqual('x', db.rate_limit_state_update(self.ctxt,
+                                                         'fake_id', update))
+        self.assertEqual('xx', db.rate_limit_state_update(self.ctxt,
+                                                          'fake_id', update))
+        self.assertEqual([None, 'x'], states)
+        self.assertEqual('xx', db.rate_limit_state_get(self.ctxt, 'fake_id'))
+        self.assertIsNone(db.rate_limit_state_get(self.ctxt, 'other_id'))
+
+    def test_rate_limit_state_update_duplicate(self):
+        real_update = sqlalchemy_api._rate_limit_state_update
+
+        def update(context, state_id, update_func):
+            if not update.called:
+                # Another process creates the row concurrently.
+                update.called = True
+                real_update(context, state_id, lambda state: 'other')
+                raise db_exc.DBDuplicateEntry()
+            return real_update(context, state_id, update_func)
+        update.called = False
+
+        self.stubs.Set(sqlalchemy_api, '_rate_limit_state_update', update)
+        self.assertEqual('other-x', db.rate_limit_state_update(
+            self.ctxt, 'fake_id', lambda state: state + '-x'))
+
+
 class DBAPIBackupTestCase(BaseTest):
 
     """Tests for db.api.backup_* methods."""
@@ -1259,3 +1673,218 @@ class DBAPIBackupTestCase(BaseTest):
     def test_backup_not_found(self):
         self.assertRaises(exception.BackupNotFound, db.backup_get, self.ctxt,
                           'notinbase')
+
+
+class DBAPIQueryPlanTestCase(BaseTest):
+
+    """Tests that the hot DB API queries use the indexes of migration 038."""
+
+    @staticmethod
+    def _inline_parameters(statement, parameters):
+        parts = statement.split('?')
+        result = parts[0]
+        for value, part in zip(parameters, parts[1:]):
+            if value is None:
+                value = 'NULL'
+            elif isinstance(value, (bool, int, long, float)):
+                value = str(int(value) if isinstance(value, bool) else value)
+            else:
+                value = "'%s'" % unicode(value).replace("'", "''")
+            result += value + part
+        return result
+
+    def _get_query_plans(self, func, *args):
+        engine = sqlalchemy_api.get_engine()
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context,
+                    executemany):
+            if 'FROM' in statement.split():
+                statements.append(
+                    self._inline_parameters(statement, parameters))
+
+        sqlalchemy.event.listen(engine, 'before_cursor_execute', _record)
+        try:
+            func(self.ctxt, *args)
+        finally:
+            sqlalchemy.event.remove(engine, 'before_cursor_execute', _record)
+
+        plans = []
+        for statement in statements:
+            # sqlite only plans a LIKE prefix match as an index range when
+            # the pattern is known, so the values are inlined.
+            rows = engine.execute('EXPLAIN QUERY PLAN ' +
+                                  statement).fetchall()
+            plans.append(' '.join(row['detail'] for row in rows))
+        return plans
+
+    def _assert_uses_index(self, index, func, *args):
+        plans = self._get_query_plans(func, *args)
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertIn(index, plan)
+
+    def test_volume_get_all_by_host(self):
+        # Like MySQL, sqlite only uses an index for the host#pool prefix
+        # match when LIKE has the same case sensitivity as the index.
+        engine = sqlalchemy_api.get_engine()
+        engine.execute('PRAGMA case_sensitive_like = ON')
+        self.addCleanup(engine.execute, 'PRAGMA case_sensitive_like = OFF')
+        self._assert_uses_index('volumes_host_deleted_idx',
+                                db.volume_get_all_by_host, 'host1')
+
+    def test_volume_data_get_for_host(self):
+        self._assert_uses_index('volumes_host_deleted_idx',
+                                db.volume_data_get_for_host, 'host1')
+
+    def test_volume_get_all_by_project(self):
+        self._assert_uses_index('volumes_project_id_deleted_idx',
+                                db.volume_get_all_by_project, 'project1',
+                                None, None, 'created_at', 'desc')
+
+    def test_volume_data_get_for_project(self):
+        self._assert_uses_index('volumes_project_id_deleted_idx',
+                                db.volume_data_get_for_project, 'project1')
+
+    def test_snapshot_get_all_for_volume(self):
+        self._assert_uses_index('snapshots_volume_id_deleted_idx',
+                                db.snapshot_get_all_for_volume, 'volume1')
+
+    def test_snapshot_data_get_for_project(self):
+        self._assert_uses_index('snapshots_project_id_deleted_idx',
+                                db.snapshot_data_get_for_project, 'project1')
+
+    def test_backup_get_all_by_host(self):
+        self._assert_uses_index('backups_host_deleted_idx',
+                                db.backup_get_all_by_host, 'host1')
+
+    def test_backup_data_get_for_project(self):
+        self._assert_uses_index('backups_project_id_deleted_idx',
+                                sqlalchemy_api._backup_data_get_for_project,
+                                'project1')
+
+    def test_service_get_all_by_topic(self):
+        self._assert_uses_index('services_topic_deleted_idx',
+                                db.service_get_all_by_topic, 'cinder-volume')
+
+
+class DBAPIReplicaTestCase(BaseTest):
+
+    """Tests for the replica safe DB API calls."""
+
+    def setUp(self):
+        super(DBAPIReplicaTestCase, self).setUp()
+        facade = sqlalchemy_api._create_facade_lazily()
+        self.facade = mock.Mock(wraps=facade)
+        self.stubs.Set(sqlalchemy_api, '_create_facade_lazily',
+                       lambda: self.facade)
+        self.flags(db_replica_reads=True)
+        self.override_config('slave_connection', 'sqlite://', 'database')
+
+    def _get_use_slave(self):
+        return [kwargs['use_slave']
+                for args, kwargs in self.facade.get_session.call_args_list]
+
+    def test_replica_safe(self):
+        db.volume_create(self.ctxt, {'host': 'h1'})
+        self.facade.reset_mock()
+
+        self.assertEqual(1, len(db.volume_get_all(self.ctxt, None, None,
+                                                  'created_at', 'asc')))
+        self.assertTrue(self._get_use_slave())
+        self.assertTrue(all(self._get_use_slave()))
+
+    def test_not_replica_safe(self):
+        db.volume_create(self.ctxt, {'host': 'h1'})
+        self.facade.reset_mock()
+
+        self.assertEqual(1, len(db.volume_get_all_by_host(self.ctxt, 'h1')))
+        self.assertTrue(self._get_use_slave())
+        self.assertFalse(any(self._get_use_slave()))
+
+    def test_services_not_replica_safe(self):
+        # The liveness of the services is computed from their updated_at.
+        db.service_get_all(self.ctxt)
+        db.service_get_all_by_topic(self.ctxt, 'volume')
+        self.assertEqual([False, False], self._get_use_slave())
+
+    def test_replica_reads_disabled(self):
+        self.flags(db_replica_reads=False)
+        db.volume_get_all(self.ctxt, None, None, 'created_at', 'asc')
+        self.assertEqual([False], self._get_use_slave())
+
+    def test_replica_not_configured(self):
+        self.override_config('slave_connection', None, 'database')
+        db.volume_get_all(self.ctxt, None, None, 'created_at', 'asc')
+        self.assertEqual([False], self._get_use_slave())
+
+    def test_context_read_replica_false(self):
+        self.ctxt.read_replica = False
+        db.volume_get_all(self.ctxt, None, None, 'created_at', 'asc')
+        self.assertEqual([False], self._get_use_slave())
+
+    def test_replica_safe_nested(self):
+        @sqlalchemy_api.replica_safe
+        def _outer(context):
+            db.volume_get_all(context, None, None, 'created_at', 'asc')
+            return sqlalchemy_api.get_session()
+
+        _outer(self.ctxt)
+        self.assertEqual([True, True], self._get_use_slave())
+        # The outer call reset the replica mode
+        sqlalchemy_api.get_session()
+        self.assertEqual([True, True, False], self._get_use_slave())
+
+
+class DBAPIPurgeTestCase(BaseTest):
+
+    """Tests for db.api.purge_deleted_rows."""
+
+    def _destroy_volume(self, volume_id, days_ago):
+        timeutils.set_time_override(timeutils.utcnow() -
+                                    datetime.timedelta(days=days_ago))
+        self.addCleanup(timeutils.clear_time_override)
+        db.volume_destroy(self.ctxt, volume_id)
+        timeutils.clear_time_override()
+
+    def _count(self, model):
+        return sqlalchemy_api.model_query(self.ctxt, model,
+                                          read_deleted='yes').count()
+
+    def test_purge_deleted_rows(self):
+        for i in range(3):
+            db.volume_create(self.ctxt, {'id': 'old%d' % i,
+                                         'metadata': {'key': 'value'}})
+            self._destroy_volume('old%d' % i, 40)
+        db.volume_create(self.ctxt, {'id': 'recent'})
+        self._destroy_volume('recent', 10)
+        db.volume_create(self.ctxt, {'id': 'live'})
+
+        results = db.purge_deleted_rows(self.ctxt, 30, batch_size=2)
+
+        self.assertEqual(3, results['volumes'])
+        self.assertEqual(3, results['volume_metadata'])
+        self.assertEqual(0, results['snapshots'])
+        self.assertEqual(set(['recent', 'live']),
+                         set(volume['id'] for volume in
+                             sqlalchemy_api.model_query(
+                                 self.ctxt, models.Volume,
+                                 read_deleted='yes').all()))
+        self.assertEqual(0, self._count(models.VolumeMetadata))
+
+    def test_purge_keeps_referenced_rows(self):
+        db.volume_create(self.ctxt, {'id': 'volume1'})
+        db.snapshot_create(self.ctxt, {'id': 'snapshot1',
+                                       'volume_id': 'volume1'})
+        self._destroy_volume('volume1', 40)
+
+        results = db.purge_deleted_rows(self.ctxt, 30)
+
+        self.assertEqual(0, results['volumes'])
+        self.assertEqual(1, self._count(models.Volume))
+
+    def test_purge_invalid_age(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          db.purge_deleted_rows, self.ctxt, -1)
+        self.assertRaises(exception.InvalidParameterValue,
+                          db.purge_deleted_rows, self.ctxt, 'ten')
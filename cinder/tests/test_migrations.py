@@ -722,6 +722,68 @@ class MigrationsMixin(test_migrations.WalkVersionsMixin):
         snapshots = db_utils.get_table(engine, 'snapshots')
         self.assertNotIn('provider_id', snapshots.c)
 
+    def _check_037(self, engine, data):
+        """Test adding capacity_reservations table works correctly."""
+        capacity_reservations = db_utils.get_table(engine,
+                                                   'capacity_reservations')
+        self.assertIsInstance(capacity_reservations.c.created_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(capacity_reservations.c.deleted.type,
+                              self.BOOL_TYPE)
+        self.assertIsInstance(capacity_reservations.c.id.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(capacity_reservations.c.host.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(capacity_reservations.c.backend.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(capacity_reservations.c.size.type,
+                              sqlalchemy.types.INTEGER)
+        self.assertIsInstance(capacity_reservations.c.resource_id.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(capacity_reservations.c.expire.type,
+                              self.TIME_TYPE)
+
+    def _post_downgrade_037(self, engine):
+        self.assertFalse(engine.dialect.has_table(engine.connect(),
+                                                  "capacity_reservations"))
+
+    def _check_038(self, engine, data):
+        """Test adding the hot query path indexes."""
+        expected = {'volumes': [['host', 'deleted'],
+                                ['project_id', 'deleted']],
+                    'snapshots': [['volume_id', 'deleted'],
+                                  ['project_id', 'deleted']],
+                    'backups': [['host', 'deleted'],
+                                ['project_id', 'deleted']],
+                    'services': [['topic', 'deleted']]}
+        for table_name, columns_list in expected.items():
+            table = db_utils.get_table(engine, table_name)
+            indexes = [idx.columns.keys() for idx in table.indexes]
+            for columns in columns_list:
+                self.assertIn(columns, indexes)
+
+    def _post_downgrade_038(self, engine):
+        volumes = db_utils.get_table(engine, 'volumes')
+        indexes = [idx.columns.keys() for idx in volumes.indexes]
+        self.assertNotIn(['host', 'deleted'], indexes)
+        self.assertNotIn(['project_id', 'deleted'], indexes)
+
+    def _check_039(self, engine, data):
+        """Test adding rate_limit_states table works correctly."""
+        rate_limit_states = db_utils.get_table(engine, 'rate_limit_states')
+        self.assertIsInstance(rate_limit_states.c.created_at.type,
+                              self.TIME_TYPE)
+        self.assertIsInstance(rate_limit_states.c.deleted.type,
+                              self.BOOL_TYPE)
+        self.assertIsInstance(rate_limit_states.c.id.type,
+                              sqlalchemy.types.VARCHAR)
+        self.assertIsInstance(rate_limit_states.c.state.type,
+                              sqlalchemy.types.TEXT)
+
+    def _post_downgrade_039(self, engine):
+        self.assertFalse(engine.dialect.has_table(engine.connect(),
+                                                  "rate_limit_states"))
+
     def test_walk_versions(self):
         self.walk_versions(True, False)
 
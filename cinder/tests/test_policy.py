@@ -0,0 +1,161 @@
+# Copyright (c) 2015 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Tests for the cinder policy engine."""
+
+import mock
+
+from cinder import context
+from cinder import exception
+from cinder.openstack.common import policy as common_policy
+from cinder import policy
+from cinder import test
+
+
+class PolicyTestCase(test.TestCase):
+
+    def setUp(self):
+        super(PolicyTestCase, self).setUp()
+        self.addCleanup(setattr, policy, '_ENFORCER', None)
+        policy._ENFORCER = None
+        policy.init()
+        self.enforcer = policy._ENFORCER
+        self.context = context.RequestContext('fake_user', 'fake_project',
+                                              roles=['member'])
+        self.target = {'project_id': 'fake_project'}
+
+    def _set_rules(self, rules):
+        self.enforcer.set_rules(common_policy.Rules(
+            dict((action, common_policy.parse_rule(rule))
+                 for action, rule in rules.items())))
+
+    def test_enforce(self):
+        policy.enforce(self.context, 'volume:get', self.target)
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'volume:get',
+                          {'project_id': 'other_project'})
+        policy.enforce(self.context.elevated(), 'volume:get',
+                       {'project_id': 'other_project'})
+
+    def test_enforce_missing_rule(self):
+        self._set_rules({'volume:get': ''})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'volume:missing', self.target)
+
+    def test_enforce_no_rules(self):
+        self.enforcer.load_rules()
+        self.enforcer.set_rules({})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'volume:get', self.target)
+
+    def test_compile_inlines_rules(self):
+        compiled = self.enforcer.compile('volume:get')
+        self.assertEqual(('project_id',), compiled.target_keys)
+        self.assertEqual(('is_admin', 'project_id'), compiled.cred_keys)
+        self.assertTrue(compiled.cacheable)
+        self.assertIs(compiled, self.enforcer.compile('volume:get'))
+
+    def test_compile_checks(self):
+        self._set_rules({
+            'not': 'not role:admin',
+            'and': 'role:member and project_id:%(project_id)s',
+            'literal': "'fake_project':%(project_id)s",
+            'nested': 'user.name:%(user_name)s',
+            'loop': 'rule:loop',
+        })
+        creds = {'roles': ['Member'], 'project_id': 'fake_project',
+                 'user': {'name': 'fake'}}
+
+        def check(action, target, creds=creds):
+            compiled = self.enforcer.compile(action)
+            return compiled.predicate(target, creds)
+
+        self.assertTrue(check('not', {}))
+        self.assertFalse(check('not', {}, {'roles': ['ADMIN']}))
+        self.assertTrue(check('and', self.target))
+        self.assertFalse(check('and', {}))
+        self.assertFalse(check('and', {'project_id': 'other_project'}))
+        self.assertTrue(check('literal', self.target))
+        self.assertTrue(check('nested', {'user_name': 'fake'}))
+        self.assertFalse(check('nested', {'user_name': 'fake'}, {}))
+        self.assertFalse(check('loop', {}))
+
+    def test_http_check_not_cached(self):
+        self._set_rules({'volume:get': 'http://example.com/%(project_id)s'})
+        compiled = self.enforcer.compile('volume:get')
+        self.assertFalse(compiled.cacheable)
+        with mock.patch.object(common_policy.HttpCheck, '__call__',
+                               return_value=True) as http_check:
+            policy.enforce(self.context, 'volume:get', self.target)
+            policy.enforce(self.context, 'volume:get', self.target)
+        self.assertEqual(2, http_check.call_count)
+        self.assertEqual('fake_project',
+                         http_check.call_args[0][1]['project_id'])
+
+    def test_decisions_cached(self):
+        with mock.patch.object(self.context, 'to_dict') as to_dict:
+            policy.enforce(self.context, 'volume:get', self.target)
+        self.assertFalse(to_dict.called)
+
+        compiled = self.enforcer.compile('volume:get')
+        with mock.patch.object(compiled, 'predicate',
+                               return_value=False) as predicate:
+            policy.enforce(self.context, 'volume:get', self.target)
+            self.assertRaises(exception.PolicyNotAuthorized,
+                              policy.enforce, self.context, 'volume:get',
+                              {'project_id': 'other_project'})
+        self.assertEqual(1, predicate.call_count)
+
+    def test_decisions_lru(self):
+        self.flags(policy_decision_cache_size=2)
+        for project_id in ['p1', 'p2', 'p1', 'p3']:
+            self.assertRaises(exception.PolicyNotAuthorized,
+                              policy.enforce, self.context, 'volume:get',
+                              {'project_id': project_id})
+        self.assertEqual(
+            ['p1', 'p3'],
+            [key[1][0] for key in self.enforcer._decisions.keys()])
+
+    def test_decisions_cache_disabled(self):
+        self.flags(policy_decision_cache_size=0)
+        policy.enforce(self.context, 'volume:get', self.target)
+        self.assertEqual(0, len(self.enforcer._decisions))
+
+    def test_invalidated_on_reload(self):
+        policy.enforce(self.context, 'volume:create', self.target)
+        self._set_rules({'volume:create': '!'})
+        self.assertEqual(0, len(self.enforcer._decisions))
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'volume:create', self.target)
+
+    def test_invalidated_on_rules_replaced(self):
+        policy.enforce(self.context, 'volume:create', self.target)
+        self.enforcer.rules = common_policy.Rules(
+            {'volume:create': common_policy.parse_rule('!')})
+        with mock.patch.object(self.enforcer, 'load_rules'):
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, 'volume:create', self.target)
+
+    def test_credentials(self):
+        creds = policy._Credentials(self.context)
+        expected = self.context.to_dict()
+        for key in policy._CONTEXT_ATTRIBUTES:
+            self.assertEqual(expected[key], creds[key])
+        self.assertEqual(expected['user_identity'], creds['user_identity'])
+        self.assertRaises(KeyError, creds.__getitem__, 'missing')
+
+    def test_check_is_admin(self):
+        self.assertTrue(policy.check_is_admin(['admin']))
+        self.assertFalse(policy.check_is_admin(['member']))
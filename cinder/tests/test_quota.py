@@ -17,6 +17,7 @@
 
 
 import datetime
+import uuid
 
 import mock
 from oslo.config import cfg
@@ -792,6 +793,132 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_resources_cached(self, mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=60)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+
+        resources = engine.resources
+        self.assertIs(resources, engine.resources)
+        self.assertEqual(1, mock_volume_type_get_all.call_count)
+
+        mock_volume_type_get_all.return_value = {
+            'type1': {'id': 'fake_id', 'name': 'type1'}}
+        engine.invalidate_resources()
+        self.assertIn('volumes_type1', engine.resources)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_resources_cache_ttl(self, mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=60)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        engine.resources
+        timeutils.advance_time_seconds(30)
+        engine.resources
+        self.assertEqual(1, mock_volume_type_get_all.call_count)
+        timeutils.advance_time_seconds(31)
+        engine.resources
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_resources_reloaded_on_unknown_name(self,
+                                                mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=60)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+        engine._driver = mock.Mock()
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine.reserve(ctx, volumes=1)
+        self.assertEqual(1, mock_volume_type_get_all.call_count)
+
+        # A volume type created by another process.
+        mock_volume_type_get_all.return_value = {
+            'type1': {'id': 'fake_id', 'name': 'type1'}}
+        engine.reserve(ctx, volumes_type1=1)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+        resources = engine._driver.reserve.call_args[0][1]
+        self.assertIn('volumes_type1', resources)
+
+        # Known names are served from the cache.
+        engine.limit_check(ctx, volumes_type1=1)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+
+        # Names unknown after the reload are still reported.
+        engine.reserve(ctx, volumes_type2=1)
+        self.assertEqual(3, mock_volume_type_get_all.call_count)
+        resources = engine._driver.reserve.call_args[0][1]
+        self.assertNotIn('volumes_type2', resources)
+
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_unknown_names_reloaded_once_per_ttl(self,
+                                                 mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=60)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+        engine._driver = mock.Mock()
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        engine.reserve(ctx, volumes=1)
+        self.assertEqual(1, mock_volume_type_get_all.call_count)
+
+        # A deleted volume type only reloads the resources once.
+        engine.reserve(ctx, volumes_deleted=1)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+        engine.reserve(ctx, volumes_deleted=1)
+        engine.limit_check(ctx, volumes_deleted=1)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+
+        # Another unknown name reloads them again.
+        engine.reserve(ctx, volumes_other=1)
+        self.assertEqual(3, mock_volume_type_get_all.call_count)
+
+        # The unknown names are forgotten when the cache expires.
+        timeutils.advance_time_seconds(61)
+        engine.reserve(ctx, volumes=1)
+        self.assertEqual(4, mock_volume_type_get_all.call_count)
+        engine.reserve(ctx, volumes_deleted=1)
+        self.assertEqual(5, mock_volume_type_get_all.call_count)
+
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_resources_reloaded_on_listing(self, mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=60)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+        engine._driver = mock.Mock()
+        ctx = context.RequestContext('admin', 'admin', is_admin=True)
+        engine.reserve(ctx, volumes=1)
+        self.assertEqual(1, mock_volume_type_get_all.call_count)
+
+        # A volume type created by another process.
+        mock_volume_type_get_all.return_value = {
+            'type1': {'id': 'fake_id', 'name': 'type1'}}
+        engine.get_defaults(ctx)
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+        resources = engine._driver.get_defaults.call_args[0][1]
+        self.assertIn('volumes_type1', resources)
+
+        engine.get_class_quotas(ctx, 'test_class')
+        self.assertEqual(3, mock_volume_type_get_all.call_count)
+        engine.get_project_quotas(ctx, 'test_project')
+        self.assertEqual(4, mock_volume_type_get_all.call_count)
+
+    @mock.patch('cinder.db.volume_type_get_all')
+    def test_resources_cache_disabled(self, mock_volume_type_get_all):
+        self.flags(quota_resources_cache_ttl=0)
+        mock_volume_type_get_all.return_value = {}
+        engine = quota.VolumeTypeQuotaEngine()
+
+        engine.resources
+        engine.resources
+        self.assertEqual(2, mock_volume_type_get_all.call_count)
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
@@ -1253,7 +1380,8 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         def fake_get_session():
             return FakeSession()
 
-        def fake_get_quota_usages(context, session, project_id):
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
             return self.usages.copy()
 
         def fake_quota_usage_create(context, project_id, resource, in_use,
@@ -1267,20 +1395,24 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
 
             return quota_usage_ref
 
-        def fake_reservation_create(context, uuid, usage_id, project_id,
-                                    resource, delta, expire, session=None):
-            reservation_ref = self._make_reservation(
-                uuid, usage_id, project_id, resource, delta, expire,
-                timeutils.utcnow(), timeutils.utcnow())
+        def fake_reservations_create(context, usages, project_id, deltas,
+                                     expire, session):
+            for resource, delta in deltas.items():
+                reservation_ref = self._make_reservation(
+                    str(uuid.uuid4()), usages[resource], project_id,
+                    resource, delta, expire, timeutils.utcnow(),
+                    timeutils.utcnow())
 
-            self.reservations_created[resource] = reservation_ref
+                self.reservations_created[resource] = reservation_ref
 
-            return reservation_ref
+            return [reservation['uuid'] for reservation in
+                    self.reservations_created.values()]
 
         self.stubs.Set(sqa_api, 'get_session', fake_get_session)
         self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
         self.stubs.Set(sqa_api, '_quota_usage_create', fake_quota_usage_create)
-        self.stubs.Set(sqa_api, '_reservation_create', fake_reservation_create)
+        self.stubs.Set(sqa_api, '_reservations_create',
+                       fake_reservations_create)
 
         patcher = mock.patch.object(timeutils, 'utcnow')
         self.addCleanup(patcher.stop)
@@ -1452,6 +1584,61 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                        usage_id=self.usages['gigabytes'],
                                        delta=2 * 1024), ])
 
+    def _get_stats_delta(self, context, stats):
+        new_stats = sqa_api.quota_reserve_get_stats(context)
+        return dict((key, new_stats[key] - stats[key])
+                    for key in ('reservations', 'refreshes',
+                                'refresh_conflicts'))
+
+    def test_quota_reserve_refresh_without_lock(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=2, gigabytes=2 * 1024, )
+        stats = sqa_api.quota_reserve_get_stats(context)
+
+        sqa_api.quota_reserve(context, self.resources, quotas, deltas,
+                              self.expire, 5, 0)
+
+        self.assertEqual(self.sync_called, set(['volumes']))
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=2,
+                                              reserved=2,
+                                              until_refresh=5), ])
+        self.assertEqual({'reservations': 1, 'refreshes': 1,
+                          'refresh_conflicts': 0},
+                         self._get_stats_delta(context, stats))
+
+    def test_quota_reserve_refresh_conflict(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None, lock=True):
+            if lock:
+                # Another request committed a volume since the refresh.
+                self.usages['volumes'].in_use += 1
+            return self.usages.copy()
+
+        self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=2, gigabytes=2 * 1024, )
+        stats = sqa_api.quota_reserve_get_stats(context)
+
+        sqa_api.quota_reserve(context, self.resources, quotas, deltas,
+                              self.expire, 5, 0)
+
+        # The usage is refreshed again under the lock.
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=3,
+                                              reserved=2,
+                                              until_refresh=5), ])
+        self.assertEqual({'reservations': 1, 'refreshes': 1,
+                          'refresh_conflicts': 1},
+                         self._get_stats_delta(context, stats))
+
     def test_quota_reserve_max_age(self):
         max_age = 3600
         record_created = (timeutils.utcnow() -
@@ -29,9 +29,11 @@ from oslo_concurrency import processutils
 from cinder import context
 from cinder import db
 from cinder import exception
+from cinder import heartbeat
 from cinder import manager
 from cinder import service
 from cinder import test
+from cinder import utils
 from cinder import wsgi
 
 
@@ -116,6 +118,7 @@ class ServiceTestCase(test.TestCase):
     def setUp(self):
         super(ServiceTestCase, self).setUp()
         self.mox.StubOutWithMock(service, 'db')
+        self.mox.StubOutWithMock(heartbeat, 'db')
 
     def test_create(self):
         host = 'foo'
@@ -149,8 +152,8 @@ class ServiceTestCase(test.TestCase):
                                        binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(
-            mox.IgnoreArg(),
+        heartbeat.db.service_heartbeat(
+            mox.IgnoreArg(), mox.IgnoreArg(),
             mox.IgnoreArg()).AndRaise(db_exc.DBConnectionError())
 
         self.mox.ReplayAll()
@@ -183,10 +186,9 @@ class ServiceTestCase(test.TestCase):
                                        binary).AndRaise(exception.NotFound())
         service.db.service_create(mox.IgnoreArg(),
                                   service_create).AndReturn(service_ref)
-        service.db.service_get(mox.IgnoreArg(),
-                               service_ref['id']).AndReturn(service_ref)
-        service.db.service_update(mox.IgnoreArg(), service_ref['id'],
-                                  mox.ContainsKeyValue('report_count', 1))
+        heartbeat.db.service_heartbeat(
+            mox.IgnoreArg(), service_ref['id'],
+            {'availability_zone': 'nova'}).AndReturn(True)
 
         self.mox.ReplayAll()
         serv = service.Service(host,
@@ -199,6 +201,56 @@ class ServiceTestCase(test.TestCase):
 
         self.assertFalse(serv.model_disconnected)
 
+    def test_report_state_service_recreated(self):
+        host = 'foo'
+        binary = 'bar'
+        topic = 'test'
+        service_create = {'host': host,
+                          'binary': binary,
+                          'topic': topic,
+                          'report_count': 0,
+                          'availability_zone': 'nova'}
+        service_ref = {'host': host,
+                       'binary': binary,
+                       'topic': topic,
+                       'report_count': 0,
+                       'availability_zone': 'nova',
+                       'id': 1}
+
+        service.db.service_get_by_args(mox.IgnoreArg(),
+                                       host,
+                                       binary).AndRaise(exception.NotFound())
+        service.db.service_create(mox.IgnoreArg(),
+                                  service_create).AndReturn(service_ref)
+        heartbeat.db.service_heartbeat(
+            mox.IgnoreArg(), 1, mox.IgnoreArg()).AndReturn(False)
+        service.db.service_create(mox.IgnoreArg(),
+                                  service_create).AndReturn(
+                                      dict(service_ref, id=2))
+        heartbeat.db.service_heartbeat(
+            mox.IgnoreArg(), 2, mox.IgnoreArg()).AndReturn(True)
+
+        self.mox.ReplayAll()
+        serv = service.Service(host,
+                               binary,
+                               topic,
+                               'cinder.tests.test_service.FakeManager')
+        serv.start()
+        serv.report_state()
+
+        self.assertEqual(2, serv.service_id)
+
+    def test_report_state_local_heartbeat(self):
+        self.flags(heartbeat_driver='cinder.heartbeat.LocalDriver')
+        serv = service.Service('foo', 'bar', 'test',
+                               'cinder.tests.test_service.FakeManager')
+        serv.service_id = 'fake-service-id'
+
+        serv.report_state()
+
+        self.assertTrue(utils.service_is_up({'id': 'fake-service-id'}))
+        self.assertFalse(utils.service_is_up({'id': 'other-service-id'}))
+
     def test_service_with_long_report_interval(self):
         self.override_config('service_down_time', 10)
         self.override_config('report_interval', 10)
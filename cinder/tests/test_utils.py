@@ -1362,6 +1362,41 @@ class InvalidFilterTestCase(test.TestCase):
         self.assertEqual(allowed_search_options, tuple(sorted(filters.keys())))
 
 
+class PaginationTestCase(test.TestCase):
+    def test_sort_params_single_key(self):
+        self.assertEqual((['size', 'created_at', 'id'],
+                          ['desc', 'desc', 'desc']),
+                         utils.get_pagination_sort_params('size', 'desc'))
+
+    def test_sort_params_multiple_keys(self):
+        self.assertEqual(
+            (['size', 'display_name', 'created_at', 'id'],
+             ['desc', 'asc', 'asc', 'asc']),
+            utils.get_pagination_sort_params(['size', 'display_name'],
+                                             ['desc', 'asc']))
+
+    def test_sort_params_tie_breakers_not_repeated(self):
+        self.assertEqual((['id', 'created_at'], ['asc', 'asc']),
+                         utils.get_pagination_sort_params(['id'], None))
+
+    def test_sort_params_invalid_dir(self):
+        self.assertRaises(exception.InvalidInput,
+                          utils.get_pagination_sort_params, 'size', 'up')
+        self.assertRaises(exception.InvalidInput,
+                          utils.get_pagination_sort_params, 'size',
+                          ['asc', 'desc'])
+
+    def test_cursor(self):
+        values = [1, u'vol', datetime.datetime(2015, 1, 2, 3, 4, 5, 6)]
+        cursor = utils.encode_pagination_cursor(values)
+        self.assertEqual(values, utils.decode_pagination_cursor(cursor))
+
+    def test_invalid_cursor(self):
+        for cursor in ('not a cursor', 'e30=', 'W3siYSI6IDF9XQ=='):
+            self.assertRaises(exception.InvalidInput,
+                              utils.decode_pagination_cursor, cursor)
+
+
 class IsBlkDeviceTestCase(test.TestCase):
     @mock.patch('stat.S_ISBLK', return_value=True)
     @mock.patch('os.stat')
@@ -248,6 +248,24 @@ class VolumeTestCase(BaseVolumeTestCase):
         self.assertEqual(volume['status'], "error")
         self.volume.delete_volume(self.context, volume_id)
 
+    def test_init_host_export_failures(self):
+        """init_host sets the volumes it fails to re-export to error."""
+        volumes = [tests_utils.create_volume(self.context, status='in-use',
+                                             size=0, host=CONF.host)
+                   for i in range(3)]
+        with mock.patch.object(self.volume.driver, 'ensure_export',
+                               side_effect=exception.CinderException):
+            with mock.patch.object(
+                    db, 'volume_status_transition_many',
+                    wraps=db.volume_status_transition_many) as transition:
+                self.volume.init_host()
+        transition.assert_called_once_with(
+            mock.ANY, [volume['id'] for volume in volumes], 'in-use',
+            {'status': 'error'})
+        for volume in volumes:
+            volume = db.volume_get(context.get_admin_context(), volume['id'])
+            self.assertEqual('error', volume['status'])
+
     def test_init_host_resumes_deletes(self):
         """init_host will resume deleting volume in deleting status."""
         volume = tests_utils.create_volume(self.context, status='deleting',
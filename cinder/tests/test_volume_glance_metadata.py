@@ -95,6 +95,48 @@ class VolumeGlanceMetadataTestCase(test.TestCase):
         self._assert_metadata_equals('2', 'key2', 'value2', metadata[1])
         self._assert_metadata_equals('2', 'key22', 'value22', metadata[2])
 
+    def test_vol_glance_metadata_bulk_create(self):
+        ctxt = context.get_admin_context()
+        db.volume_create(ctxt, {'id': '1'})
+        db.volume_glance_metadata_create(ctxt, '1', 'key1', 'value1')
+
+        db.volume_glance_metadata_bulk_create(ctxt, '1', {'key1': 'new1',
+                                                          'key2': 'value2',
+                                                          'key3': 3})
+
+        metadata = db.volume_glance_metadata_get(ctxt, '1')
+        self.assertEqual({'key1': 'value1', 'key2': 'value2', 'key3': '3'},
+                         dict((meta.key, meta.value) for meta in metadata))
+
+    def test_vols_get_glance_metadata_list(self):
+        ctxt = context.get_admin_context()
+        db.volume_create(ctxt, {'id': '1'})
+        db.volume_create(ctxt, {'id': '2'})
+        db.volume_create(ctxt, {'id': '3'})
+        db.volume_glance_metadata_create(ctxt, '1', 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, '2', 'key2', 'value2')
+        db.volume_glance_metadata_create(ctxt, '3', 'key3', 'value3')
+
+        metadata = db.volume_glance_metadata_list_get(ctxt, ['1', '3'])
+        self.assertEqual(2, len(metadata))
+        metadata.sort(key=lambda meta: meta.volume_id)
+        self._assert_metadata_equals('1', 'key1', 'value1', metadata[0])
+        self._assert_metadata_equals('3', 'key3', 'value3', metadata[1])
+
+        self.assertEqual([], db.volume_glance_metadata_list_get(ctxt, []))
+
+    def test_vols_get_glance_metadata_list_project_only(self):
+        ctxt = context.get_admin_context()
+        db.volume_create(ctxt, {'id': '1', 'project_id': 'project1'})
+        db.volume_create(ctxt, {'id': '2', 'project_id': 'project2'})
+        db.volume_glance_metadata_create(ctxt, '1', 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, '2', 'key2', 'value2')
+
+        user_ctxt = context.RequestContext('user1', 'project1')
+        metadata = db.volume_glance_metadata_list_get(user_ctxt, ['1', '2'])
+        self.assertEqual(1, len(metadata))
+        self._assert_metadata_equals('1', 'key1', 'value1', metadata[0])
+
     def _assert_metadata_equals(self, volume_id, key, value, observed):
         self.assertEqual(volume_id, observed.volume_id)
         self.assertEqual(key, observed.key)
@@ -91,6 +91,20 @@ class VolumeTypeTestCase(test.TestCase):
                          new_all_vtypes,
                          'drive type was not deleted')
 
+    def test_volume_type_changes_refresh_quota_resources(self):
+        """Ensure the quota resources follow the volume types."""
+        self.flags(quota_resources_cache_ttl=60)
+        quotas = volume_types.QUOTAS
+        self.addCleanup(quotas.invalidate_resources)
+        resource_name = 'volumes_%s' % self.vol_type1_name
+        self.assertNotIn(resource_name, quotas.resources)
+
+        type_ref = volume_types.create(self.ctxt, self.vol_type1_name)
+        self.assertIn(resource_name, quotas.resources)
+
+        volume_types.destroy(self.ctxt, type_ref['id'])
+        self.assertNotIn(resource_name, quotas.resources)
+
     def test_create_volume_type_with_invalid_params(self):
         """Ensure exception will be returned."""
         vol_type_invalid_specs = "invalid_extra_specs"
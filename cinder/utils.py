@@ -18,6 +18,7 @@
 """Utilities and helper functions."""
 
 
+import base64
 import contextlib
 import datetime
 import hashlib
@@ -36,6 +37,7 @@ from xml.sax import expatreader
 from xml.sax import saxutils
 
 from oslo.config import cfg
+from oslo.serialization import jsonutils
 from oslo.utils import importutils
 from oslo.utils import timeutils
 from oslo_concurrency import lockutils
@@ -509,7 +511,13 @@ def hash_file(file_like_object):
 
 def service_is_up(service):
     """Check whether a service is up based on last heartbeat."""
-    last_heartbeat = service['updated_at'] or service['created_at']
+    # NOTE: imported here as the heartbeat drivers use cinder.db, which
+    # imports this module.
+    from cinder import heartbeat
+
+    last_heartbeat = heartbeat.get_driver().last_heartbeat(service)
+    if last_heartbeat is None:
+        return False
     # Timestamps in DB are UTC.
     elapsed = (timeutils.utcnow() - last_heartbeat).total_seconds()
     return abs(elapsed) <= CONF.service_down_time
@@ -758,6 +766,62 @@ def remove_invalid_filter_options(context, filters,
         del filters[opt]
 
 
+def get_pagination_sort_params(sort_key, sort_dir):
+    """Return the sort keys and directions of a paginated listing.
+
+    sort_key and sort_dir are either single values or lists.  Keys without
+    a direction use the last given one, 'asc' by default, and created_at
+    and id are appended as tie breakers so that the order is total.
+
+    :returns: (sort_keys, sort_dirs) lists of the same length
+    """
+    sort_keys = sort_key if isinstance(sort_key, (list, tuple)) \
+        else [sort_key or 'created_at']
+    sort_dirs = sort_dir if isinstance(sort_dir, (list, tuple)) \
+        else [sort_dir] if sort_dir else []
+    if len(sort_dirs) > len(sort_keys):
+        raise exception.InvalidInput(
+            reason=_('There are more sort directions than sort keys.'))
+    for direction in sort_dirs:
+        if direction not in ('asc', 'desc'):
+            raise exception.InvalidInput(
+                reason=_("Unknown sort direction, must be 'desc' or 'asc'"))
+    default_dir = sort_dirs[-1] if sort_dirs else 'asc'
+    sort_dirs = list(sort_dirs) + [default_dir] * (len(sort_keys) -
+                                                   len(sort_dirs))
+
+    keys = []
+    dirs = []
+    for key, direction in zip(list(sort_keys) + ['created_at', 'id'],
+                              sort_dirs + [default_dir] * 2):
+        if key not in keys:
+            keys.append(key)
+            dirs.append(direction)
+    return keys, dirs
+
+
+def encode_pagination_cursor(values):
+    """Return the opaque cursor of the sort key values of a row."""
+    values = [{'datetime': timeutils.strtime(value)}
+              if isinstance(value, datetime.datetime) else value
+              for value in values]
+    return base64.urlsafe_b64encode(jsonutils.dumps(values))
+
+
+def decode_pagination_cursor(cursor):
+    """Return the sort key values encoded in a pagination cursor."""
+    try:
+        values = jsonutils.loads(base64.urlsafe_b64decode(str(cursor)))
+        if not isinstance(values, list):
+            raise ValueError()
+        return [timeutils.parse_strtime(value['datetime'])
+                if isinstance(value, dict) else value
+                for value in values]
+    except (TypeError, ValueError, KeyError):
+        raise exception.InvalidInput(
+            reason=_('Invalid pagination cursor %s.') % cursor)
+
+
 def is_blk_device(dev):
     try:
         if stat.S_ISBLK(os.stat(dev).st_mode):
@@ -353,14 +353,11 @@ class API(base.Base):
 
         return b
 
-    def get_all(self, context, marker=None, limit=None, sort_key='created_at',
-                sort_dir='desc', filters=None, viewable_admin_meta=False):
-        check_policy(context, 'get_all')
-
-        if filters is None:
-            filters = {}
+    def _get_limit_value(self, limit):
+        """Returns limit as an integer, None if no limit is given.
 
-        allTenants = self._get_all_tenants_value(filters)
+           An InvalidInput exception is thrown for invalid values.
+        """
 
         try:
             if limit is not None:
@@ -372,6 +369,20 @@ class API(base.Base):
             msg = _('limit param must be an integer')
             raise exception.InvalidInput(reason=msg)
 
+        return limit
+
+    def get_all(self, context, marker=None, limit=None, sort_key='created_at',
+                sort_dir='desc', filters=None, viewable_admin_meta=False,
+                fields=None, cursor=None):
+        check_policy(context, 'get_all')
+
+        if filters is None:
+            filters = {}
+
+        allTenants = self._get_all_tenants_value(filters)
+
+        limit = self._get_limit_value(limit)
+
         # Non-admin shouldn't see temporary target of a volume migration, add
         # unique filter data to reflect that only volumes with a NULL
         # 'migration_status' or a 'migration_status' that does not start with
@@ -386,7 +397,8 @@ class API(base.Base):
             # Need to remove all_tenants to pass the filtering below.
             del filters['all_tenants']
             volumes = self.db.volume_get_all(context, marker, limit, sort_key,
-                                             sort_dir, filters=filters)
+                                             sort_dir, filters=filters,
+                                             fields=fields, cursor=cursor)
         else:
             if viewable_admin_meta:
                 context = context.elevated()
@@ -394,7 +406,9 @@ class API(base.Base):
                                                         context.project_id,
                                                         marker, limit,
                                                         sort_key, sort_dir,
-                                                        filters=filters)
+                                                        filters=filters,
+                                                        fields=fields,
+                                                        cursor=cursor)
 
         return volumes
 
@@ -408,31 +422,31 @@ class API(base.Base):
         rv = self.db.volume_get(context, volume_id)
         return dict(rv.iteritems())
 
-    def get_all_snapshots(self, context, search_opts=None):
+    def get_all_snapshots(self, context, search_opts=None, marker=None,
+                          limit=None, sort_key=None, sort_dir=None):
         check_policy(context, 'get_all_snapshots')
 
         search_opts = search_opts or {}
 
+        limit = self._get_limit_value(limit)
+
+        if search_opts:
+            LOG.debug("Searching by: %s" % search_opts)
+
         if (context.is_admin and 'all_tenants' in search_opts):
             # Need to remove all_tenants to pass the filtering below.
             del search_opts['all_tenants']
-            snapshots = self.db.snapshot_get_all(context)
+            snapshots = self.db.snapshot_get_all(context,
+                                                 filters=search_opts,
+                                                 marker=marker, limit=limit,
+                                                 sort_key=sort_key,
+                                                 sort_dir=sort_dir)
         else:
             snapshots = self.db.snapshot_get_all_by_project(
-                context, context.project_id)
-
-        if search_opts:
-            LOG.debug("Searching by: %s" % search_opts)
+                context, context.project_id, filters=search_opts,
+                marker=marker, limit=limit, sort_key=sort_key,
+                sort_dir=sort_dir)
 
-            results = []
-            not_found = object()
-            for snapshot in snapshots:
-                for opt, value in search_opts.iteritems():
-                    if snapshot.get(opt, not_found) != value:
-                        break
-                else:
-                    results.append(snapshot)
-            snapshots = results
         return snapshots
 
     @wrap_check_policy
@@ -641,9 +655,8 @@ class API(base.Base):
             options_list.append(options)
 
         try:
-            for options in options_list:
-                snapshot = self.db.snapshot_create(context, options)
-                snapshot_list.append(snapshot)
+            snapshot_list = self.db.snapshot_create_many(context,
+                                                         options_list)
 
             QUOTAS.commit(context, reservations)
         except Exception:
@@ -919,6 +932,16 @@ class API(base.Base):
                                                      meta_entry['value']})
         return results
 
+    def get_list_volumes_image_metadata(self, context, volume_id_list):
+        check_policy(context, 'get_volumes_image_metadata')
+        db_data = self.db.volume_glance_metadata_list_get(context,
+                                                          volume_id_list)
+        results = collections.defaultdict(dict)
+        for meta_entry in db_data:
+            results[meta_entry['volume_id']].update({meta_entry['key']:
+                                                     meta_entry['value']})
+        return results
+
     @wrap_check_policy
     def get_volume_image_metadata(self, context, volume):
         db_data = self.db.volume_glance_metadata_get(context, volume['id'])
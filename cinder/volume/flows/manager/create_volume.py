@@ -539,21 +539,14 @@ class CreateVolumeFromSpecTask(flow_utils.CinderTask):
             if value is not None:
                 property_metadata[key] = value
 
-        # NOTE(harlowja): The best way for this to happen would be in bulk,
-        # but that doesn't seem to exist (yet), so we go through one by one
-        # which means we can have partial create/update failure.
         volume_metadata = dict(property_metadata)
         volume_metadata.update(base_metadata)
         LOG.debug("Creating volume glance metadata for volume %(volume_id)s"
                   " backed by image %(image_id)s with: %(vol_metadata)s." %
                   {'volume_id': volume_id, 'image_id': image_id,
                    'vol_metadata': volume_metadata})
-        for (key, value) in volume_metadata.items():
-            try:
-                self.db.volume_glance_metadata_create(context, volume_id,
-                                                      key, value)
-            except exception.GlanceMetadataExists:
-                pass
+        self.db.volume_glance_metadata_bulk_create(context, volume_id,
+                                                   volume_metadata)
 
     def _create_from_image(self, context, volume_ref,
                            image_location, image_id, image_meta,
@@ -150,7 +150,7 @@ def locked_snapshot_operation(f):
 class VolumeManager(manager.SchedulerDependentManager):
     """Manages attachable block storage devices."""
 
-    RPC_API_VERSION = '1.19'
+    RPC_API_VERSION = '1.20'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -199,7 +199,13 @@ class VolumeManager(manager.SchedulerDependentManager):
     def _add_to_threadpool(self, func, *args, **kwargs):
         self._tp.spawn_n(func, *args, **kwargs)
 
-    def _count_allocated_capacity(self, ctxt, volume):
+    def _count_allocated_capacity(self, ctxt, volume, new_hosts=None):
+        """Count the volume in the allocated capacity of its pool.
+
+        The host of a legacy volume without pool is updated with the pool
+        reported by the driver, or recorded in new_hosts (host -> volume
+        ids) when given, for the caller to update them all at once.
+        """
         pool = vol_utils.extract_host(volume['host'], 'pool')
         if pool is None:
             # No pool name encoded in host, so this is a legacy
@@ -217,8 +223,11 @@ class VolumeManager(manager.SchedulerDependentManager):
             if pool:
                 new_host = vol_utils.append_host(volume['host'],
                                                  pool)
-                self.db.volume_update(ctxt, volume['id'],
-                                      {'host': new_host})
+                if new_hosts is None:
+                    self.db.volume_update(ctxt, volume['id'],
+                                          {'host': new_host})
+                else:
+                    new_hosts.setdefault(new_host, []).append(volume['id'])
             else:
                 # Otherwise, put them into a special fixed pool with
                 # volume_backend_name being the pool name, if
@@ -249,7 +258,8 @@ class VolumeManager(manager.SchedulerDependentManager):
         :param ctxt: our working context
         """
         vol_entries = self.db.volume_get_all(ctxt, None, 1, 'created_at',
-                                             None, filters=None)
+                                             None, filters=None,
+                                             fields=['id'])
 
         if len(vol_entries) == 0:
             LOG.info(_LI("Determined volume DB was empty at startup."))
@@ -281,34 +291,46 @@ class VolumeManager(manager.SchedulerDependentManager):
         # FIXME volume count for exporting is wrong
         LOG.debug("Re-exporting %s volumes" % len(volumes))
 
+        # The volumes to move to error by their current status, and the
+        # legacy volumes to move to a pool, are updated in bulk.
+        failed = {'in-use': [], 'downloading': []}
+        new_hosts = {}
         try:
             self.stats['pools'] = {}
             self.stats.update({'allocated_capacity_gb': 0})
-            for volume in volumes:
-                # available volume should also be counted into allocated
-                if volume['status'] in ['in-use', 'available']:
-                    # calculate allocated capacity for driver
-                    self._count_allocated_capacity(ctxt, volume)
-
-                    try:
-                        if volume['status'] in ['in-use']:
-                            self.driver.ensure_export(ctxt, volume)
-                    except Exception as export_ex:
-                        LOG.error(_LE("Failed to re-export volume %s: "
-                                      "setting to error state"), volume['id'])
-                        LOG.exception(export_ex)
-                        self.db.volume_update(ctxt,
-                                              volume['id'],
-                                              {'status': 'error'})
-                elif volume['status'] == 'downloading':
-                    LOG.info(_LI("volume %s stuck in a downloading state"),
-                             volume['id'])
-                    self.driver.clear_download(ctxt, volume)
-                    self.db.volume_update(ctxt,
-                                          volume['id'],
-                                          {'status': 'error'})
-                else:
-                    LOG.info(_LI("volume %s: skipping export"), volume['id'])
+            try:
+                for volume in volumes:
+                    # available volume should also be counted into allocated
+                    if volume['status'] in ['in-use', 'available']:
+                        # calculate allocated capacity for driver
+                        self._count_allocated_capacity(ctxt, volume,
+                                                       new_hosts)
+
+                        try:
+                            if volume['status'] in ['in-use']:
+                                self.driver.ensure_export(ctxt, volume)
+                        except Exception as export_ex:
+                            LOG.error(_LE("Failed to re-export volume %s: "
+                                          "setting to error state"),
+                                      volume['id'])
+                            LOG.exception(export_ex)
+                            failed['in-use'].append(volume['id'])
+                    elif volume['status'] == 'downloading':
+                        LOG.info(_LI("volume %s stuck in a downloading "
+                                     "state"), volume['id'])
+                        self.driver.clear_download(ctxt, volume)
+                        failed['downloading'].append(volume['id'])
+                    else:
+                        LOG.info(_LI("volume %s: skipping export"),
+                                 volume['id'])
+            finally:
+                for new_host, volume_ids in new_hosts.items():
+                    self.db.volume_update_many(ctxt, volume_ids,
+                                               {'host': new_host})
+                for status, volume_ids in failed.items():
+                    if volume_ids:
+                        self.db.volume_status_transition_many(
+                            ctxt, volume_ids, status, {'status': 'error'})
         except Exception as ex:
             LOG.error(_LE("Error encountered during "
                           "re-exporting phase of driver initialization: "
@@ -1261,10 +1283,10 @@ class VolumeManager(manager.SchedulerDependentManager):
 
                 pool.update(pool_stats)
 
-    def publish_service_capabilities(self, context):
+    def publish_service_capabilities(self, context, full_report=False):
         """Collect driver status and then publish."""
         self._report_driver_status(context)
-        self._publish_service_capabilities(context)
+        self._publish_service_capabilities(context, full_report=full_report)
 
     def notification(self, context, event):
         LOG.info(_LI("Notification {%s} received"), event)
@@ -1725,16 +1747,19 @@ class VolumeManager(manager.SchedulerDependentManager):
                 context, group_ref)
 
             if volumes:
+                volume_ids_by_status = {}
                 for volume in volumes:
-                    update = {'status': volume['status']}
-                    self.db.volume_update(context, volume['id'],
-                                          update)
+                    volume_ids_by_status.setdefault(
+                        volume['status'], []).append(volume['id'])
                     # If we failed to delete a volume, make sure the status
                     # for the cg is set to error as well
                     if (volume['status'] in ['error_deleting', 'error'] and
                             model_update['status'] not in
                             ['error_deleting', 'error']):
                         model_update['status'] = volume['status']
+                for status, volume_ids in volume_ids_by_status.items():
+                    self.db.volume_update_many(context, volume_ids,
+                                               {'status': status})
 
             if model_update:
                 if model_update['status'] in ['error_deleting', 'error']:
@@ -58,6 +58,7 @@ class VolumeAPI(object):
                create_cgsnapshot, and delete_cgsnapshot. Also adds
                the consistencygroup_id parameter in create_volume.
         1.19 - Adds update_migrated_volume
+        1.20 - Adds full_report to publish_service_capabilities
     '''
 
     BASE_RPC_API_VERSION = '1.0'
@@ -66,7 +67,7 @@ class VolumeAPI(object):
         super(VolumeAPI, self).__init__()
         target = messaging.Target(topic=CONF.volume_topic,
                                   version=self.BASE_RPC_API_VERSION)
-        self.client = rpc.get_client(target, '1.19')
+        self.client = rpc.get_client(target, '1.20')
 
     def create_consistencygroup(self, ctxt, group, host):
         new_host = utils.extract_host(host)
@@ -170,9 +171,13 @@ class VolumeAPI(object):
         return cctxt.call(ctxt, 'terminate_connection', volume_id=volume['id'],
                           connector=connector, force=force)
 
-    def publish_service_capabilities(self, ctxt):
-        cctxt = self.client.prepare(fanout=True, version='1.2')
-        cctxt.cast(ctxt, 'publish_service_capabilities')
+    def publish_service_capabilities(self, ctxt, full_report=False):
+        if not full_report:
+            cctxt = self.client.prepare(fanout=True, version='1.2')
+            cctxt.cast(ctxt, 'publish_service_capabilities')
+            return
+        cctxt = self.client.prepare(fanout=True, version='1.20')
+        cctxt.cast(ctxt, 'publish_service_capabilities', full_report=True)
 
     def accept_transfer(self, ctxt, volume, new_user, new_project):
         new_host = utils.extract_host(volume['host'])
@@ -29,10 +29,12 @@ from cinder import db
 from cinder import exception
 from cinder.i18n import _, _LE
 from cinder.openstack.common import log as logging
+from cinder import quota
 
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
+QUOTAS = quota.QUOTAS
 
 
 def create(context,
@@ -55,6 +57,7 @@ def create(context,
         LOG.exception(_LE('DB error: %s') % six.text_type(e))
         raise exception.VolumeTypeCreateFailed(name=name,
                                                extra_specs=extra_specs)
+    QUOTAS.invalidate_resources()
     return type_ref
 
 
@@ -70,6 +73,7 @@ def update(context, id, description):
     except db_exc.DBError as e:
         LOG.exception(_LE('DB error: %s') % six.text_type(e))
         raise exception.VolumeTypeUpdateFailed(id=id)
+    QUOTAS.invalidate_resources()
     return type_updated
 
 
@@ -80,6 +84,7 @@ def destroy(context, id):
         raise exception.InvalidVolumeType(reason=msg)
     else:
         db.volume_type_destroy(context, id)
+        QUOTAS.invalidate_resources()
 
 
 def get_all_types(context, inactive=0, search_opts=None):